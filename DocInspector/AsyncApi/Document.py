@@ -0,0 +1,101 @@
+import asyncio
+
+from DocInspector.Scheduler import RequestError
+from DocInspector.UnsafeApi import Document
+from DocInspector.UnsafeApi.Index import RevisionIndex
+from DocInspector.UnsafeApi.Planner import SPLIT_STATUSES
+from DocInspector.UnsafeApi.Revisions import ChangeData
+from .Requesters import AsyncUnsafeRequester
+
+
+class AsyncDocument(Document):
+    """
+    A document whose revisions are all loaded up front using an async requester.
+    Once `load` has finished it can be used exactly like a normal `Document`, without making any further calls.
+    """
+
+    def __init__(self, requester: AsyncUnsafeRequester, state=None, dateRange=None):
+        """
+        :param requester: The async requester to load the document with
+        :param state: Optional `DocumentState` from a previous run. Only revisions made since are requested
+        :param dateRange: Optional `DateRange` to collect the changes in. See `Document`
+        """
+        super().__init__(None, requester.docId, requester.useFine, state=state, dateRange=dateRange)
+        self.asyncRequester = requester
+
+    async def load(self, increment=None, start=None):
+        """
+        Loads the revision list, and then the changes needed for the totals and the timeline concurrently.
+        The number of requests in flight is bounded by the requester's transport.
+        Like the blocking document, contiguous revisions are requested as ranges unless there is a state to save.
+
+        :param increment: The size of the timeline increments in milliseconds. None if only the totals are needed
+        :param start: The start of the first increment. See `Document.getIncrementGroups`
+        """
+        await self.loadList()
+        await self.loadChanges(increment, start)
+
+    async def loadList(self):
+        """
+        Loads the revision list. The first half of `load`
+        """
+        rawData = await self.asyncRequester.requestList(self._listStart())
+        self._loadList(rawData)
+
+    async def loadChanges(self, increment=None, start=None):
+        """
+        Loads the changes needed for the totals and the timeline. The second half of `load`.
+        Must be called after `loadList`, with the same increments the timeline will be collected with
+
+        :param increment: The size of the timeline increments in milliseconds. None if only the totals are needed
+        :param start: The start of the first increment. See `Document.getIncrementGroups`
+        """
+        if self.state is None:
+            groups = [self.getRevisionList()] + (list(self.getIncrementGroups(increment, start).values())
+                                                 if increment else [])
+            ranges = list(dict.fromkeys(planned for group in groups for planned in self.planner.planRanges(group)))
+            fetched = await asyncio.gather(*[self._fetchRange(*planned) for planned in ranges])
+            self.planner.fetched.update(zip(ranges, fetched))
+            return
+
+        await self._fetchRevisions()
+
+    async def _fetchRevisions(self):
+        """
+        Loads the changes of each revision that has not been loaded yet, one request per revision
+        """
+        pending = [revision for revision in self.getRevisionList() if revision.change is None]
+        changes = await asyncio.gather(*[self.asyncRequester.requestRangeChanges(revision.startId, revision.endId)
+                                         for revision in pending])
+        for revision, change in zip(pending, changes):
+            revision.change = change
+
+    async def loadIndex(self) -> RevisionIndex:
+        """
+        The async mirror of `Document.getIndex`. Must be called after `load`.
+        Once it has finished `getForIdRange` and `getForTimeRange` can be used without making any further calls
+
+        :return: The index of the revisions of this document
+        """
+        if self.index is None:
+            await self._fetchRevisions()
+            revisions = self.getRevisionList()
+            self.index = RevisionIndex(revisions, [revision.change for revision in revisions])
+        return self.index
+
+    async def _fetchRange(self, startId, endId) -> ChangeData:
+        """
+        The async mirror of `RangePlanner.fetchRange`
+        """
+        planner = self.planner
+        if endId - startId < planner.maxIds:
+            try:
+                return await self.asyncRequester.requestRangeChanges(startId, endId)
+            except RequestError as e:
+                if e.status not in SPLIT_STATUSES or startId == endId:
+                    raise
+            planner.maxIds = max(min(planner.maxIds, (endId - startId + 1) // 2), 1)
+        middle = (startId + endId) // 2
+        changes, other = await asyncio.gather(self._fetchRange(startId, middle), self._fetchRange(middle + 1, endId))
+        changes.mergeIn(other)
+        return changes
@@ -0,0 +1,189 @@
+import asyncio
+from typing import AsyncIterator, List, Tuple, Optional
+
+from DocInspector.Collectors import loadGeneralStats, loadIndividualStats, loadTimelineStats, loadUnsafeStats
+from DocInspector.DocStats import DocStats
+from DocInspector.LoadStats import FOLDER_MIME, FILE__MIME, SHORTCUT_MIME, resolveShortcut
+from DocInspector.Tracing import span
+from DocInspector.UnsafeApi import UnsafeOptions
+from .Document import AsyncDocument
+from .Requesters import AsyncDriveService, AsyncUnsafeRequester, DOCS_URL
+from .Transport import AsyncTransport
+
+# The number of files to collect at once in folder mode
+FILE_WORKERS = 64
+
+
+async def collectFromFile(fileId, transport: AsyncTransport, incrementSize, unsafeLevel,
+                          drive: AsyncDriveService = None, docsUrl=DOCS_URL, options: UnsafeOptions = None) -> DocStats:
+    """
+    Collects the stats for a single file.
+    The async mirror of `DocInspector.LoadStats.collectFromFile`
+
+    :param fileId: The id of the file to collect
+    :param transport: The transport to make all the calls through
+    :param incrementSize: The size of the timeline increments, in the format 'd:h:m'
+    :param unsafeLevel: 0 for no unsafe stats, 1 for the unsafe stats and 2 for the fine unsafe stats
+    :param drive: The drive service to use. Defaults to one using the transport
+    :param docsUrl: The url to make the unsafe requests relative to
+    :param options: The options that control how the unsafe api is requested
+    :return: The stats for the file
+    """
+    drive = drive or AsyncDriveService(transport)
+    options = options or UnsafeOptions()
+    docStats = DocStats(incrementSize, options.dateRange)
+    docStats.general.id = fileId
+
+    with span("collectFromFile", "document", fileId=fileId):
+        # The unsafe revision list does not depend on the drive data, so we load them all at once
+        calls = [drive.getFile(fileId), drive.listRevisions(fileId)]
+        if unsafeLevel > 0:
+            requester = AsyncUnsafeRequester(transport, fileId, unsafeLevel > 1, docsUrl, options.cache,
+                                             decoder=options.decoder)
+            document = AsyncDocument(requester, options.makeState(fileId, unsafeLevel > 1), options.dateRange)
+            calls.append(document.loadList())
+        with span("fetch"):
+            fileMeta, revMeta, *_ = await asyncio.gather(*calls)
+
+        with span("loadGeneralStats"):
+            loadGeneralStats(docStats, fileMeta)
+        if unsafeLevel > 0:
+            # The increments line up with the start of the timeline, which is only known once the file is loaded
+            with span("fetchChanges"):
+                await document.loadChanges(docStats.timeline.incrementSize, docStats.timeline.timelineStart)
+        with span("loadIndividualStats"):
+            loadIndividualStats(docStats, revMeta)
+        with span("loadTimelineStats"):
+            loadTimelineStats(docStats, revMeta)
+        if unsafeLevel > 0:
+            with span("loadUnsafeStats"):
+                loadUnsafeStats(document, docStats)
+            with span("saveState"):
+                document.saveState()
+    return docStats
+
+
+async def getFilesInFolder(drive: AsyncDriveService, id) -> Optional[List]:
+    """
+    Lists all the id's of the files in a folder
+
+    :param drive: The drive service to request with
+    :param id: The id of the folder
+    :return: The ids of the child files
+    """
+    return [fileId async for fileId in walkFolder(drive, id)]
+
+
+async def walkFolder(drive: AsyncDriveService, folderId, maxDepth=1) -> AsyncIterator[str]:
+    """
+    Walks through a folder and it's sub-folders, yielding each document as soon as it is found.
+    The async mirror of `DocInspector.LoadStats.walkFolder`
+
+    :param drive: The drive service to request with
+    :param folderId: The id of the folder to walk
+    :param maxDepth: How many levels of folders to walk. 1 for only the folder itself, 0 for no limit
+    :return: The ids of the documents found
+    """
+    mimeTypes = [FILE__MIME, FOLDER_MIME, SHORTCUT_MIME]
+    seen = {folderId}
+    # Depth first, so at most one listing is open for each level
+    listings = [(drive.iterFiles(folderId, mimeTypes), 1)]
+    while listings:
+        listing, depth = listings[-1]
+        try:
+            item = await listing.__anext__()
+        except StopAsyncIteration:
+            listings.pop()
+            continue
+
+        itemId, mimeType = resolveShortcut(item)
+        if itemId is None or itemId in seen:
+            continue
+        seen.add(itemId)
+        if mimeType == FILE__MIME:
+            # Only the documents themselves are stored, as the listing of a shortcut isn't the document's metadata
+            if item['id'] == itemId:
+                drive.storeFile(item)
+            yield itemId
+        elif mimeType == FOLDER_MIME and (maxDepth <= 0 or depth < maxDepth):
+            listings.append((drive.iterFiles(itemId, mimeTypes), depth + 1))
+
+
+async def collectFromFolder(folderId, transport: AsyncTransport, incrementSize, unsafeLevel,
+                            drive: AsyncDriveService = None, docsUrl=DOCS_URL, options: UnsafeOptions = None,
+                            depth=1, workers=FILE_WORKERS) -> Tuple[DocStats, List[DocStats]]:
+    """
+    Collects the stats for every file in a folder concurrently.
+    Files are passed from the folder walk to the workers through a bounded queue,
+    so collection starts as soon as the first file is found.
+    The files are merged in the order they are found in, so the result is the same as the blocking version.
+
+    :param folderId: The id of the folder to collect
+    :param transport: The transport to make all the calls through
+    :param incrementSize: The size of the timeline increments, in the format 'd:h:m'
+    :param unsafeLevel: 0 for no unsafe stats, 1 for the unsafe stats and 2 for the fine unsafe stats
+    :param drive: The drive service to use. Defaults to one using the transport
+    :param docsUrl: The url to make the unsafe requests relative to
+    :param options: The options that control how the unsafe api is requested
+    :param depth: How many levels of sub-folders to collect. 1 for only the folder itself, 0 for no limit
+    :param workers: The number of files to collect at once
+    :return: The stats for the folder as a whole, and the stats for each file
+    """
+    print("Processing folder")
+    drive = drive or AsyncDriveService(transport)
+    globalStats = DocStats(incrementSize, options.dateRange if options else None)
+    globalStats.general.id = folderId
+    loadGeneralStats(globalStats, await drive.getFile(folderId))
+
+    queue = asyncio.Queue(maxsize=workers)
+    results = {}
+
+    async def walk():
+        index = 0
+        async for fileId in walkFolder(drive, folderId, depth):
+            await queue.put((index, fileId))
+            index += 1
+        # Tell each of the workers that there is nothing left
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                return
+            index, fileId = entry
+            results[index] = await collectFromFile(fileId, transport, incrementSize, unsafeLevel,
+                                                   drive, docsUrl, options)
+            # The file's responses are dropped once it is collected, see `DriveService`
+            drive.forget(fileId)
+
+    await asyncio.gather(walk(), *[work() for _ in range(workers)])
+
+    fileStats = [results[index] for index in sorted(results)]
+    with span("mergeFiles", files=len(fileStats)):
+        globalStats.mergeAll(fileStats)
+    if fileStats:
+        globalStats.general.creationDate = fileStats[0].general.creationDate
+
+    return globalStats, fileStats
+
+
+async def tryCollectFromId(fileId, transport: AsyncTransport, incrementSize, unsafeLevel,
+                           drive: AsyncDriveService = None, docsUrl=DOCS_URL, options: UnsafeOptions = None,
+                           depth=1):
+    """
+    Collects the stats for either a file or a folder, depending on what the id is for.
+    The async mirror of `DocInspector.LoadStats.tryCollectFromId`
+    """
+    drive = drive or AsyncDriveService(transport)
+    itemType = (await drive.getFile(fileId)).get('mimeType') or ""
+    if itemType == FOLDER_MIME:
+        return await collectFromFolder(fileId, transport, incrementSize, unsafeLevel, drive, docsUrl, options,
+                                       depth)
+    elif itemType == FILE__MIME:
+        print("Processing file")
+        docStats = await collectFromFile(fileId, transport, incrementSize, unsafeLevel, drive, docsUrl, options)
+        return docStats, None
+    else:
+        print(f"Unknown file type. '{itemType}'")
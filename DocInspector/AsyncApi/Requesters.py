@@ -0,0 +1,222 @@
+import asyncio
+import json
+from typing import AsyncIterator, List
+from urllib.parse import quote, urlencode
+
+from DocInspector.DriveService import FILE_FIELDS, LIST_FIELDS, REVISION_FIELDS, listQuery
+from DocInspector.Metrics import endpointName, metrics
+from DocInspector.Scheduler import checkResponse
+from DocInspector.Tracing import span
+from DocInspector.UnsafeApi.Helpers import DOCS_URL, LIST_TTL
+from DocInspector.UnsafeApi.Revisions import ChangeData
+from DocInspector.UnsafeApi.Stream import iterChunks
+from .Transport import AsyncTransport
+
+DRIVE_URL = "https://www.googleapis.com/drive/v2/"
+
+
+class AsyncUnsafeRequester:
+    """
+    Makes requests to the unsafe API.
+    This is the async mirror of `UnsafeApi.Helpers.UnsafeRequester`
+    """
+
+    def __init__(self, transport: AsyncTransport, docId, useFine=False, baseUrl=DOCS_URL, cache=None,
+                 listTtl=LIST_TTL, decoder=None):
+        """
+        :param transport: The transport to make the calls through
+        :param docId: The ID of the document to call against.
+        :param useFine: If the detailed revisions should be requested
+        :param baseUrl: The url the document urls are made relative to
+        :param cache: Optional `ResponseCache` to store the responses in
+        :param listTtl: How long a cached revision list stays valid, in seconds
+        :param decoder: Optional `DecoderPool` to decode the revisions in, off the event loop
+        """
+        self.transport = transport
+        self.docId = docId
+        self.useFine = useFine
+        self.baseUrl = f"{baseUrl}{self.docId}/"
+        self.cache = cache
+        self.listTtl = listTtl
+        self.decoder = decoder
+
+    async def _requestContent(self, url, key, ttl=None) -> bytes:
+        if self.cache is not None:
+            content = self.cache.get(key, ttl)
+            if content is not None:
+                metrics.recordCacheHit(endpointName(url))
+                return content
+        response, content = await self.transport.request(url)
+        checkResponse(url, response, content)
+        if self.cache is not None:
+            self.cache.put(key, content)
+        return content
+
+    async def _requestJson(self, url, key, ttl=None):
+        content = await self._requestContent(url, key, ttl)
+        with span("decode", "decode", size=len(content)):
+            return json.loads(content[5:])
+
+    def _rangeRequest(self, startId, endId):
+        return (self.baseUrl + f"showrevision?id={self.docId}&end={endId}&start={startId}",
+                ('showrevision', self.docId, startId, endId))
+
+    async def requestRevision(self, revision):
+        """
+        Requests the detailed revision data for a revision
+
+        :param revision: The revision to request for
+        :return: The raw json of that revision
+        """
+        return await self.requestRevisionRange(revision.startId, revision.endId)
+
+    async def requestRevisionRange(self, startId, endId):
+        """
+        Requests the detailed revision data for a given revision range.
+
+        :param startId: The start id of the range
+        :param endId: The end id of the range
+        :return: The raw json for that range, as a single revision object.
+        """
+        return await self._requestJson(*self._rangeRequest(startId, endId))
+
+    async def requestRangeChanges(self, startId, endId) -> ChangeData:
+        """
+        Requests the changes made in a given revision range, parsing the response as a stream.
+        The async mirror of `UnsafeRequester.requestRangeChanges`
+
+        :param startId: The start id of the range
+        :param endId: The end id of the range
+        :return: The changes made in the range
+        """
+        content = await self._requestContent(*self._rangeRequest(startId, endId))
+        if self.decoder is not None:
+            return await self.decoder.decodeAsync(content)
+        with span("decode", "decode", size=len(content)):
+            changes = ChangeData()
+            changes.initFromStream(iterChunks(content))
+            return changes
+
+    async def requestList(self, start=1):
+        """
+        Request a list of all revisions on this document
+
+        :param start: The id of the first revision to list. Defaults to the start of the document
+        :return: The raw json of the list of revisions
+        """
+        return await self._requestJson(self.baseUrl +
+                                       f"revisions/tiles?id={self.docId}&"
+                                       f"start={start}&"
+                                       f"showDetailedRevisions={'true' if self.useFine else 'false'}"
+                                       f"&filterNamed=false",
+                                       ('tiles', self.docId, start, self.useFine), self.listTtl)
+
+
+class AsyncDriveService:
+    """
+    Makes the few Drive v2 calls the collectors need.
+    Only covers the calls used by DocInspector, it is not a general replacement for the google client.
+
+    Each resource is only requested once, with concurrent callers sharing the same request.
+    A new instance should be made for each collection so that the data is never stale.
+    Like `DriveService`, use `forget` once a file has been collected.
+    """
+
+    def __init__(self, transport: AsyncTransport, baseUrl=DRIVE_URL):
+        """
+        :param transport: The transport to make the calls through
+        :param baseUrl: The root url of the drive api
+        """
+        self.transport = transport
+        self.baseUrl = baseUrl
+        self._requests = {}
+
+    async def _requestJson(self, path):
+        if path in self._requests:
+            metrics.recordCacheHit(endpointName(self.baseUrl + path))
+        else:
+            self._requests[path] = asyncio.ensure_future(self._fetchJson(path))
+        return await self._requests[path]
+
+    async def _fetchJson(self, path):
+        url = self.baseUrl + path
+        response, content = await self.transport.request(url)
+        checkResponse(url, response, content)
+        return json.loads(content)
+
+    @staticmethod
+    def _filePath(fileId):
+        return f"files/{quote(fileId)}?{urlencode({'fields': FILE_FIELDS})}"
+
+    @staticmethod
+    def _revisionsPath(fileId):
+        return f"files/{quote(fileId)}/revisions?{urlencode({'fields': REVISION_FIELDS})}"
+
+    async def getFile(self, fileId):
+        """
+        :param fileId: The id of the file to get
+        :return: The raw json of the file metadata. Same as `files().get`
+        """
+        return await self._requestJson(self._filePath(fileId))
+
+    async def listRevisions(self, fileId):
+        """
+        :param fileId: The id of the file to get the revisions of
+        :return: The raw json of the revision list. Same as `revisions().list`
+        """
+        return await self._requestJson(self._revisionsPath(fileId))
+
+    def storeFile(self, item):
+        """
+        Stores the metadata of a listed file, so that `getFile` does not need to request it.
+        Must be called whilst the event loop is running
+
+        :param item: The raw json of the file, as listed by `iterFiles`
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(item)
+        self._requests.setdefault(self._filePath(item['id']), future)
+
+    def forget(self, fileId):
+        """
+        Drops everything stored for a file, once it is no longer needed
+
+        :param fileId: The id of the file
+        """
+        self._requests.pop(self._filePath(fileId), None)
+        self._requests.pop(self._revisionsPath(fileId), None)
+
+    async def iterFiles(self, folderId, mimeTypes=None) -> AsyncIterator[dict]:
+        """
+        Lists the files directly inside a folder, one page at a time.
+        Each page is only requested once the previous one has been used up.
+        The files are not stored, use `storeFile` for the ones that will be collected.
+
+        :param folderId: The id of the folder to list
+        :param mimeTypes: Only list the files of these types. None to list all of them
+        :return: The raw json of the metadata of each file
+        """
+        params = {'q': listQuery(folderId, mimeTypes), 'fields': f"nextPageToken,items({LIST_FIELDS})",
+                  'maxResults': 1000}
+        while True:
+            # Pages are not shared between callers, so they skip the memoisation
+            page = await self._fetchJson(f"files?{urlencode(params)}")
+            for item in page.get('items', []):
+                yield item
+            if not page.get('nextPageToken'):
+                break
+            params['pageToken'] = page['nextPageToken']
+
+    async def listFiles(self, folderId, mimeType=None) -> List[dict]:
+        """
+        Lists the files directly inside a folder.
+        Follows every page of the results, and stores each file so that `getFile` does not need to request it.
+
+        :param folderId: The id of the folder to list
+        :param mimeType: Only list the files of this type. None to list all of them
+        :return: The raw json of the metadata of each file
+        """
+        items = [item async for item in self.iterFiles(folderId, [mimeType] if mimeType else None)]
+        for item in items:
+            self.storeFile(item)
+        return items
@@ -0,0 +1,223 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from httplib2 import Http
+
+from DocInspector.Metrics import metrics
+from DocInspector.Recording import FixtureArchive
+from DocInspector.Scheduler import RequestError, RequestScheduler
+from DocInspector.Tracing import span
+
+
+class AsyncTransport(ABC):
+    """
+    The interface that the async requesters make their calls through.
+    Swap this out to point the engine at a different server, eg. a local stand-in for testing.
+    """
+
+    @abstractmethod
+    async def request(self, url, headers=None) -> Tuple[Dict[str, str], bytes]:
+        """
+        Makes a GET request to the given url.
+        This mirrors `httplib2.Http.request`, so the response is a dict of the lower-case headers,
+        with the status code stored under the 'status' key.
+
+        :param url: The full url to request
+        :param headers: Any extra headers to send
+        :return: A tuple of (response, content)
+        """
+
+    @abstractmethod
+    async def close(self):
+        """
+        Releases any resources held by the transport
+        """
+
+
+class HttpTransport(AsyncTransport):
+    """
+    A HTTP/1.1 transport built directly on asyncio streams.
+    Connections are kept alive and reused per host, and the number of requests in flight is bounded.
+    """
+
+    def __init__(self, credentials=None, maxConnections=100, scheduler: RequestScheduler = None):
+        """
+        :param credentials: The oauth2client credentials to authorise the requests with. None to not authorise.
+        :param maxConnections: The maximum number of requests to have in flight at once
+        :param scheduler: Optional scheduler to rate limit and retry the requests with
+        """
+        self.credentials = credentials
+        self.maxConnections = maxConnections
+        self.scheduler = scheduler
+        self._limit = None
+        self._idle: Dict[tuple, List[tuple]] = {}
+
+    async def _getLimit(self) -> asyncio.Semaphore:
+        # The semaphore is made lazily so that it belongs to the running loop
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.maxConnections)
+        return self._limit
+
+    async def _refresh(self):
+        """
+        Refreshes the credentials.
+        The refresh is a blocking call, so it is pushed onto the default executor.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.credentials.refresh, Http())
+
+    async def _authHeaders(self) -> Dict[str, str]:
+        if self.credentials is None:
+            return {}
+        if self.credentials.access_token is None or self.credentials.access_token_expired:
+            await self._refresh()
+        return {"Authorization": f"Bearer {self.credentials.access_token}"}
+
+    async def request(self, url, headers=None) -> Tuple[Dict[str, str], bytes]:
+        with span("request", "request", method="GET", url=url) as details:
+            send = metrics.wrapAsync(self._request, url)
+            if self.scheduler is None:
+                response, content = await send(url, headers)
+            else:
+                # Each attempt takes it's own slot, so that no slot is held whilst backing off
+                response, content = await self.scheduler.requestAsync(send, url, headers)
+            details['status'] = response['status']
+            return response, content
+
+    async def _request(self, url, headers=None) -> Tuple[Dict[str, str], bytes]:
+        async with await self._getLimit():
+            allHeaders = dict(headers or {})
+            allHeaders.update(await self._authHeaders())
+            response, content = await self._send(url, allHeaders)
+            if response['status'] == '401' and self.credentials is not None:
+                # The token may have been revoked early, so we refresh and try once more
+                await self._refresh()
+                allHeaders.update(await self._authHeaders())
+                response, content = await self._send(url, allHeaders)
+            return response, content
+
+    async def _send(self, url, headers) -> Tuple[Dict[str, str], bytes]:
+        """
+        Sends a single request, reusing an idle connection if there is one.
+        A reused connection may have been closed by the server, in which case a fresh one is opened.
+        """
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        key = (parts.hostname, parts.port or (443 if secure else 80), secure)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+        lines = [f"GET {path} HTTP/1.1", f"Host: {parts.netloc}",
+                 "Accept-Encoding: identity", "Connection: keep-alive"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        payload = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        while True:
+            reused = bool(self._idle.get(key))
+            reader, writer = self._idle[key].pop() if reused else \
+                await asyncio.open_connection(key[0], key[1], ssl=secure or None)
+            try:
+                writer.write(payload)
+                await writer.drain()
+                response, content, keepAlive = await self._readResponse(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    continue
+                raise
+            if keepAlive:
+                self._idle.setdefault(key, []).append((reader, writer))
+            else:
+                writer.close()
+            return response, content
+
+    @staticmethod
+    async def _readResponse(reader) -> Tuple[Dict[str, str], bytes, bool]:
+        """
+        Reads a single response off the stream.
+
+        :return: The response headers, the content and whether the connection can be reused
+        """
+        statusLine = await reader.readuntil(b"\r\n")
+        response = {'status': statusLine.split()[1].decode()}
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response[name.strip().lower()] = value.strip()
+
+        keepAlive = response.get('connection', '').lower() != 'close'
+        if response.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    # Skip any trailers
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            content = b"".join(chunks)
+        elif 'content-length' in response:
+            content = await reader.readexactly(int(response['content-length']))
+        else:
+            content = await reader.read()
+            keepAlive = False
+        return response, content, keepAlive
+
+    async def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle = {}
+
+
+class RecordingTransport(AsyncTransport):
+    """
+    Wraps another transport, storing every exchange made through it in a `FixtureArchive`.
+    """
+
+    def __init__(self, transport: AsyncTransport, archive: FixtureArchive):
+        """
+        :param transport: The transport to make the calls through
+        :param archive: The archive to record into
+        """
+        self.transport = transport
+        self.archive = archive
+
+    async def request(self, url, headers=None) -> Tuple[Dict[str, str], bytes]:
+        response, content = await self.transport.request(url, headers)
+        self.archive.record("GET", url, response, content)
+        return response, content
+
+    async def close(self):
+        await self.transport.close()
+
+
+class ReplayTransport(AsyncTransport):
+    """
+    Serves the responses stored in a `FixtureArchive` instead of making any requests.
+    """
+
+    def __init__(self, archive: FixtureArchive, latency=0.0):
+        """
+        :param archive: The archive to replay from
+        :param latency: How long each request takes, in seconds, to simulate the network
+        """
+        self.archive = archive
+        self.latency = latency
+
+    async def request(self, url, headers=None) -> Tuple[Dict[str, str], bytes]:
+        with span("request", "request", method="GET", url=url, replayed=True):
+            return await metrics.wrapAsync(self._replay, url)(url)
+
+    async def _replay(self, url) -> Tuple[Dict[str, str], bytes]:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return self.archive.replay("GET", url)
+
+    async def close(self):
+        # The archive is owned by whoever opened it
+        pass
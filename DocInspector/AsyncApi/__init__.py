@@ -0,0 +1,3 @@
+from .LoadStats import collectFromFile, collectFromFolder, tryCollectFromId
+from .Requesters import AsyncDriveService, AsyncUnsafeRequester
+from .Transport import AsyncTransport, HttpTransport, RecordingTransport, ReplayTransport, RequestError
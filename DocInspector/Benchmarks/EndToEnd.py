@@ -0,0 +1,227 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from typing import Any, Dict
+from urllib.request import urlopen
+
+from DocInspector import AsyncApi
+from DocInspector.DriveService import buildDriveService
+from DocInspector.HttpPool import CONNECTIONS_PER_HOST, HttpPool
+from DocInspector.LoadStats import tryCollectFromId
+from DocInspector.Recording import FixtureArchive, RecordingPool, ReplayPool
+from DocInspector.Scheduler import RequestScheduler
+from DocInspector.UnsafeApi import UnsafeOptions
+from DocInspector.Writers.OutputCsv import outputCsv
+from .MockServer import MockServer
+from .Suite import compareResults, currentCommit, saveResults, loadResults
+
+# The increment size the stats are collected with, in the format 'd:h:m'
+INCREMENT_SIZE = '0:1:0'
+# The retries allowed in each scenario. Enough that the injected failures never exhaust it
+RETRY_BUDGET = 100000
+# The scenarios to run, as (name, unsafe level, if it is a folder)
+SCENARIOS = [
+    ("file", 1, False),
+    ("folder", 1, True),
+    ("fine", 2, False),
+]
+
+
+def _serve(urls, latency, errorRate, rateLimitRate):
+    """
+    Runs the mock server in a worker process, so that it does not compete with the client for the GIL
+    """
+    server = MockServer(latency=latency, errorRate=errorRate, rateLimitRate=rateLimitRate)
+    urls.put(server.url)
+    server.serve_forever()
+
+
+def startServer(latency=0.0, errorRate=0.0, rateLimitRate=0.0):
+    """
+    Starts a `MockServer` in a new process
+
+    :param latency: How long each response is delayed, in seconds
+    :param errorRate: The fraction of the requests that fail with a 503
+    :param rateLimitRate: The fraction of the requests that are rejected with a 429
+    :return: The (process, root url) of the server
+    """
+    urls = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(urls, latency, errorRate, rateLimitRate), daemon=True)
+    process.start()
+    return process, urls.get(timeout=30)
+
+
+def requestCount(url) -> int:
+    """
+    :param url: The root url of the mock server
+    :return: The number of requests it has served so far
+    """
+    with urlopen(f"{url}/mock/stats") as response:
+        counts = json.loads(response.read())
+    return sum(count for endpoint, count in counts.items() if endpoint not in ('429', '503'))
+
+
+def makeScheduler() -> RequestScheduler:
+    """
+    :return: A scheduler that retries the injected failures, but does not rate limit, as the server has no quota
+    """
+    return RequestScheduler({}, retryBudget=RETRY_BUDGET)
+
+
+def collect(url, fileId, unsafeLevel, jobs, asyncLimit):
+    """
+    Collects a file or folder from the mock server, the same way the command line does
+
+    :param url: The root url of the mock server
+    :param fileId: The id of the file or folder
+    :param unsafeLevel: 0 for no unsafe stats, 1 for the unsafe stats and 2 for the fine unsafe stats
+    :param jobs: The number of revisions to request in parallel
+    :param asyncLimit: The number of requests the asyncio engine has in flight. 0 to use the blocking engine
+    :return: The stats, as returned by `tryCollectFromId`
+    """
+    options = UnsafeOptions(jobs, docsUrl=f"{url}/document/d/")
+    if asyncLimit > 0:
+        async def run():
+            transport = AsyncApi.HttpTransport(None, asyncLimit, makeScheduler())
+            try:
+                drive = AsyncApi.AsyncDriveService(transport, f"{url}/drive/v2/")
+                return await AsyncApi.tryCollectFromId(fileId, transport, INCREMENT_SIZE, unsafeLevel, drive,
+                                                       options.docsUrl, options)
+            finally:
+                await transport.close()
+
+        return asyncio.run(run())
+    service = buildDriveService(HttpPool(None, max(CONNECTIONS_PER_HOST, jobs), makeScheduler()), url)
+    return tryCollectFromId(fileId, service, INCREMENT_SIZE, unsafeLevel, options)
+
+
+def checkReplay(url, fileId, unsafeLevel) -> bool:
+    """
+    Records collecting a file or folder from the mock server with the blocking engine, and then replays it,
+    the same way the command line does with --server and --record, then --replay
+
+    :param url: The root url of the mock server
+    :param fileId: The id of the file or folder
+    :param unsafeLevel: 0 for no unsafe stats, 1 for the unsafe stats and 2 for the fine unsafe stats
+    :return: True if the replayed stats are the same as the recorded ones
+    :raise KeyError: If the replay makes a request that was not recorded
+    """
+    options = UnsafeOptions(docsUrl=f"{url}/document/d/")
+    handle, path = tempfile.mkstemp(suffix='.zip')
+    os.close(handle)
+    try:
+        archive = FixtureArchive(path, 'w')
+        try:
+            service = buildDriveService(RecordingPool(archive, None, CONNECTIONS_PER_HOST, makeScheduler()), url)
+            recorded = tryCollectFromId(fileId, service, INCREMENT_SIZE, unsafeLevel, options)
+        finally:
+            archive.close()
+        archive = FixtureArchive(path, 'r')
+        try:
+            replayed = tryCollectFromId(fileId, buildDriveService(ReplayPool(archive), url), INCREMENT_SIZE,
+                                        unsafeLevel, options)
+        finally:
+            archive.close()
+    finally:
+        os.remove(path)
+    return [outputCsv(stats) for stats in [recorded[0]] + (recorded[1] or [])] == \
+        [outputCsv(stats) for stats in [replayed[0]] + (replayed[1] or [])]
+
+
+def runEndToEnd(revisions=1000, files=10, jobs=1, asyncLimit=0, latency=0.0, errorRate=0.0,
+                rateLimitRate=0.0) -> Dict[str, Any]:
+    """
+    Measures the throughput of the whole program against a local mock server
+
+    :param revisions: The number of revisions in each document
+    :param files: The number of documents in the folder scenario
+    :param jobs: The number of revisions to request in parallel
+    :param asyncLimit: The number of requests the asyncio engine has in flight. 0 to use the blocking engine
+    :param latency: How long each response is delayed, in seconds
+    :param errorRate: The fraction of the requests that fail with a 503
+    :param rateLimitRate: The fraction of the requests that are rejected with a 429
+    :return: The results, in the same json compatible format as `Suite.runSuite`
+    """
+    process, url = startServer(latency, errorRate, rateLimitRate)
+    results = []
+    try:
+        for name, unsafeLevel, isFolder in SCENARIOS:
+            fileId = f"folder-{files}-{revisions}" if isFolder else f"doc-{revisions}-0"
+            docs = files if isFolder else 1
+            before = requestCount(url)
+            start = time.perf_counter()
+            collect(url, fileId, unsafeLevel, jobs, asyncLimit)
+            elapsed = time.perf_counter() - start
+            requests = requestCount(url) - before
+            results.append({'name': name, 'revisions': revisions, 'docs': docs, 'requests': requests,
+                            'median': elapsed, 'docsPerMinute': docs / elapsed * 60,
+                            'requestsPerSecond': requests / elapsed})
+            print(f"{name:<8} {docs:>4} docs, {requests:>6} requests in {elapsed:8.2f}s: "
+                  f"{results[-1]['docsPerMinute']:10.1f} docs/min, {results[-1]['requestsPerSecond']:8.1f} req/s")
+    finally:
+        process.terminate()
+    return {'commit': currentCommit(), 'date': datetime.now().isoformat(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'jobs': jobs, 'asyncLimit': asyncLimit, 'latency': latency,
+            'errorRate': errorRate, 'rateLimitRate': rateLimitRate, 'results': results}
+
+
+def parseArguments():
+    """
+    Builds the argument parser, and then calls it to parse the arguments
+
+    :return: The argument object of the parsed arguments
+    """
+    parser = ArgumentParser(description='Measures the end to end throughput of DocInspector against a local mock '
+                                        'server, for a single file, a folder and the fine revisions')
+    parser.add_argument('--revisions', dest='revisions', type=int, default=1000,
+                        help='The number of revisions in each document. Defaults to 1000')
+    parser.add_argument('--files', dest='files', type=int, default=10,
+                        help='The number of documents in the folder. Defaults to 10')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1,
+                        help='The number of revisions to request in parallel. Defaults to 1')
+    parser.add_argument('-a', '--asyncio', dest='asyncLimit', type=int, default=0,
+                        help='Use the asyncio engine, with up to the given number of requests in flight at once, '
+                             'eg. 100')
+    parser.add_argument('--latency', dest='latency', type=float, default=0,
+                        help='How long each response is delayed, in seconds. Defaults to 0')
+    parser.add_argument('--error-rate', dest='errorRate', type=float, default=0,
+                        help='The fraction of the requests that fail with a 503. Defaults to 0')
+    parser.add_argument('--rate-limit-rate', dest='rateLimitRate', type=float, default=0,
+                        help='The fraction of the requests that are rejected with a 429. Defaults to 0')
+    parser.add_argument('--check-replay', dest='checkReplay', action='store_true', default=False,
+                        help='Also checks that recording the folder scenario and replaying it gives the same stats')
+    parser.add_argument('-o', '--output', dest='output', type=str, default=None,
+                        help='Saves the results to the given file as json')
+    parser.add_argument('-c', '--compare', dest='compare', type=str, default=None,
+                        help='Compares the results against those saved in the given file, eg. from another commit')
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    if args.checkReplay:
+        process, url = startServer()
+        try:
+            for name, unsafeLevel, isFolder in SCENARIOS:
+                fileId = f"folder-{args.files}-{args.revisions}" if isFolder else f"doc-{args.revisions}-0"
+                print(f"{name:<8} replay {'matches' if checkReplay(url, fileId, unsafeLevel) else 'DIFFERS'}")
+        finally:
+            process.terminate()
+    results = runEndToEnd(args.revisions, args.files, args.jobs, args.asyncLimit, args.latency, args.errorRate,
+                          args.rateLimitRate)
+    if args.output:
+        saveResults(results, args.output)
+    if args.compare:
+        print("Compared to " + args.compare)
+        for line in compareResults(loadResults(args.compare), results):
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import json
+import random
+from datetime import datetime, timezone
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+# The prefix google puts before the json of every unsafe api response
+RESPONSE_PREFIX = b")]}'\n"
+# The ways the size of each edit can be distributed
+DISTRIBUTIONS = ('exponential', 'uniform', 'constant')
+# The number of revisions grouped into each tile when the detailed revisions are not requested
+COARSE_GROUP = 10
+# The format of the timestamps in the drive api
+DRIVE_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+class SyntheticDocument:
+    """
+    Generates the unsafe api data of a made up document, for benchmarking without a real document.
+    Everything is derived from the seed, so the same arguments always make the same document.
+
+    Each revision is made by a single editor and covers `changesPerRevision` revision ids, with one edit per id.
+    Some editors are far more active than others, and the gaps between revisions are bursty,
+    to roughly match how a shared document is really edited.
+    """
+
+    def __init__(self, revisions=1000, editors=5, span=30 * 24 * 60 * 60 * 1000, meanEditSize=20,
+                 distribution='exponential', changesPerRevision=1, removalRate=0.2, start=1546300800000, seed=0):
+        """
+        :param revisions: The number of revisions in the document
+        :param editors: The number of editors of the document
+        :param span: The time between the first and last revision, in milliseconds
+        :param meanEditSize: The mean size of each edit, in characters
+        :param distribution: How the size of the edits is distributed. One of `DISTRIBUTIONS`
+        :param changesPerRevision: The number of edits, and revision ids, in each revision
+        :param removalRate: The fraction of the edits that are removals
+        :param start: The time the document was created, in milliseconds since the Epoch
+        :param seed: The seed of the random generator
+        :raise ValueError: If the distribution is not known
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{distribution}'. Expected one of {DISTRIBUTIONS}")
+        self.revisions = revisions
+        self.editors = editors
+        self.span = span
+        self.meanEditSize = meanEditSize
+        self.distribution = distribution
+        self.changesPerRevision = changesPerRevision
+        self.removalRate = removalRate
+        self.start = start
+        self.seed = seed
+        self.docId = f"synthetic-{revisions}-{seed}"
+
+        rng = random.Random(seed)
+        # Editors are weighted by their rank, so the first few make most of the revisions
+        self._editorOf = rng.choices(range(editors), [1 / (rank + 1) for rank in range(editors)], k=revisions)
+        gaps = [rng.expovariate(1) for _ in range(revisions)]
+        scale = span / (sum(gaps) or 1)
+        self._endTimes = []
+        time = start
+        for gap in gaps:
+            time += gap * scale
+            self._endTimes.append(int(time))
+
+    def _editorId(self, editor) -> str:
+        return f"editor{editor}"
+
+    def _color(self, editor) -> str:
+        # The color is the id the editors are known by in the stats, see `User.getId`
+        return f"#{(editor * 2654435761) % 0xFFFFFF:06x}"
+
+    def creationDate(self) -> str:
+        """
+        :return: The creation date in the same format as the drive api
+        """
+        return datetime.fromtimestamp(self.start / 1000, timezone.utc).strftime(DRIVE_TIME_FORMAT)
+
+    def lastId(self) -> int:
+        """
+        :return: The last revision id in the document
+        """
+        return self.revisions * self.changesPerRevision
+
+    def userMap(self) -> Dict[str, dict]:
+        """
+        :return: The raw `userMap` of the revision list
+        """
+        return {self._editorId(editor): {'name': f"Editor {editor}", 'photo': "", 'color': self._color(editor),
+                                         'anonymous': False}
+                for editor in range(self.editors)}
+
+    def tileInfo(self, start=1, detailed=True) -> List[dict]:
+        """
+        Lists the revisions, led by the aggregate revision the real api puts first
+
+        :param start: The id of the first revision to list
+        :param detailed: If each revision gets it's own tile. Otherwise they are grouped `COARSE_GROUP` at a time
+        :return: The raw `tileInfo` of the revision list
+        """
+        tiles = [{'start': 1, 'end': self.lastId(), 'endMillis': self._endTimes[-1] if self._endTimes else self.start,
+                  'users': [self._editorId(editor) for editor in range(self.editors)], 'revisionMac': "aggregate",
+                  'expandable': True}]
+        group = 1 if detailed else COARSE_GROUP
+        for first in range(0, self.revisions, group):
+            last = min(first + group, self.revisions) - 1
+            endId = (last + 1) * self.changesPerRevision
+            if endId < start:
+                continue
+            tiles.append({'start': first * self.changesPerRevision + 1, 'end': endId,
+                          'endMillis': self._endTimes[last],
+                          'users': sorted({self._editorId(self._editorOf[revision])
+                                           for revision in range(first, last + 1)}),
+                          'revisionMac': f"mac{first}", 'expandable': group > 1})
+        return tiles
+
+    def revisionList(self, start=1, detailed=True) -> dict:
+        """
+        :param start: The id of the first revision to list
+        :param detailed: If each revision gets it's own tile
+        :return: The raw json of a revisions/tiles response
+        """
+        return {'tileInfo': self.tileInfo(start, detailed), 'userMap': self.userMap()}
+
+    def driveRevisions(self) -> dict:
+        """
+        :return: The raw json of a `revisions.list` call for the document
+        """
+        items = []
+        for endTime, editor in zip(self._endTimes, self._editorOf):
+            modified = datetime.fromtimestamp(endTime / 1000, timezone.utc).strftime(DRIVE_TIME_FORMAT)
+            items.append({'modifiedDate': modified, 'lastModifyingUserName': f"Editor {editor}"})
+        return {'items': items}
+
+    def _editSize(self, rng: random.Random) -> int:
+        if self.distribution == 'constant':
+            return self.meanEditSize
+        if self.distribution == 'uniform':
+            return rng.randint(1, self.meanEditSize * 2 - 1)
+        return max(1, round(rng.expovariate(1 / self.meanEditSize)))
+
+    def snapshotEntry(self, revisionId) -> dict:
+        """
+        :param revisionId: The id of the edit
+        :return: The raw `chunkedSnapshot` entry of the edit
+        """
+        rng = random.Random(self.seed * 1000003 + revisionId)
+        editor = self._editorOf[(revisionId - 1) // self.changesPerRevision]
+        size = self._editSize(rng)
+        position = rng.randint(1, 10000)
+        return {'ty': 'as', 'st': 'revision_diff', 'si': position, 'ei': position + size - 1,
+                'sm': {'revdiff_dt': 2 if rng.random() < self.removalRate else 1,
+                       'revdiff_aid': self._editorId(editor)}}
+
+    def snapshot(self, startId, endId, chunkSize=1000) -> dict:
+        """
+        :param startId: The start id of the range
+        :param endId: The end id of the range
+        :param chunkSize: The number of entries in each chunk of the snapshot
+        :return: The raw json of a showrevision response for the range
+        """
+        entries = [self.snapshotEntry(revisionId) for revisionId in range(startId, endId + 1)]
+        return {'chunkedSnapshot': [entries[i:i + chunkSize] for i in range(0, len(entries), chunkSize)],
+                'userInfo': {self._editorId(editor): {'color': self._color(editor)}
+                             for editor in range(self.editors)}}
+
+    def fileMetadata(self) -> dict:
+        """
+        :return: The raw json of a `files.get` call for the document
+        """
+        return {'id': self.docId, 'title': f"Synthetic document of {self.revisions} revisions",
+                'mimeType': "application/vnd.google-apps.document",
+                'selfLink': f"https://docs.google.com/document/d/{self.docId}/edit",
+                'createdDate': self.creationDate()}
+
+
+class SyntheticHttp:
+    """
+    Serves the unsafe api of a `SyntheticDocument`.
+    It has the same `request` method as `httplib2.Http`, so it can be given to a `Document` in place of one.
+    Each response is only generated once, so that a benchmark times the parsing rather than the generating.
+    """
+
+    def __init__(self, document: SyntheticDocument):
+        """
+        :param document: The document to serve
+        """
+        self.document = document
+        self._responses = {}
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if uri not in self._responses:
+            self._responses[uri] = self._generate(uri)
+        return self._responses[uri]
+
+    def _generate(self, uri):
+        parts = urlsplit(uri)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        if parts.path.endswith("/showrevision"):
+            data = self.document.snapshot(int(query['start']), int(query['end']))
+        elif parts.path.endswith("/revisions/tiles"):
+            data = self.document.revisionList(int(query.get('start', 1)),
+                                              query.get('showDetailedRevisions') != 'false')
+        else:
+            return {'status': '404'}, b""
+        return {'status': '200'}, RESPONSE_PREFIX + json.dumps(data).encode('utf8')
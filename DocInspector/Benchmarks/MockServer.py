@@ -0,0 +1,341 @@
+import json
+import random
+import re
+import threading
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from DocInspector.LoadStats import FOLDER_MIME
+from .Generator import RESPONSE_PREFIX, SyntheticDocument
+
+# The ids the server knows about. Everything about a file is derived from it's id, so no setup is needed
+DOCUMENT_ID = re.compile(r"doc-(\d+)-(\d+)$")
+FOLDER_ID = re.compile(r"folder-(\d+)-(\d+)$")
+# The parent a files.list query is for
+PARENT_QUERY = re.compile(r"'([^']+)' in parents")
+# The request line of each part of a batch request
+BATCH_REQUEST = re.compile(rb"Content-ID: <([^>]*)>.*?\r?\n\r?\nGET (\S+) HTTP/1\.1", re.DOTALL)
+# The average time between revisions in the served documents, in milliseconds
+REVISION_GAP = 10 * 60 * 1000
+
+
+@lru_cache(maxsize=64)
+def getDocument(fileId) -> Optional[SyntheticDocument]:
+    """
+    :param fileId: An id of the form 'doc-<revisions>-<seed>'
+    :return: The document with that id, or None if it is not a document id
+    """
+    match = DOCUMENT_ID.match(fileId)
+    if match is None:
+        return None
+    revisions, seed = map(int, match.groups())
+    document = SyntheticDocument(revisions, span=revisions * REVISION_GAP, seed=seed)
+    document.docId = fileId
+    return document
+
+
+@lru_cache(maxsize=1024)
+def renderUnsafe(fileId, endpoint, start, end=None, detailed=True) -> bytes:
+    """
+    Renders an unsafe api response.
+    Each is only rendered once, so the server's cost stays small next to the client's.
+
+    :param fileId: The id of the document
+    :param endpoint: Either 'showrevision' or 'tiles'
+    :param start: The start id of the range or list
+    :param end: The end id of the range
+    :param detailed: If the list has the detailed revisions
+    :return: The raw body of the response
+    """
+    document = getDocument(fileId)
+    if endpoint == 'showrevision':
+        data = document.snapshot(start, end)
+    else:
+        data = document.revisionList(start, detailed)
+    return RESPONSE_PREFIX + json.dumps(data).encode('utf8')
+
+
+def folderChildren(folderId):
+    """
+    :param folderId: An id of the form 'folder-<files>-<revisions>'
+    :return: The ids of the documents in the folder, or None if it is not a folder id
+    """
+    match = FOLDER_ID.match(folderId)
+    if match is None:
+        return None
+    files, revisions = map(int, match.groups())
+    return [f"doc-{revisions}-{seed}" for seed in range(files)]
+
+
+def fileMetadata(fileId) -> Optional[dict]:
+    """
+    :param fileId: The id of a document or folder
+    :return: The raw json of a `files.get` call, or None if there is no such file
+    """
+    document = getDocument(fileId)
+    if document is not None:
+        return document.fileMetadata()
+    if folderChildren(fileId) is not None:
+        return {'id': fileId, 'title': f"Synthetic folder {fileId}", 'mimeType': FOLDER_MIME,
+                'selfLink': f"https://drive.google.com/drive/folders/{fileId}",
+                'createdDate': "2018-12-01T00:00:00.000Z"}
+    return None
+
+
+class MockServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the drive and docs servers, serving generated documents.
+    Used to measure the throughput of the whole program without any quota, see `EndToEnd`.
+
+    Documents have ids of the form 'doc-<revisions>-<seed>',
+    and folders 'folder-<files>-<revisions>', which hold that many documents of that many revisions.
+    Latency, server errors and rate limiting can all be injected.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, errorRate=0.0, rateLimitRate=0.0, retryAfter=0,
+                 seed=0):
+        """
+        :param address: The (host, port) to listen on. Port 0 picks a free port
+        :param latency: How long each response is delayed, in seconds
+        :param errorRate: The fraction of the requests that fail with a 503
+        :param rateLimitRate: The fraction of the requests that are rejected with a 429
+        :param retryAfter: The number of seconds the 429 responses ask the client to wait
+        :param seed: The seed of the injected failures
+        """
+        super().__init__(address, MockHandler)
+        self.latency = latency
+        self.errorRate = errorRate
+        self.rateLimitRate = rateLimitRate
+        self.retryAfter = retryAfter
+        self.counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """
+        :return: The root url of the server, to pass to `--server`
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def countRequest(self, endpoint) -> Optional[Tuple[int, Dict[str, str]]]:
+        """
+        Counts a request to an endpoint, and decides if it should fail
+
+        :param endpoint: The name of the endpoint
+        :return: The status and headers of the failure, or None if the request should succeed
+        """
+        with self._lock:
+            self.counts[endpoint] += 1
+            roll = self._random.random()
+            if roll < self.rateLimitRate:
+                self.counts['429'] += 1
+                return 429, {'Retry-After': str(self.retryAfter)}
+            if roll < self.rateLimitRate + self.errorRate:
+                self.counts['503'] += 1
+                return 503, {}
+        return None
+
+    def totalRequests(self) -> int:
+        """
+        :return: The number of requests served so far, including any injected failures
+        """
+        return sum(count for endpoint, count in self.counts.items() if endpoint not in ('429', '503'))
+
+    def start(self) -> threading.Thread:
+        """
+        Serves requests on a background thread until `shutdown` is called
+
+        :return: The thread serving the requests
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """
+    Handles a single connection to the `MockServer`
+    """
+    protocol_version = "HTTP/1.1"
+    server: MockServer
+
+    def log_message(self, format, *args):
+        # Logging every request would cost more than serving it
+        pass
+
+    def _send(self, status, body: bytes, contentType="application/json; charset=UTF-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sendJson(self, data):
+        self._send(200, json.dumps(data).encode('utf8'))
+
+    def _handle(self, endpoint, respond):
+        """
+        Counts the request and either injects a failure or sends the response
+
+        :param endpoint: The name of the endpoint, for the counts
+        :param respond: Called with no arguments to send the real response
+        """
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        failure = self.server.countRequest(endpoint)
+        if failure is not None:
+            status, headers = failure
+            self._send(status, b'{"error": "injected"}', headers=headers)
+        else:
+            respond()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        if parts.path == "/mock/stats":
+            # Not counted, so that reading the counts does not change them
+            self._sendJson(dict(self.server.counts))
+            return
+        route = self.route(parts.path, query)
+        if route is None:
+            self._send(404, b'{"error": "not found"}')
+        else:
+            self._handle(*route)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if urlsplit(self.path).path != "/batch/drive/v2":
+            self._send(404, b'{"error": "not found"}')
+            return
+        self._handle('batch', lambda: self._sendBatch(body))
+
+    def route(self, path, query):
+        """
+        Finds the endpoint a request is for
+
+        :param path: The path of the request
+        :param query: The query parameters of the request
+        :return: The (endpoint name, responder) to pass to `_handle`, or None if there is no such endpoint
+        """
+        segments = path.strip('/').split('/')
+        if segments[:2] == ['drive', 'v2'] and len(segments) > 2 and segments[2] == 'files':
+            return self._routeDrive(segments[3:], query)
+        if segments[:2] == ['document', 'd'] and len(segments) >= 4:
+            document = getDocument(segments[2])
+            if document is None:
+                return None
+            if segments[3:] == ['showrevision']:
+                return 'showrevision', lambda: self._send(200, renderUnsafe(
+                    document.docId, 'showrevision', int(query['start']), int(query['end'])))
+            if segments[3:] == ['revisions', 'tiles']:
+                return 'tiles', lambda: self._send(200, renderUnsafe(
+                    document.docId, 'tiles', int(query.get('start', 1)),
+                    detailed=query.get('showDetailedRevisions') != 'false'))
+        return None
+
+    def _routeDrive(self, segments, query):
+        if not segments:
+            match = PARENT_QUERY.search(query.get('q', ""))
+            children = folderChildren(match.group(1)) if match else None
+            if children is None:
+                return None
+            return 'files.list', lambda: self._sendJson(self._listPage(children, query))
+        metadata = fileMetadata(segments[0])
+        if metadata is None:
+            return None
+        if len(segments) == 1:
+            return 'files.get', lambda: self._sendJson(metadata)
+        if segments[1:] == ['revisions'] and getDocument(segments[0]) is not None:
+            return 'revisions.list', lambda: self._sendJson(getDocument(segments[0]).driveRevisions())
+        if segments[1:] == ['children']:
+            children = folderChildren(segments[0]) or []
+            return 'children.list', lambda: self._sendJson(
+                {'items': [{'kind': "drive#childReference", 'id': childId} for childId in children]})
+        return None
+
+    @staticmethod
+    def _listPage(children, query) -> dict:
+        start = int(query.get('pageToken', 0))
+        size = int(query.get('maxResults', 100))
+        page = {'items': [fileMetadata(childId) for childId in children[start:start + size]]}
+        if start + size < len(children):
+            page['nextPageToken'] = str(start + size)
+        return page
+
+    def _sendBatch(self, body: bytes):
+        """
+        Answers each of the requests in a batch request.
+        Only the drive GET requests are supported, which is all the program batches.
+        """
+        boundary = "mock_batch_boundary"
+        parts = [self._batchPart(contentId.decode(), path.decode()) for contentId, path in BATCH_REQUEST.findall(body)]
+        content = "".join(f"--{boundary}\r\n{part}\r\n" for part in parts) + f"--{boundary}--\r\n"
+        self._send(200, content.encode('utf8'), f"multipart/mixed; boundary={boundary}")
+
+    def _batchPart(self, contentId, path) -> str:
+        split = urlsplit(path)
+        query = {key: values[0] for key, values in parse_qs(split.query).items()}
+        segments = split.path.strip('/').split('/')
+        route = self._routeDrive(segments[2:], query) if segments[:3] == ['drive', 'v2', 'files'] else None
+        self.server.countRequest(route[0] if route else 'batch.unknown')
+        if route is None:
+            status, data = "404 Not Found", {'error': "not found"}
+        elif route[0] == 'revisions.list':
+            status, data = "200 OK", getDocument(segments[3]).driveRevisions()
+        elif route[0] == 'files.get':
+            status, data = "200 OK", fileMetadata(segments[3])
+        else:
+            status, data = "400 Bad Request", {'error': "not supported in a batch"}
+        payload = json.dumps(data)
+        return (f"Content-Type: application/http\r\nContent-ID: <response-{contentId}>\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n{payload}")
+
+
+def parseArguments():
+    """
+    Builds the argument parser, and then calls it to parse the arguments
+
+    :return: The argument object of the parsed arguments
+    """
+    parser = ArgumentParser(description='Runs a local stand-in for the google drive and docs servers. Point '
+                                        'DocInspector at it with --server')
+    parser.add_argument('--host', dest='host', type=str, default='127.0.0.1',
+                        help='The host to listen on. Defaults to 127.0.0.1')
+    parser.add_argument('--port', dest='port', type=int, default=8080,
+                        help='The port to listen on. Defaults to 8080')
+    parser.add_argument('--latency', dest='latency', type=float, default=0,
+                        help='How long each response is delayed, in seconds. Defaults to 0')
+    parser.add_argument('--error-rate', dest='errorRate', type=float, default=0,
+                        help='The fraction of the requests that fail with a 503. Defaults to 0')
+    parser.add_argument('--rate-limit-rate', dest='rateLimitRate', type=float, default=0,
+                        help='The fraction of the requests that are rejected with a 429. Defaults to 0')
+    parser.add_argument('--retry-after', dest='retryAfter', type=int, default=0,
+                        help='The number of seconds the 429 responses ask the client to wait. Defaults to 0')
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    server = MockServer((args.host, args.port), args.latency, args.errorRate, args.rateLimitRate, args.retryAfter)
+    print(f"Serving on {server.url}. Try the ids doc-1000-0 or folder-10-1000")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import json
+import pickle
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from DocInspector.Collectors.CollectGeneralStats import loadGeneralStats
+from DocInspector.Collectors.CollectTimelineStats import loadTimelineStats
+from DocInspector.Collectors.CollectUnsafeStats import loadUnsafeStats
+from DocInspector.DocStats import DocStats
+from DocInspector.Helpers import incrementToMilli
+from DocInspector.UnsafeApi import Document
+from DocInspector.UnsafeApi.Revisions import ChangeData
+from DocInspector.Writers.OutputCsv import outputCsv
+from DocInspector.Writers.OutputHTML import outputHTML
+from DocInspector.Writers.OutputPlain import outputPlain
+from .Generator import SyntheticDocument, SyntheticHttp
+
+# The number of revisions each benchmark is run against by default
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000, 1000000]
+# The average time between revisions in the generated documents, in milliseconds
+REVISION_GAP = 10 * 60 * 1000
+# The increment size the stats are collected with, in the format 'd:h:m'
+INCREMENT_SIZE = '0:1:0'
+# The increment size of the timeline bucketing benchmarks, in the format 'd:h:m'.
+# Small enough that almost every increment is empty
+FINE_INCREMENT_SIZE = '0:0:1'
+# How much slower a benchmark can get before the comparison reports it as a regression
+REGRESSION_THRESHOLD = 1.1
+# The number of documents merged at once by the k-way merge benchmark
+MERGE_FILES = 8
+# The size of the windows queried by the range query benchmark, in milliseconds
+WINDOW_SIZE = 24 * 60 * 60 * 1000
+
+
+class Benchmark:
+    """
+    A single timed operation.
+    The setup is run before every repeat and is not timed, so the operation can freely change what it is given.
+    """
+
+    def __init__(self, name, setup: Callable[['Workload'], Any], run: Callable[[Any], Any]):
+        """
+        :param name: The name the results are stored under
+        :param setup: Builds the input of the operation out of the workload
+        :param run: The operation to time
+        """
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+    def time(self, workload: 'Workload', repeats=5) -> List[float]:
+        """
+        Times the operation, after an untimed warm up run
+
+        :param workload: The workload to run the operation against
+        :param repeats: The number of timed runs
+        :return: The time of each run, in seconds
+        """
+        self.run(self.setup(workload))
+        times = []
+        for _ in range(repeats):
+            state = self.setup(workload)
+            start = time.perf_counter()
+            self.run(state)
+            times.append(time.perf_counter() - start)
+        return times
+
+
+class Workload:
+    """
+    The inputs shared by every benchmark of a single size.
+    Each input is only built the first time a benchmark asks for it.
+    """
+
+    def __init__(self, revisions, seed=0):
+        """
+        :param revisions: The number of revisions in the generated documents
+        :param seed: The seed of the generated documents
+        """
+        self.revisions = revisions
+        self.document = SyntheticDocument(revisions, span=revisions * REVISION_GAP, seed=seed)
+        # A second document that overlaps the first, for the benchmarks that merge two documents
+        self.other = SyntheticDocument(revisions, span=revisions * REVISION_GAP, seed=seed + 1,
+                                       start=self.document.start + revisions * REVISION_GAP // 2)
+        self.http = SyntheticHttp(self.document)
+        self._snapshot = None
+        self._changes = None
+        self._stats = None
+
+    def snapshot(self) -> dict:
+        """
+        :return: The raw showrevision response for the whole document
+        """
+        if self._snapshot is None:
+            self._snapshot = self.document.snapshot(1, self.document.lastId())
+        return self._snapshot
+
+    def changes(self) -> List[ChangeData]:
+        """
+        :return: The changes of each revision of the document
+        """
+        if self._changes is None:
+            self._changes = []
+            for revisionId in range(1, self.document.lastId() + 1):
+                changes = ChangeData()
+                changes.initFromData({'chunkedSnapshot': [[self.document.snapshotEntry(revisionId)]],
+                                      'userInfo': self.snapshot()['userInfo']})
+                self._changes.append(changes)
+        return self._changes
+
+    def stats(self) -> List[bytes]:
+        """
+        :return: The pickled stats of both documents. Unpickle them to get a copy that can be changed
+        """
+        if self._stats is None:
+            self._stats = [pickle.dumps(makeStats(document)) for document in (self.document, self.other)]
+        return self._stats
+
+    def makeDocument(self) -> Document:
+        """
+        :return: A new unsafe api document, with it's revision list already loaded
+        """
+        # The fine revisions are used so that each generated revision is it's own revision in the document
+        document = Document(self.http, self.document.docId, True)
+        document.getRevisionList()
+        return document
+
+
+def makeStats(document: SyntheticDocument) -> DocStats:
+    """
+    Collects the stats of a generated document, the same way they are collected from a real one
+
+    :param document: The document to collect
+    :return: The stats of the document
+    """
+    stats = DocStats(INCREMENT_SIZE)
+    stats.general.id = document.docId
+    loadGeneralStats(stats, document.fileMetadata())
+    loadUnsafeStats(Document(SyntheticHttp(document), document.docId, True), stats)
+    return stats
+
+
+def _makeIndexedDocument(workload: Workload) -> Document:
+    document = workload.makeDocument()
+    document.getIndex()
+    return document
+
+
+def _queryWindows(document: Document):
+    # Every window of a day, as an ad-hoc query such as the changes per day would be made
+    start, end = document.index.endTimes[0], document.index.endTimes[-1]
+    for windowStart in range(start - 1, end, WINDOW_SIZE):
+        document.getForTimeRange(windowStart, windowStart + WINDOW_SIZE)
+
+
+def _makeFineStats(workload: Workload):
+    stats = DocStats(FINE_INCREMENT_SIZE)
+    loadGeneralStats(stats, workload.document.fileMetadata())
+    return stats, workload.document.driveRevisions()
+
+
+def _mergeChanges(changes: List[ChangeData]):
+    total = ChangeData()
+    for change in changes:
+        total.mergeIn(change)
+
+
+BENCHMARKS = [
+    Benchmark("ChangeData.initFromData", Workload.snapshot, ChangeData),
+    Benchmark("ChangeData.mergeIn", Workload.changes, _mergeChanges),
+    Benchmark("Document.getChangesInIncrement", Workload.makeDocument,
+              lambda document: document.getChangesInIncrement(60 * 60 * 1000)),
+    Benchmark("Document.getForTimeRange", _makeIndexedDocument, _queryWindows),
+    Benchmark("Document.getIncrementGroups", Workload.makeDocument,
+              lambda document: document.getIncrementGroups(incrementToMilli(FINE_INCREMENT_SIZE))),
+    Benchmark("loadTimelineStats", _makeFineStats, lambda state: loadTimelineStats(*state)),
+    Benchmark("TimelineStats.mergeIn", lambda workload: [pickle.loads(stats) for stats in workload.stats()],
+              lambda stats: stats[0].timeline.mergeIn(stats[1].timeline)),
+    Benchmark("TimelineStats.mergeAll",
+              lambda workload: [pickle.loads(workload.stats()[index % 2]) for index in range(MERGE_FILES + 1)],
+              lambda stats: stats[0].timeline.mergeAll([other.timeline for other in stats[1:]])),
+    Benchmark("IndividualStats.mergeIn", lambda workload: [pickle.loads(stats) for stats in workload.stats()],
+              lambda stats: stats[0].individuals.mergeIn(stats[1].individuals)),
+    Benchmark("outputPlain", lambda workload: pickle.loads(workload.stats()[0]), outputPlain),
+    Benchmark("outputHTML", lambda workload: pickle.loads(workload.stats()[0]), outputHTML),
+    Benchmark("outputCsv", lambda workload: pickle.loads(workload.stats()[0]), outputCsv),
+]
+
+
+def currentCommit() -> str:
+    """
+    :return: The hash of the commit being benchmarked, or an empty string if it is not a git checkout
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def runSuite(sizes=None, repeats=5, names=None, seed=0) -> Dict[str, Any]:
+    """
+    Runs the benchmarks against generated documents of each size
+
+    :param sizes: The number of revisions to benchmark with. Defaults to `DEFAULT_SIZES`
+    :param repeats: The number of timed runs of each benchmark
+    :param names: Only run the benchmarks with these names. None to run all of them
+    :param seed: The seed of the generated documents
+    :return: The results, in a json compatible format
+    """
+    results = []
+    for size in sizes or DEFAULT_SIZES:
+        workload = Workload(size, seed)
+        for benchmark in BENCHMARKS:
+            if names and benchmark.name not in names:
+                continue
+            times = benchmark.time(workload, repeats)
+            results.append({'name': benchmark.name, 'revisions': size, 'times': times,
+                            'best': min(times), 'median': statistics.median(times)})
+            print(f"{benchmark.name:<32} {size:>8} revisions: {results[-1]['median'] * 1000:10.2f}ms")
+    return {'commit': currentCommit(), 'date': datetime.now().isoformat(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'seed': seed, 'repeats': repeats, 'results': results}
+
+
+def compareResults(old: Dict[str, Any], new: Dict[str, Any], threshold=REGRESSION_THRESHOLD) -> List[str]:
+    """
+    Compares the results of two runs of the suite, eg. from two commits
+
+    :param old: The results to compare against
+    :param new: The results to compare
+    :param threshold: How many times slower a benchmark can get before it is marked as a regression
+    :return: A line describing the change in each benchmark both runs have in common
+    """
+    oldTimes = {(result['name'], result['revisions']): result['median'] for result in old['results']}
+    lines = []
+    for result in new['results']:
+        key = (result['name'], result['revisions'])
+        if key not in oldTimes or oldTimes[key] == 0:
+            continue
+        ratio = result['median'] / oldTimes[key]
+        marker = "  REGRESSION" if ratio > threshold else ""
+        lines.append(f"{result['name']:<32} {result['revisions']:>8} revisions: {ratio:6.2f}x{marker}")
+    return lines
+
+
+def saveResults(results: Dict[str, Any], path):
+    """
+    :param results: The results of `runSuite`
+    :param path: The file to write them to, as json
+    """
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(results, f, indent=2)
+
+
+def loadResults(path) -> Dict[str, Any]:
+    """
+    :param path: A file written by `saveResults`
+    :return: The results stored in it
+    """
+    with open(path, encoding='utf8') as f:
+        return json.load(f)
@@ -0,0 +1,2 @@
+from .Generator import SyntheticDocument, SyntheticHttp
+from .Suite import BENCHMARKS, runSuite, compareResults, saveResults, loadResults
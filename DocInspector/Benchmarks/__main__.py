@@ -0,0 +1,42 @@
+from argparse import ArgumentParser
+
+from .Suite import BENCHMARKS, DEFAULT_SIZES, compareResults, loadResults, runSuite, saveResults
+
+
+def parseArguments():
+    """
+    Builds the argument parser, and then calls it to parse the arguments
+
+    :return: The argument object of the parsed arguments
+    """
+    parser = ArgumentParser(description='Benchmarks the hot paths of DocInspector against generated documents')
+    parser.add_argument('-s', '--sizes', dest='sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='The number of revisions to benchmark with. The largest sizes need several GB of memory. '
+                             f'Defaults to {" ".join(map(str, DEFAULT_SIZES))}')
+    parser.add_argument('-r', '--repeats', dest='repeats', type=int, default=5,
+                        help='The number of timed runs of each benchmark. Defaults to 5')
+    parser.add_argument('-b', '--benchmark', dest='names', nargs='+', default=None,
+                        choices=[benchmark.name for benchmark in BENCHMARKS],
+                        help='Only run the given benchmarks. Defaults to all of them')
+    parser.add_argument('--seed', dest='seed', type=int, default=0,
+                        help='The seed of the generated documents. Defaults to 0')
+    parser.add_argument('-o', '--output', dest='output', type=str, default=None,
+                        help='Saves the results to the given file as json')
+    parser.add_argument('-c', '--compare', dest='compare', type=str, default=None,
+                        help='Compares the results against those saved in the given file, eg. from another commit')
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    results = runSuite(args.sizes, args.repeats, args.names, args.seed)
+    if args.output:
+        saveResults(results, args.output)
+    if args.compare:
+        print("Compared to " + args.compare)
+        for line in compareResults(loadResults(args.compare), results):
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
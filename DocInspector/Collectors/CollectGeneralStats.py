@@ -1,19 +1,36 @@
 from DocInspector.DocStats import DocStats
+from DocInspector.DriveService import DriveService
+from DocInspector.Helpers import calculateTimelineStart
 
 
-def collectGeneralStats(stats: DocStats, service):
+def collectGeneralStats(stats: DocStats, service: DriveService):
     """
     Collects a bunch of general stats about the document
     At present this includes the creation date, self link and title
 
     :param stats: The object to store the stats in
-    :param service: The service to use to make api calls
+    :param service: The drive service to use to make api calls
     """
     # Call the data from the api.
-    file_meta = service.files().get(fileId=stats.general.id).execute()
+    file_meta = service.getFile(stats.general.id)
+    loadGeneralStats(stats, file_meta)
+
+
+def loadGeneralStats(stats: DocStats, file_meta):
+    """
+    Loads the general stats out of the file metadata returned by the api
+
+    :param stats: The object to store the stats in
+    :param file_meta: The raw json returned by a `files.get` call
+    """
     # Load in file stats
     stats.general.name = file_meta.get('title')
     stats.general.link = file_meta.get('selfLink')
     stats.general.creationDate = file_meta.get('createdDate')
 
     stats.timeline.setTimelineStart(stats.general.creationDate)
+    # The timeline starts at the date range instead, if it starts after the document was made
+    if stats.dateRange.start is not None:
+        stats.timeline.timelineStart = max(stats.timeline.timelineStart,
+                                           calculateTimelineStart(stats.dateRange.start,
+                                                                  stats.timeline.incrementSize))
@@ -1,21 +1,37 @@
 from DocInspector.DocStats import DocStats
+from DocInspector.DriveService import DriveService
+from DocInspector.Helpers import timesToMilli
 
 
-def collectIndividualStats(stats: DocStats, service):
+def collectIndividualStats(stats: DocStats, service: DriveService):
     """
     Loads stats for individual contributions out of the official api.
     This at present only includes an incomplete list of editors
 
     :param stats: The stat object to insert data into
-    :param service: The google drive v2 service.
+    :param service: The drive service to use to make api calls
     :param args: The program arguments. See `docInspector.py#parseArguments` for description of arguments
     """
     # Call the data from the api
-    rev_meta = service.revisions().list(fileId=stats.general.id).execute()
+    rev_meta = service.listRevisions(stats.general.id)
+    loadIndividualStats(stats, rev_meta)
 
+
+def loadIndividualStats(stats: DocStats, rev_meta):
+    """
+    Loads the individual stats out of the revision list returned by the api.
+    Only the editors of the revisions in the date range are included
+
+    :param stats: The stat object to insert data into
+    :param rev_meta: The raw json returned by a `revisions.list` call
+    """
     # Collect all editors, excluding duplicates
     editors = set()
-    for revision in rev_meta["items"]:
+    revisions = rev_meta["items"]
+    if stats.dateRange.isLimited():
+        inRange = stats.dateRange.containsAll(timesToMilli([revision["modifiedDate"] for revision in revisions]))
+        revisions = [revision for revision, keep in zip(revisions, inRange) if keep]
+    for revision in revisions:
         editor = revision["lastModifyingUserName"]
         editors.add(editor)
 
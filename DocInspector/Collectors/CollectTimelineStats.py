@@ -1,29 +1,52 @@
+import numpy as np
+
 from DocInspector.DocStats import DocStats
-from DocInspector.Helpers import calculateTimelineStart, timeToMilli
+from DocInspector.DriveService import DriveService
+from DocInspector.Helpers import bucketTimes, calculateTimelineStart, timeToMilli, timesToMilli
 
 
-def collectTimelineStats(stats: DocStats, service):
+def collectTimelineStats(stats: DocStats, service: DriveService):
     """
     Collects stats for the timeline from the official api.
     At present this is limited to just the last editor in each major revision in each increment
 
     :param stats: The stat object to fill up
-    :param service: The service to use to make any calls to the api
+    :param service: The drive service to use to make any calls to the api
     :param args: The arguments passed into the program
     """
 
-    rev_meta = service.revisions().list(fileId=stats.general.id).execute()
-    currentTime = calculateTimelineStart(timeToMilli(stats.general.creationDate), stats.timeline.incrementSize)
-
-    i = 0
-    # Iterate until we run out of revisions
-    while i < len(rev_meta['items']):
-        increment = stats.timeline.makeIncrement()
-        # Iterate whilst we are in the current increment
-        # Check to make sure we don't run out of revisions
-        while i < len(rev_meta['items']) and timeToMilli(rev_meta['items'][i]['modifiedDate']) <= currentTime:
-            # Add the data from this revision
-            name = rev_meta['items'][i]['lastModifyingUserName']
-            increment.makeEditor(name).name = name
-            i += 1
-        currentTime += stats.timeline.incrementSize
+    rev_meta = service.listRevisions(stats.general.id)
+    loadTimelineStats(stats, rev_meta)
+
+
+def loadTimelineStats(stats: DocStats, rev_meta):
+    """
+    Loads the timeline out of the revision list returned by the api.
+    Only the revisions in the date range are included, and the timeline is clipped to start with the range
+
+    :param stats: The stat object to fill up
+    :param rev_meta: The raw json returned by a `revisions.list` call
+    """
+    timeline = stats.timeline
+    timeline.labelIsEnd = True
+    start = calculateTimelineStart(timeToMilli(stats.general.creationDate), timeline.incrementSize)
+    if stats.dateRange.start is not None:
+        start = max(start, calculateTimelineStart(stats.dateRange.start, timeline.incrementSize))
+    items = rev_meta['items']
+    times = timesToMilli([item['modifiedDate'] for item in items])
+    if stats.dateRange.isLimited() and len(items):
+        inRange = stats.dateRange.containsAll(times)
+        items = [item for item, keep in zip(items, inRange) if keep]
+        times = times[inRange]
+    if not items:
+        return
+
+    # The first increment holds everything up to the start, and each after it the revisions up to it's end.
+    # A revision never goes in an earlier increment than the one before it, so they are bucketed in order
+    rows = np.maximum.accumulate(bucketTimes(times, start, timeline.incrementSize, True))
+    editors = [item['lastModifyingUserName'] for item in items]
+    editorColumns = {editor: timeline.editorColumn(editor, editor) for editor in dict.fromkeys(editors)}
+    columns = np.array([editorColumns[editor] for editor in editors], dtype=np.intp)
+    first = timeline.getNumIncrements()
+    timeline.resize(first + int(rows[-1]) + 1)
+    timeline.markPresent(first + rows, columns)
@@ -1,21 +1,46 @@
+import numpy as np
+
 from ..DocStats import DocStats
-from ..UnsafeApi import Document
+from ..DriveService import DriveService
+from ..HttpPool import HttpPool
+from ..Tracing import span
+from ..UnsafeApi import Document, UnsafeOptions
 
 
-def collectUnsafeStats(stats: DocStats, service, useFine):
+def collectUnsafeStats(stats: DocStats, service: DriveService, useFine, options: UnsafeOptions = None):
     """
     Uses the unsafe api to supplement the stats gathered from the official api
     This is only run if the `-u` flag is passed in
 
     :param stats: The stats object to store the data in
-    :param http: The http object to make calls with
+    :param service: The drive service, whose http object is used to make calls with
     :param useFine: Flag that controls if the finer revision level should be used.
+    :param options: The options that control how the unsafe api is requested
     """
-    http = service._http
+    options = options or UnsafeOptions()
+    http = service.http
+    # Only a pool can be shared between threads, any other http object makes one request at a time
+    jobs = options.jobs if isinstance(http, HttpPool) else 1
     # Make a document (akin to a `service`) and pass it into the child methods
-    doc = Document(http, stats.general.id, useFine)
-    getTotalChanges(doc, stats)
-    getIncrementData(doc, stats)
+    doc = Document(http, stats.general.id, useFine, jobs, options.cache, options.makeState(stats.general.id, useFine),
+                   options.decoder, options.docsUrl, stats.dateRange)
+    loadUnsafeStats(doc, stats)
+    with span("saveState"):
+        doc.saveState()
+
+
+def loadUnsafeStats(document, stats: DocStats):
+    """
+    Loads the stats from an unsafe document into the stats object.
+    Replaces the stats gathered from the official api.
+
+    :param document: The document object that provides the changes
+    :param stats: The stats object to store the results in
+    """
+    with span("getTotalChanges"):
+        getTotalChanges(document, stats)
+    with span("getIncrementData"):
+        getIncrementData(document, stats)
 
 
 def getTotalChanges(document, stats: DocStats):
@@ -48,14 +73,13 @@ def getTotalChanges(document, stats: DocStats):
     for user in users:
         # TODO: This is a hack and we need to handle anonymous users.
         if user != "unknown":
-            editor = stats.individuals.makeEditor(user)
+            editor = stats.individuals.makeEditor(user, document.getUser(user).id)
             editor.name = document.getUser(user).name
             editor.additions = changes.userAdditions(user)
             editor.removals = changes.userRemovals(user)
             editor.changes = changes.userChanges(user)
             userSize = editor.additions + editor.removals
             editor.percent = (userSize / totalSize) * 100
-            editor.unsafeId = document.getUser(user).id
 
 
 def getIncrementData(doc: Document, stats):
@@ -67,31 +91,27 @@ def getIncrementData(doc: Document, stats):
     :param stats: The stats object to store the data in
     """
 
+    timeline = stats.timeline
     # Clear out the official data
-    for i in range(stats.timeline.getNumIncrements() - 1, -1, -1):
-        stats.timeline.removeIncrement(i)
+    timeline.clear()
+    timeline.labelIsEnd = False
     # Load in the changes from the api
-    changes = doc.getChangesInIncrement(stats.timeline.incrementSize)
-
-    # Add in the data from each increment
-    for i in range(len(changes)):
-        increment = stats.timeline.makeIncrement()
-        totalAdd = 0
-        totalRemove = 0
-        totalChange = 0
-        for user in changes[i].getUsers():
+    # The increments are lined up with the timeline's own start, so that each row covers the time it is labelled with
+    changes = doc.getChangesInIncrement(timeline.incrementSize, timeline.timelineStart)
+
+    # Gather the changes of each editor in each increment, and then store them all at once
+    rows, columns, additions, removals, edits = [], [], [], [], []
+    for i, change in changes.items():
+        for user in change.getUsers():
             # TODO: This is a hack and we need to handle anonymous users.
             if user != "unknown":
-                editor = increment.makeEditor(user)
-                editor.additions = changes[i].userAdditions(user)
-                editor.removals = changes[i].userRemovals(user)
-                editor.changes = changes[i].userChanges(user)
-                editor.name = doc.getUser(user).name
-
-                totalChange += editor.changes
-                totalAdd += editor.additions
-                totalRemove += editor.removals
-
-        increment.total.additions = totalAdd or None
-        increment.total.removals = totalRemove or None
-        increment.total.changes = totalChange or None
+                rows.append(i)
+                columns.append(timeline.editorColumn(user, doc.getUser(user).name))
+                additions.append(change.userAdditions(user))
+                removals.append(change.userRemovals(user))
+                edits.append(change.userChanges(user))
+
+    # Only the increments with changes are returned, so the timeline runs up to the last of them
+    timeline.resize(max(changes, default=-1) + 1)
+    timeline.setCounts(np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp), additions, removals, edits)
+    timeline.calculateTotals()
@@ -1,4 +1,4 @@
-from .CollectGeneralStats import collectGeneralStats
-from .CollectIndividualStats import collectIndividualStats
-from .CollectTimelineStats import collectTimelineStats
-from .CollectUnsafeStats import collectUnsafeStats
+from .CollectGeneralStats import collectGeneralStats, loadGeneralStats
+from .CollectIndividualStats import collectIndividualStats, loadIndividualStats
+from .CollectTimelineStats import collectTimelineStats, loadTimelineStats
+from .CollectUnsafeStats import collectUnsafeStats, loadUnsafeStats
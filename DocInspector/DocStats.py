@@ -1,7 +1,18 @@
-from typing import List, Dict, Optional, Any
+from collections.abc import Mapping, Sequence
+from typing import List, Dict, Optional, Any, Iterator
 from weakref import ref
 
-from DocInspector.Helpers import timeToMilli, calculateTimelineStart
+import numpy as np
+
+from DocInspector.EditorRegistry import EditorRegistry
+from DocInspector.Helpers import DateRange, timeToMilli, calculateTimelineStart, incrementToMilli
+
+# The counts stored for each editor in each increment of the timeline
+FIELDS = ('additions', 'removals', 'changes')
+# The type of the counts. Far more than any one editor can change in one increment
+COUNT_TYPE = np.int32
+# The count stored when it is not known, eg. for an editor only seen in the official api
+UNKNOWN = -1
 
 
 class GeneralStats:
@@ -16,6 +27,12 @@ class GeneralStats:
         self.creationDate = ""
         self.parent = ref(parent)
 
+    def __getstate__(self):
+        # Weak references can't be pickled, so the parent is re-linked by the parent when it is unpickled
+        state = dict(self.__dict__)
+        state['parent'] = None
+        return state
+
 
 class IndividualStats:
     """
@@ -59,14 +76,23 @@ class IndividualStats:
 
         def mergeIn(self, other: 'IndividualStats.EditorStats'):
             self.name = self.name or other.name
+            self.unsafeId = self.unsafeId or other.unsafeId
             self.additions = (other.additions or 0) + (self.additions or 0)
             self.removals = (other.removals or 0) + (self.removals or 0)
             self.changes = (other.changes or 0) + (self.changes or 0)
 
-    def __init__(self, parent):
+    def __init__(self, parent, registry: EditorRegistry = None):
         self.editors = {}
         self.total = self.EditorStats()
         self.parent = ref(parent)
+        # The identities of the editors, shared with the timeline
+        self.registry = EditorRegistry() if registry is None else registry
+
+    def __getstate__(self):
+        # Weak references can't be pickled, so the parent is re-linked by the parent when it is unpickled
+        state = dict(self.__dict__)
+        state['parent'] = None
+        return state
 
     def getEditor(self, id) -> EditorStats:
         """
@@ -84,14 +110,17 @@ class IndividualStats:
         """
         del self.editors[id]
 
-    def makeEditor(self, id) -> EditorStats:
+    def makeEditor(self, id, unsafeId=None) -> EditorStats:
         """
         Makes a new editor and adds it to the list.
         Returns the newly made editor
 
         :param id: The id of the editor just made
+        :param unsafeId: The unsafe id of the editor, if the unsafe api was used
         """
+        self.registry.intern(id, unsafeId=unsafeId)
         self.editors[id] = self.EditorStats()
+        self.editors[id].unsafeId = unsafeId
         return self.editors[id]
 
     def getEditors(self) -> List[str]:
@@ -101,25 +130,39 @@ class IndividualStats:
         return list(self.editors.keys())
 
     def findEditorByUnsafe(self, id) -> Optional[str]:
-        for editor in self.editors:
-            if self.editors[editor].unsafeId and self.editors[editor].unsafeId == id:
-                return editor
-        return None
+        """
+        :param id: The unsafe id of the editor to find
+        :return: The id of the editor, or None if there is no editor with that unsafe id
+        """
+        index = self.registry.byUnsafe.get(id)
+        if index is None or self.registry.ids[index] not in self.editors:
+            return None
+        return self.registry.ids[index]
 
     def mergeIn(self, other: 'IndividualStats'):
-        for editor in other.getEditors():
-            # Find the id of the editor
-            # We try and match by unsafe ID, falling back to general ID.
-            id = editor
-            if other.editors[editor].unsafeId:
-                id = self.findEditorByUnsafe(other.editors[editor].unsafeId)
-            # If the id exists, we merge it. Else we make a new editor and merge that.
-            if id in self.editors:
-                self.editors[editor].mergeIn(other.editors[editor])
-            else:
-                self.makeEditor(editor).mergeIn(other.editors[editor])
-        # Merge total changes
-        self.total.mergeIn(other.total)
+        """
+        Merges the editors of another document into this one
+
+        :param other: The stats to merge in
+        """
+        self.mergeAll([other])
+
+    def mergeAll(self, others: List['IndividualStats']):
+        """
+        Merges the editors of many documents into this one.
+        Editors are matched by their unsafe id, falling back to their id, see `EditorRegistry.find`
+
+        :param others: The stats to merge in
+        """
+        for other in others:
+            for editor, editorStats in other.editors.items():
+                # If the editor exists, we merge it. Else we make a new editor and merge that.
+                id = self.registry.ids[self.registry.intern(editor, editorStats.name, editorStats.unsafeId)]
+                if id not in self.editors:
+                    self.editors[id] = self.EditorStats()
+                self.editors[id].mergeIn(editorStats)
+            # Merge total changes
+            self.total.mergeIn(other.total)
         # Re-calculate percentages
         for editor in self.editors:
             if self.total.additions + self.total.removals != 0:
@@ -131,20 +174,127 @@ class IndividualStats:
 
 class TimelineStats:
     """
-    Collates stats calculated for the timeline
+    Collates stats calculated for the timeline.
+
+    The stats are stored in columns rather than as an `IndividualStats` per increment,
+    as a long document split into small increments has millions of them, most of which are empty.
+    Each of the additions, removals and changes is a dense increments by editors array,
+    with a mask of which editors appear in each increment, and the editors are indexed by their column.
+    The counts are only allocated once one is known, so a timeline from the official api is just the mask.
+    `increments` and `getIncrement` give views of the columns that behave like `IndividualStats`,
+    so the writers can read them the same way they read the individual stats.
     """
-    increments: List[IndividualStats]
     parent: 'DocStats'
 
-    def __init__(self, size, parent):
-        days, hours, mins = map(int, size.split(':'))
-        timeSize = (((days * 24) + hours) * 60 + mins) * 60 * 1000
-        self.incrementSize = timeSize
-        self.increments = []
+    def __init__(self, size, parent, registry: EditorRegistry = None):
+        self.incrementSize = incrementToMilli(size)
         self.timelineStart = 0
+        # If each increment holds the changes up to the time it is labelled with, as the official api's does,
+        # rather than the changes from that time until the next increment, as the unsafe api's does
+        self.labelIsEnd = False
         self.parent = ref(parent)
+        # The identities of the editors, shared with the individual stats. Each editor's column is their index in it
+        self.registry = EditorRegistry() if registry is None else registry
+        self._count = 0
+        self._allocate(0, 0, False)
+
+    def _allocate(self, rows, columns, counts):
+        """
+        Replaces the columns with empty ones of the given capacity
+
+        :param counts: If the counts are allocated, or only the mask of which editors are in each increment
+        """
+        self.present = np.zeros((rows, columns), dtype=bool)
+        self.columns: Dict[str, np.ndarray] = {}
+        self.totals: Dict[str, np.ndarray] = {}
+        if counts:
+            self._allocateCounts()
+
+    def _allocateCounts(self):
+        rows, columns = self.present.shape
+        self.columns = {field: np.full((rows, columns), UNKNOWN, dtype=COUNT_TYPE) for field in FIELDS}
+        self.totals = {field: np.full(rows, UNKNOWN, dtype=COUNT_TYPE) for field in FIELDS}
+
+    def hasCounts(self) -> bool:
+        """
+        :return: True if any of the counts are known, False if only the editors of each increment are
+        """
+        return bool(self.columns)
+
+    def _width(self) -> int:
+        """
+        :return: The number of editor columns in use.
+                 Editors only added to the registry by the individual stats may not have a column yet
+        """
+        return min(len(self.registry), self.present.shape[1])
+
+    def _columnOf(self, editorId) -> Optional[int]:
+        """
+        :return: The column of an editor, or None if they are not in the timeline
+        """
+        column = self.registry.byId.get(editorId)
+        return column if column is not None and column < self.present.shape[1] else None
+
+    def _arrays(self) -> List[np.ndarray]:
+        """
+        :return: Every array that has a row for each increment
+        """
+        return [self.present] + list(self.columns.values()) + list(self.totals.values())
+
+    def _clearRows(self, start, end):
+        """
+        Empties the given range of increments
+        """
+        for values in self._arrays():
+            values[start:end] = False if values.dtype == bool else UNKNOWN
+
+    def _reserve(self, rows, columns):
+        """
+        Grows the columns so that they can hold at least the given number of increments and editors.
+        The capacity is doubled each time, so that adding them one at a time takes amortised constant time
+        """
+        capacity, editorCapacity = self.present.shape
+        if rows <= capacity and columns <= editorCapacity:
+            return
+        present, counts, totals = self.present, self.columns, self.totals
+        self._allocate(max(rows, capacity * 2) if rows > capacity else capacity,
+                       max(columns, editorCapacity * 2) if columns > editorCapacity else editorCapacity, bool(counts))
+        self.present[:capacity, :editorCapacity] = present
+        for field in counts:
+            self.columns[field][:capacity, :editorCapacity] = counts[field]
+            self.totals[field][:capacity] = totals[field]
+
+    def __getstate__(self):
+        # Weak references can't be pickled, so the parent is re-linked by the parent when it is unpickled
+        state = dict(self.__dict__)
+        state['parent'] = None
+        # Only the part of the columns in use is kept
+        rows, columns = self._count, self._width()
+        state['present'] = self.present[:rows, :columns].copy()
+        state['columns'] = {field: values[:rows, :columns].copy() for field, values in self.columns.items()}
+        state['totals'] = {field: values[:rows].copy() for field, values in self.totals.items()}
+        return state
+
+    @property
+    def increments(self) -> 'IncrementList':
+        """
+        :return: A view of each increment, in order
+        """
+        return IncrementList(self)
+
+    def editorColumn(self, editorId, name=None) -> int:
+        """
+        Gets the column of an editor, adding them if they are not yet in the timeline
 
-    def getIncrement(self, id) -> IndividualStats:
+        :param editorId: The id of the editor
+        :param name: The name of the editor. Only used if they don't have one already
+        :return: The index of the editor's column
+        """
+        column = self.registry.intern(editorId, name)
+        self._reserve(self._count, len(self.registry))
+        return column
+
+    def getIncrement(self, id) -> 'IncrementStats':
         """
         Get the given increment.
 
@@ -153,14 +303,14 @@ class TimelineStats:
         """
         return self.increments[id]
 
-    def makeIncrement(self) -> IndividualStats:
+    def makeIncrement(self) -> 'IncrementStats':
         """
         Appends a new increment and adds it to the list
 
         :return: THe newly created increment
         """
-        self.increments.append(IndividualStats(self))
-        return self.increments[-1]
+        self.resize(self._count + 1)
+        return IncrementStats(self, self._count - 1)
 
     def removeIncrement(self, id):
         """
@@ -168,7 +318,63 @@ class TimelineStats:
 
         :param id: The increment to remove
         """
-        self.increments.pop(id)
+        row = range(self._count)[id]
+        for values in self._arrays():
+            values[row:self._count - 1] = values[row + 1:self._count]
+        self.resize(self._count - 1)
+
+    def resize(self, numIncrements):
+        """
+        Adds or removes increments at the end of the timeline, so that it has the given number of them.
+        New increments are empty
+
+        :param numIncrements: The number of increments to have
+        """
+        self._reserve(numIncrements, self._width())
+        self._clearRows(numIncrements, self._count)
+        self._count = numIncrements
+
+    def clear(self):
+        """
+        Removes every increment
+        """
+        self.resize(0)
+
+    def markPresent(self, rows, columns):
+        """
+        Marks editors as having edited in increments, without knowing how much they changed
+
+        :param rows: The increment of each edit
+        :param columns: The column of the editor of each edit, see `editorColumn`
+        """
+        self.present[rows, columns] = True
+
+    def setCounts(self, rows, columns, additions, removals, changes):
+        """
+        Sets how much editors changed in increments.
+        Each argument is an array with one element for each of the (increment, editor) pairs to set
+
+        :param rows: The increment of each pair
+        :param columns: The column of the editor of each pair, see `editorColumn`
+        :param additions: The number of characters added
+        :param removals: The number of characters removed
+        :param changes: The number of changes made
+        """
+        if not self.hasCounts():
+            self._allocateCounts()
+        self.present[rows, columns] = True
+        for field, values in zip(FIELDS, (additions, removals, changes)):
+            self.columns[field][rows, columns] = values
+
+    def calculateTotals(self):
+        """
+        Sets the total of each increment to the sum of it's editors.
+        Totals of zero are stored as unknown, the same as an increment with no known changes
+        """
+        for field in self.columns:
+            used = self.columns[field][:self._count, :self._width()]
+            totals = np.where(used > 0, used, 0).sum(axis=1)
+            self.totals[field][:self._count] = np.where(totals > 0, totals, UNKNOWN)
 
     def getIncrementSize(self) -> int:
         """
@@ -186,71 +392,322 @@ class TimelineStats:
         """
         :return: how many increments are stored
         """
-        return len(self.increments)
+        return self._count
+
+    def getActiveIncrements(self) -> List[int]:
+        """
+        :return: The ids of the increments that have at least one editor in them, in order
+        """
+        return np.flatnonzero(self.present[:self._count, :self._width()].any(axis=1)).tolist()
+
+    def _selectEditors(self, values: np.ndarray, editorIds, missing) -> np.ndarray:
+        """
+        :return: The columns of the given editors, in order. Editors not in the timeline are filled with `missing`
+        """
+        columns = [self._columnOf(editorId) for editorId in editorIds]
+        table = np.full((self._count, len(columns)), missing, dtype=values.dtype)
+        known = [i for i, column in enumerate(columns) if column is not None]
+        table[:, known] = values[:self._count, [columns[i] for i in known]]
+        return table
+
+    def getEditorPresence(self, editorIds) -> List[List[bool]]:
+        """
+        Reads which of a set of editors are in every increment at once, rather than an increment at a time
+
+        :param editorIds: The ids of the editors to read, in order
+        :return: A list for each increment, of whether each editor is in it
+        """
+        return self._selectEditors(self.present, editorIds, False).tolist()
+
+    def getEditorTable(self, field, editorIds) -> List[List[Optional[int]]]:
+        """
+        Reads the counts of a set of editors in every increment at once, rather than an increment at a time
+
+        :param field: The count to read. One of `FIELDS`
+        :param editorIds: The ids of the editors to read, in order
+        :return: A list for each increment, of the count of each editor.
+                 None if the editor is not in the increment or the count is not known
+        """
+        if not self.hasCounts():
+            return [[None] * len(editorIds) for _ in range(self._count)]
+        return [[None if value == UNKNOWN else value for value in row]
+                for row in self._selectEditors(self.columns[field], editorIds, UNKNOWN).tolist()]
+
+    def getEnd(self):
+        """
+        :return: The time the last increment ends at
+        """
+        return self.timelineStart + self._count * self.incrementSize
 
     def mergeIn(self, other: 'TimelineStats'):
         """
         Merges together two timelines.
-        Takes into account different starting dates.
-        Assumes they have the same increment size
+        See `mergeAll` for how they are lined up
 
         :param other: The other timeline to merge in
         """
+        self.mergeAll([other])
+
+    def mergeAll(self, others: List['TimelineStats']):
+        """
+        Merges many timelines into this one at once.
+        The increments are lined up by their offset from the earliest start, and any gaps are left as empty increments.
+        The columns are grown once to cover every timeline, and each increment of the others is only visited once,
+        so merging k timelines costs the same as adding them up rather than k separate merges.
+        Assumes they all have the same increment size
+
+        :param others: The timelines to merge in
+        """
+        if not others:
+            return
         incSize = self.incrementSize
-        selfIncs = list(self.increments)
-        otherIncs = list(other.increments)
-
-        selfStart = self.timelineStart
-        otherStart = other.timelineStart
-        selfEnd = selfStart + len(selfIncs) * incSize
-        otherEnd = otherStart + len(otherIncs) * incSize
-
-        self.increments = []
-
-        isOverlap = selfStart <= otherEnd + incSize / 3 and otherStart <= selfEnd + incSize / 3
-        if isOverlap:
-            # This is the earlier starter
-            if selfStart <= otherStart:
-                currentTime = selfStart
-                while currentTime <= otherStart:
-                    self.increments.append(selfIncs.pop(0))
-                    currentTime += self.incrementSize
-
-            # Other is the earlier starter
-            elif otherStart <= selfStart:
-                currentTime = otherStart
-                while currentTime <= selfStart:
-                    self.increments.append(otherIncs.pop(0))
-                    currentTime += self.incrementSize
-            # Add them all in for the duration of the overlap
-            while otherIncs and selfIncs:
-                inc = otherIncs.pop(0)
-                inc.mergeIn(selfIncs.pop(0))
-                self.increments.append(inc)
-            # One of the two is empty so we add both sequentially
-            while otherIncs:
-                self.increments.append(otherIncs.pop(0))
-            while selfIncs:
-                self.increments.append(selfIncs.pop(0))
+        start = min([self.timelineStart] + [other.timelineStart for other in others])
+        end = max([self.getEnd()] + [other.getEnd() for other in others])
+        selfOffset = round((self.timelineStart - start) / incSize)
+        count = round((end - start) / incSize)
+
+        # Shift our increments along if another timeline starts earlier
+        self._reserve(count, self._width())
+        if selfOffset > 0:
+            for values in self._arrays():
+                values[selfOffset:selfOffset + self._count] = values[:self._count].copy()
+            self._clearRows(0, selfOffset)
+        if not self.hasCounts() and any(other.hasCounts() for other in others):
+            self._allocateCounts()
+        self.timelineStart = start
+        self._count = selfOffset + self._count
+        self.resize(count)
+
+        for other in others:
+            self._addIn(other, round((other.timelineStart - start) / incSize))
+
+    def _addIn(self, other: 'TimelineStats', offset):
+        """
+        Adds the increments of another timeline to ours, which must already cover them
 
-        else:
-            if selfStart < otherStart:
-                # Self is the lower one
-                self.increments.extend(selfIncs)
-                diff = round((otherStart - selfEnd) / incSize)
-                self.increments.extend([IndividualStats(self) for _ in range(diff)])
-                self.increments.extend(otherIncs)
-            else:
-                # Other is the lower one
-                self.increments.extend(otherIncs)
-                diff = round((selfStart - otherEnd) / incSize)
-                self.increments.extend([IndividualStats(self) for _ in range(diff)])
-                self.increments.extend(selfIncs)
+        :param other: The timeline to add
+        :param offset: The increment of ours that lines up with the first increment of the other timeline
+        """
+        # Map the other editors onto our columns, adding any we don't have
+        width = other._width()
+        columns = np.array(self.registry.mapFrom(other.registry)[:width], dtype=np.intp)
+        self._reserve(self._count, len(self.registry))
+        rows = slice(offset, offset + other._count)
+        otherPresent = other.present[:other._count, :width]
+        for field in self.columns:
+            mine = self.columns[field][rows, columns]
+            theirs = other.columns[field][:other._count, :width] if other.hasCounts() else UNKNOWN
+            theirTotals = other.totals[field][:other._count] if other.hasCounts() else UNKNOWN
+            # Unknown counts are treated as zero when they are added to, the same as `EditorStats.mergeIn`
+            self.columns[field][rows, columns] = np.where(otherPresent,
+                                                          np.maximum(mine, 0) + np.maximum(theirs, 0), mine)
+            self.totals[field][rows] = np.maximum(self.totals[field][rows], 0) + np.maximum(theirTotals, 0)
+        self.present[rows, columns] |= otherPresent
+
+    def rollUp(self, size, parent) -> 'TimelineStats':
+        """
+        Derives a coarser timeline from this one, by adding up the increments that fall within each coarser increment.
+        The coarser increments are aligned the same way as if the stats had been collected with them,
+        so no more needs to be requested to get the same timeline at a lower resolution
+
+        :param size: The size of the coarser increments, in the format 'd:h:m'. Must be a multiple of ours
+        :param parent: The stats the coarser timeline belongs to. It shares our registry
+        :return: The coarser timeline
+        """
+        coarse = TimelineStats(size, parent, self.registry)
+        if coarse.incrementSize % self.incrementSize:
+            raise ValueError(f"Time increment {size} is not a multiple of the timeline's increment")
+        coarse.labelIsEnd = self.labelIsEnd
+        coarse.timelineStart = calculateTimelineStart(self.timelineStart, coarse.incrementSize)
+        if self._count == 0:
+            return coarse
+
+        # Find the coarser increment of each of ours. An increment that ends at it's label belongs to the coarser
+        # increment that ends at or after it, and one that starts at it's label to the one that starts at or before it
+        offsets = (self.timelineStart - coarse.timelineStart) + np.arange(self._count) * self.incrementSize
+        ratio = offsets / coarse.incrementSize
+        rows = (np.ceil(ratio) if self.labelIsEnd else np.floor(ratio)).astype(np.intp)
+        # Each run of our increments that fall in the same coarser increment is reduced at once
+        starts = np.flatnonzero(np.diff(rows, prepend=-1))
+        rows = rows[starts]
+        width = self._width()
+        coarse.resize(int(rows[-1]) + 1)
+        coarse._reserve(coarse._count, width)
+        coarse.present[rows, :width] = np.logical_or.reduceat(self.present[:self._count, :width], starts, axis=0)
+        if self.hasCounts():
+            coarse._allocateCounts()
+            for field in self.columns:
+                values = self.columns[field][:self._count, :width]
+                # A count is only unknown if none of the increments it covers know it
+                known = np.logical_or.reduceat(values != UNKNOWN, starts, axis=0)
+                sums = np.add.reduceat(np.maximum(values, 0), starts, axis=0)
+                coarse.columns[field][rows, :width] = np.where(known, sums, UNKNOWN)
+            coarse.calculateTotals()
+        return coarse
 
     def setTimelineStart(self, start):
         self.timelineStart = calculateTimelineStart(timeToMilli(start), self.incrementSize)
 
 
+class IncrementList(Sequence):
+    """
+    A read only view of the increments of a timeline, in order
+    """
+
+    def __init__(self, timeline: TimelineStats):
+        self.timeline = timeline
+
+    def __len__(self):
+        return self.timeline.getNumIncrements()
+
+    def __getitem__(self, id):
+        if isinstance(id, slice):
+            return [IncrementStats(self.timeline, row) for row in range(len(self))[id]]
+        return IncrementStats(self.timeline, range(len(self))[id])
+
+
+class IncrementStats:
+    """
+    A view of a single increment of a timeline.
+    Has the same accessors as `IndividualStats`, reading and writing straight through to the timeline's columns
+    """
+    __slots__ = ('timeline', 'row', 'editors')
+
+    def __init__(self, timeline: TimelineStats, row):
+        self.timeline = timeline
+        self.row = row
+        # The editors that edited in the increment, by their id
+        self.editors = IncrementEditors(self)
+
+    @property
+    def total(self) -> 'IncrementEditor':
+        """
+        :return: The total changes made in the increment
+        """
+        return IncrementEditor(self.timeline, self.row, None)
+
+    def getEditor(self, id) -> 'IncrementEditor':
+        """
+        Gets an editor's contributions
+        :param id: The id of the editor to get
+        :return: The edits they made in the increment
+        """
+        return self.editors[id]
+
+    def removeEditor(self, id):
+        """
+        Removes an editor from the increment
+
+        :param id: The id of the editor to remove
+        """
+        column = self.timeline._columnOf(id)
+        if column is None:
+            raise KeyError(id)
+        self.timeline.present[self.row, column] = False
+        for values in self.timeline.columns.values():
+            values[self.row, column] = UNKNOWN
+
+    def makeEditor(self, id) -> 'IncrementEditor':
+        """
+        Adds an editor to the increment, with no known changes.
+        Returns the newly made editor
+
+        :param id: The id of the editor just made
+        """
+        column = self.timeline.editorColumn(id)
+        self.timeline.present[self.row, column] = True
+        for values in self.timeline.columns.values():
+            values[self.row, column] = UNKNOWN
+        return IncrementEditor(self.timeline, self.row, column)
+
+    def getEditors(self) -> List[str]:
+        """
+        :return: The id's of all the editors in the increment
+        """
+        return list(self.editors)
+
+
+class IncrementEditors(Mapping):
+    """
+    A view of the editors of a single increment, by their id
+    """
+
+    def __init__(self, increment: IncrementStats):
+        self.timeline = increment.timeline
+        self.row = increment.row
+
+    def _presence(self) -> List[bool]:
+        # Small rows are quicker to read as a list than through numpy
+        return self.timeline.present[self.row, :self.timeline._width()].tolist()
+
+    def __getitem__(self, id) -> 'IncrementEditor':
+        column = self.timeline._columnOf(id)
+        if column is None or not self.timeline.present.item(self.row, column):
+            raise KeyError(id)
+        return IncrementEditor(self.timeline, self.row, column)
+
+    def __contains__(self, id):
+        column = self.timeline._columnOf(id)
+        return column is not None and self.timeline.present.item(self.row, column)
+
+    def __len__(self):
+        return sum(self._presence())
+
+    def __iter__(self) -> Iterator[str]:
+        return (editorId for editorId, present in zip(self.timeline.registry.ids, self._presence()) if present)
+
+
+def _countProperty(field):
+    def getter(self) -> Optional[int]:
+        if not self.timeline.hasCounts():
+            return None
+        if self.column is None:
+            value = self.timeline.totals[field].item(self.row)
+        else:
+            value = self.timeline.columns[field].item(self.row, self.column)
+        return None if value == UNKNOWN else value
+
+    def setter(self, value):
+        if not self.timeline.hasCounts():
+            if value is None:
+                return
+            self.timeline._allocateCounts()
+        values = self.timeline.totals[field] if self.column is None else self.timeline.columns[field]
+        index = self.row if self.column is None else (self.row, self.column)
+        values[index] = UNKNOWN if value is None else value
+
+    return property(getter, setter)
+
+
+class IncrementEditor:
+    """
+    A view of the changes one editor made in a single increment, or of the total if there is no editor.
+    Has the same attributes as `IndividualStats.EditorStats`, with None for the counts that are not known
+    """
+    __slots__ = ('timeline', 'row', 'column')
+
+    additions = _countProperty('additions')
+    removals = _countProperty('removals')
+    changes = _countProperty('changes')
+    # The percentages and unsafe ids are only kept for the document as a whole
+    percent = None
+    unsafeId = None
+
+    def __init__(self, timeline: TimelineStats, row, column):
+        self.timeline = timeline
+        self.row = row
+        self.column = column
+
+    @property
+    def name(self) -> Optional[str]:
+        return None if self.column is None else self.timeline.registry.names[self.column]
+
+    @name.setter
+    def name(self, name):
+        if self.column is not None:
+            self.timeline.registry.names[self.column] = name
+
+
 class DocStats:
     """
     Class to collate all the stats from each of the calculation phases
@@ -259,11 +716,63 @@ class DocStats:
     timeline: TimelineStats
     general: GeneralStats
 
-    def __init__(self, incrementSize):
-        self.timeline = TimelineStats(incrementSize, self)
-        self.individuals = IndividualStats(self)
+    def __init__(self, incrementSize, dateRange: DateRange = None):
+        """
+        :param incrementSize: The size of the timeline increments, in the format 'd:h:m'
+        :param dateRange: The range of time to collect the stats in. Defaults to the lifespan of the document
+        """
+        self.dateRange = DateRange() if dateRange is None else dateRange
+        # The individual stats and the timeline share the identities of the editors
+        self.registry = EditorRegistry()
+        self.timeline = TimelineStats(incrementSize, self, self.registry)
+        self.individuals = IndividualStats(self, self.registry)
         self.general = GeneralStats(self)
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for child in (self.timeline, self.individuals, self.general):
+            child.parent = ref(self)
+
     def mergeIn(self, other: 'DocStats'):
         self.individuals.mergeIn(other.individuals)
         self.timeline.mergeIn(other.timeline)
+
+    def mergeAll(self, others: List['DocStats']):
+        """
+        Merges the stats of many documents into this one.
+        The same as merging each in turn, but the timelines are all merged at once, see `TimelineStats.mergeAll`
+
+        :param others: The stats to merge in
+        """
+        self.individuals.mergeAll([other.individuals for other in others])
+        self.timeline.mergeAll([other.timeline for other in others])
+
+    def rollUp(self, incrementSize) -> 'DocStats':
+        """
+        Makes a copy of the stats with a coarser timeline, see `TimelineStats.rollUp`.
+        The general and individual stats are shared with the copy, as they don't depend on the increment size
+
+        :param incrementSize: The size of the coarser increments, in the format 'd:h:m'
+        :return: The stats with the coarser timeline
+        """
+        stats = DocStats(incrementSize, self.dateRange)
+        stats.registry, stats.individuals, stats.general = self.registry, self.individuals, self.general
+        stats.timeline = self.timeline.rollUp(incrementSize, stats)
+        return stats
+
+    def rollUpAll(self, incrementSizes) -> List['DocStats']:
+        """
+        Makes the stats at every one of the given resolutions.
+        The resolutions are built as a pyramid, each rolled up from the coarsest one before it that it is a multiple of,
+        so eg. weeks are added up from days rather than from every hour
+
+        :param incrementSizes: The sizes of the increments, in the format 'd:h:m', finest first.
+                               Each must be a multiple of the size the stats were collected with
+        :return: The stats at each resolution, in the same order. Stats at our own resolution are not copied
+        """
+        levels = [self]
+        for size in incrementSizes:
+            milli = incrementToMilli(size)
+            source = next(level for level in reversed(levels) if milli % level.timeline.incrementSize == 0)
+            levels.append(source if milli == source.timeline.incrementSize else source.rollUp(size))
+        return levels[1:]
@@ -0,0 +1,172 @@
+from typing import Iterator, List
+
+from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest
+
+from .HttpPool import HttpPool
+from .Metrics import metrics
+
+# The fields of each resource that the collectors use. Everything else is left out of the responses.
+FILE_FIELDS = "id,title,mimeType,selfLink,createdDate"
+LIST_FIELDS = f"{FILE_FIELDS},shortcutDetails"
+REVISION_FIELDS = "items(modifiedDate,lastModifyingUserName)"
+# The maximum number of calls google allows in a single batch request
+BATCH_SIZE = 100
+
+
+class DriveService:
+    """
+    Wraps the google drive service so that each resource is only requested once.
+    The collectors share a single instance, so the metadata of a file is fetched once no matter how many use it.
+
+    The responses are never refreshed, so a new instance should be made for each collection.
+    Use `forget` once a file has been collected, so that collecting a large folder doesn't keep every file's responses.
+    """
+
+    def __init__(self, service, http=None, batchUri=None):
+        """
+        :param service: The google drive v2 service to make the calls with
+        :param http: The http object that other requests for the same user are made with,
+                     usually the `HttpPool` the service was built with. Defaults to the service's own http object
+        :param batchUri: The url to send batch requests to. Defaults to the one google publishes for the api
+        """
+        self.service = service
+        self.http = http if http is not None else service._http
+        self.batchUri = batchUri
+        self._files = {}
+        self._revisions = {}
+
+    def getFile(self, fileId):
+        """
+        :param fileId: The id of the file to get
+        :return: The raw json of the file metadata. Same as `files().get`, limited to `FILE_FIELDS`
+        """
+        if fileId in self._files:
+            metrics.recordCacheHit('files.get')
+        else:
+            self._files[fileId] = self.service.files().get(fileId=fileId, fields=FILE_FIELDS).execute()
+        return self._files[fileId]
+
+    def listRevisions(self, fileId):
+        """
+        :param fileId: The id of the file to get the revisions of
+        :return: The raw json of the revision list. Same as `revisions().list`, limited to `REVISION_FIELDS`
+        """
+        if fileId in self._revisions:
+            metrics.recordCacheHit('revisions.list')
+        else:
+            self._revisions[fileId] = self.service.revisions().list(fileId=fileId, fields=REVISION_FIELDS).execute()
+        return self._revisions[fileId]
+
+    def storeFile(self, item):
+        """
+        Stores the metadata of a listed file, so that `getFile` does not need to request it
+
+        :param item: The raw json of the file, as listed by `iterFiles`
+        """
+        self._files[item['id']] = item
+
+    def forget(self, fileId):
+        """
+        Drops everything stored for a file, once it is no longer needed
+
+        :param fileId: The id of the file
+        """
+        self._files.pop(fileId, None)
+        self._revisions.pop(fileId, None)
+
+    def iterFiles(self, folderId, mimeTypes=None) -> Iterator[dict]:
+        """
+        Lists the files directly inside a folder, one page at a time.
+        Each page is only requested once the previous one has been used up.
+        The files are not stored, use `storeFile` for the ones that will be collected.
+
+        :param folderId: The id of the folder to list
+        :param mimeTypes: Only list the files of these types. None to list all of them
+        :return: The raw json of the metadata of each file
+        """
+        query = listQuery(folderId, mimeTypes)
+        pageToken = None
+        while True:
+            page = self.service.files().list(q=query, fields=f"nextPageToken,items({LIST_FIELDS})",
+                                              maxResults=1000, pageToken=pageToken).execute()
+            yield from page.get('items', [])
+            pageToken = page.get('nextPageToken')
+            if not pageToken:
+                break
+
+    def listFiles(self, folderId, mimeType=None) -> List[dict]:
+        """
+        Lists the files directly inside a folder.
+        Follows every page of the results, and stores each file so that `getFile` does not need to request it.
+
+        :param folderId: The id of the folder to list
+        :param mimeType: Only list the files of this type. None to list all of them
+        :return: The raw json of the metadata of each file
+        """
+        items = list(self.iterFiles(folderId, [mimeType] if mimeType else None))
+        for item in items:
+            self.storeFile(item)
+        return items
+
+    def prefetchRevisions(self, fileIds):
+        """
+        Requests the revision lists of many files, grouped into batch requests.
+        Any that fail are left to be requested again by `listRevisions`, which will raise the error.
+
+        :param fileIds: The ids of the files to get the revisions of
+        """
+        pending = [fileId for fileId in fileIds if fileId not in self._revisions]
+
+        def store(fileId, response, exception):
+            if exception is None:
+                self._revisions[fileId] = response
+
+        for i in range(0, len(pending), BATCH_SIZE):
+            if self.batchUri is None:
+                batch = self.service.new_batch_http_request(callback=store)
+            else:
+                batch = BatchHttpRequest(callback=store, batch_uri=self.batchUri)
+            for fileId in pending[i:i + BATCH_SIZE]:
+                batch.add(self.service.revisions().list(fileId=fileId, fields=REVISION_FIELDS), request_id=fileId)
+            batch.execute()
+
+
+def listQuery(folderId, mimeTypes=None) -> str:
+    """
+    Builds the query that lists the files in a folder
+
+    :param folderId: The id of the folder to list
+    :param mimeTypes: Only list the files of these types. None to list all of them
+    :return: The query to pass to `files.list`
+    """
+    query = f"'{folderId}' in parents and trashed = false"
+    if mimeTypes:
+        query += " and (" + " or ".join(f"mimeType = '{mimeType}'" for mimeType in mimeTypes) + ")"
+    return query
+
+
+def buildDriveService(pool: HttpPool, rootUrl=None) -> DriveService:
+    """
+    Builds a drive service that makes all of it's requests through a connection pool
+
+    :param pool: The pool to make the requests through
+    :param rootUrl: The server to make the requests to, eg. a local stand-in for testing. Defaults to google
+    :return: The new service, sharing the pool with any unsafe requests
+    """
+    if rootUrl is None:
+        return DriveService(build('drive', 'v2', http=pool), pool)
+    service = build('drive', 'v2', http=pool, client_options={'api_endpoint': f"{rootUrl}/drive/v2/"})
+    return DriveService(service, pool, f"{rootUrl}/batch/drive/v2")
+
+
+def wrapService(service) -> DriveService:
+    """
+    Wraps a google drive service in a `DriveService`, unless it already is one
+
+    :param service: The service to wrap
+    :return: A `DriveService` for the service
+    """
+    if isinstance(service, DriveService):
+        return service
+    return DriveService(service)
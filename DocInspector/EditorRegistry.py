@@ -0,0 +1,80 @@
+from typing import Dict, List, Optional
+
+
+class EditorRegistry:
+    """
+    Interns the identity of each editor to a dense index, so that stats can store their editors by position.
+
+    An editor is known by their id, which is their Drive name from the official api or their colour from the unsafe api,
+    and by their unsafe id if the unsafe api was used. The unsafe id is the same in every document,
+    while the colour is not, so editors are matched by their unsafe id first, falling back to their id.
+    Both are hash indexed, so finding an editor and mapping the editors of one registry onto another
+    take constant time per editor.
+
+    The stats of a document share a single registry, see `DocStats`.
+    """
+
+    def __init__(self):
+        # The id, name and unsafe id of each editor, by their index
+        self.ids: List[str] = []
+        self.names: List[Optional[str]] = []
+        self.unsafeIds: List[Optional[str]] = []
+        # The index of each editor, by their id and by their unsafe id
+        self.byId: Dict[str, int] = {}
+        self.byUnsafe: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, editorId, unsafeId=None) -> Optional[int]:
+        """
+        Looks up an editor, by their unsafe id if they have one, and otherwise by their id.
+        An editor with a different unsafe id to the one given is never matched
+
+        :param editorId: The id of the editor
+        :param unsafeId: The unsafe id of the editor, if it is known
+        :return: The index of the editor, or None if they have not been interned
+        """
+        if unsafeId is not None and unsafeId in self.byUnsafe:
+            return self.byUnsafe[unsafeId]
+        index = self.byId.get(editorId)
+        if index is not None and unsafeId is not None and self.unsafeIds[index] not in (None, unsafeId):
+            return None
+        return index
+
+    def intern(self, editorId, name=None, unsafeId=None) -> int:
+        """
+        Gets the index of an editor, adding them if they have not been interned yet.
+        Any name or unsafe id the editor doesn't have already is filled in
+
+        :param editorId: The id of the editor
+        :param name: The name of the editor
+        :param unsafeId: The unsafe id of the editor, if it is known
+        :return: The index of the editor
+        """
+        index = self.find(editorId, unsafeId)
+        if index is None:
+            index = len(self.ids)
+            # Two different editors can be given the same colour in different documents, so they are kept apart
+            if editorId in self.byId:
+                editorId = f"{editorId}:{unsafeId}"
+            self.ids.append(editorId)
+            self.names.append(name)
+            self.unsafeIds.append(None)
+            self.byId[editorId] = index
+        elif self.names[index] is None:
+            self.names[index] = name
+        if unsafeId is not None and self.unsafeIds[index] is None:
+            self.unsafeIds[index] = unsafeId
+            self.byUnsafe[unsafeId] = index
+        return index
+
+    def mapFrom(self, other: 'EditorRegistry') -> List[int]:
+        """
+        Interns every editor of another registry, eg. that of another document being merged in
+
+        :param other: The registry to map
+        :return: The index in this registry of each editor of the other one, by their index in the other one
+        """
+        return [self.intern(editorId, name, unsafeId)
+                for editorId, name, unsafeId in zip(other.ids, other.names, other.unsafeIds)]
@@ -1,5 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from math import floor
+from typing import List, Tuple
+
+import numpy as np
+
+# The format of each date of a date range, see `parseDateRange`
+DATE_FORMAT = "%d-%m-%Y"
+# A day in milliseconds
+DAY = 24 * 60 * 60 * 1000
+# How often the local time's offset from UTC can change, in milliseconds. Every timezone changes on a quarter hour
+OFFSET_STEP = 15 * 60 * 1000
 
 
 def timeToMilli(time):
@@ -13,6 +23,102 @@ def timeToMilli(time):
                              "%Y-%m-%dT%H:%M:%S.%fZ").timestamp() * 1000
 
 
+def timesToMilli(times) -> np.ndarray:
+    """
+    Converts many google revision timestamps into milliseconds since the Epoch at once.
+    Gives the same times as `timeToMilli`, without parsing each timestamp separately
+
+    :param times: The timestamps to convert
+    :return: An array of the timestamps in milliseconds
+    """
+    if not len(times):
+        return np.zeros(0, dtype=np.int64)
+    # numpy parses the timestamps in one go, but as UTC, while `timeToMilli` reads them as local time.
+    # The local offset is found once for each distinct day, and only for each quarter hour of the days it changes in
+    utc = np.array([time.rstrip('Z') for time in times], dtype='datetime64[ms]').astype(np.int64)
+    days, inverse = np.unique(utc // DAY, return_inverse=True)
+    dayOffsets = {day: _localOffset(day * DAY) for day in np.union1d(days, days + 1).tolist()}
+    offsets = np.array([dayOffsets[day] for day in days.tolist()], dtype=np.int64)[inverse]
+    changing = np.array([dayOffsets[day] != dayOffsets[day + 1] for day in days.tolist()])[inverse]
+    if changing.any():
+        steps, inverse = np.unique(utc[changing] // OFFSET_STEP, return_inverse=True)
+        offsets[changing] = np.array([_localOffset(step * OFFSET_STEP) for step in steps.tolist()],
+                                     dtype=np.int64)[inverse]
+    return utc + offsets
+
+
+def _localOffset(time) -> int:
+    """
+    :param time: A time read as UTC, in milliseconds
+    :return: How much to add to the time to read it as local time instead, the same as `timeToMilli` does
+    """
+    return round((datetime(1970, 1, 1) + timedelta(milliseconds=time)).timestamp() * 1000) - time
+
+
+def bucketTimes(times, start, incrementSize, labelIsEnd) -> np.ndarray:
+    """
+    Assigns times to increments with integer division, rather than stepping through every increment.
+    Increment i is labelled start + i * incrementSize, and the times before the first increment are put in it.
+    See `TimelineStats.labelIsEnd`
+
+    :param times: The times to bucket, in milliseconds
+    :param start: The label of the first increment, in milliseconds
+    :param incrementSize: The size of the increments, in milliseconds
+    :param labelIsEnd: If each increment holds the times after the previous label, up to and including it's own,
+                       rather than the times from it's label up to the next
+    :return: An array of the increment of each time
+    """
+    offsets = np.asarray(times, dtype=np.int64) - int(start)
+    rows = -(-offsets // int(incrementSize)) if labelIsEnd else offsets // int(incrementSize)
+    return np.maximum(rows, 0).astype(np.intp)
+
+
+def occupiedBuckets(rows) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the increments that times were bucketed into, see `bucketTimes`, without visiting the empty ones between
+
+    :param rows: The increment of each time, in order
+    :return: (The occupied increments, The index of the first time in each of them)
+    """
+    rows = np.asarray(rows)
+    starts = np.flatnonzero(np.diff(rows, prepend=-1))
+    return rows[starts], starts
+
+
+def incrementToMilli(size) -> int:
+    """
+    Converts a timeline increment into milliseconds
+
+    :param size: The increment, in the format 'd:h:m'
+    :return: The increment in milliseconds
+    """
+    days, hours, mins = map(int, size.split(':'))
+    return (((days * 24) + hours) * 60 + mins) * 60 * 1000
+
+
+def parseIncrements(text) -> List[str]:
+    """
+    Parses the timeline increments from the command line, in the format "d:h:m,d:h:m".
+    The stats are collected at the finest increment, and the coarser ones are rolled up from it,
+    so every increment must be a multiple of the finest one
+
+    :param text: The increments to parse, separated by commas
+    :return: The increments in the format 'd:h:m', finest first and without duplicates
+    :raise ValueError: If an increment is not in the right format, or is not a multiple of the finest
+    """
+    sizes = {}
+    for size in text.split(','):
+        size = size.strip()
+        if len(size.split(':')) != 3 or incrementToMilli(size) <= 0:
+            raise ValueError(f"Time increment {size} is not in the format d:h:m")
+        sizes.setdefault(incrementToMilli(size), size)
+    finest = min(sizes)
+    for milli, size in sizes.items():
+        if milli % finest:
+            raise ValueError(f"Time increment {size} is not a multiple of the finest increment {sizes[finest]}")
+    return [sizes[milli] for milli in sorted(sizes)]
+
+
 def calculateTimelineStart(start, incrementSize):
     """
     Calculates the time to start the first revision at
@@ -21,3 +127,63 @@ def calculateTimelineStart(start, incrementSize):
     :return: start, rounded down to the nearest increment
     """
     return floor(start / incrementSize) * incrementSize
+
+
+class DateRange:
+    """
+    A range of time to collect the stats in, in milliseconds since the Epoch.
+    The start is included and the end is not. Either can be None, for no limit
+    """
+
+    def __init__(self, start=None, end=None):
+        """
+        :param start: The start of the range, or None to start at the creation of the document
+        :param end: The end of the range, or None to end at the last revision
+        """
+        self.start = start
+        self.end = end
+
+    def isLimited(self) -> bool:
+        """
+        :return: True if either end of the range is limited, False if it covers all time
+        """
+        return self.start is not None or self.end is not None
+
+    def contains(self, time) -> bool:
+        """
+        :param time: The time to check, in milliseconds
+        :return: True if the time is within the range
+        """
+        return (self.start is None or time >= self.start) and (self.end is None or time < self.end)
+
+    def containsAll(self, times: np.ndarray) -> np.ndarray:
+        """
+        :param times: The times to check, in milliseconds
+        :return: An array of if each time is within the range
+        """
+        inRange = np.ones(len(times), dtype=bool)
+        if self.start is not None:
+            inRange &= times >= self.start
+        if self.end is not None:
+            inRange &= times < self.end
+        return inRange
+
+
+def parseDateRange(text) -> DateRange:
+    """
+    Parses a date range from the command line, in the format "dd-mm-yyyy/dd-mm-yyyy".
+    Both dates are included, so the range ends at the end of the second date. Either date can be left blank for no limit
+
+    :param text: The date range to parse
+    :return: The parsed range, in the same local time as `timeToMilli`
+    :raise ValueError: If the range is not in the right format, or it ends before it starts
+    """
+    dates = text.split('/')
+    if len(dates) != 2:
+        raise ValueError(f"Date range {text} is not in the format dd-mm-yyyy/dd-mm-yyyy")
+    start, end = (date.strip() for date in dates)
+    start = datetime.strptime(start, DATE_FORMAT).timestamp() * 1000 if start else None
+    end = (datetime.strptime(end, DATE_FORMAT) + timedelta(days=1)).timestamp() * 1000 if end else None
+    if start is not None and end is not None and end <= start:
+        raise ValueError(f"Date range {text} ends before it starts")
+    return DateRange(start, end)
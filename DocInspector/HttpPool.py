@@ -0,0 +1,140 @@
+import threading
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from httplib2 import Http
+
+from .Metrics import metrics
+from .Scheduler import RequestScheduler
+from .Tracing import span
+
+# The default number of connections kept open to each host
+CONNECTIONS_PER_HOST = 10
+
+
+class HttpPool:
+    """
+    A thread-safe pool of keep-alive connections, shared by every requester in a run.
+    Each connection is a `httplib2.Http` that is only ever used for one host, by one thread at a time.
+    Idle connections are kept open and reused, and the number open to each host is capped.
+
+    The requests are authorised centrally, so the credentials are only refreshed once when they expire,
+    no matter how many threads are making requests.
+    It has the same `request` method as `httplib2.Http`, so it can be given to the google client in place of one.
+    """
+
+    def __init__(self, credentials=None, connectionsPerHost=CONNECTIONS_PER_HOST, scheduler: RequestScheduler = None,
+                 timeout=None):
+        """
+        :param credentials: The oauth2client credentials to authorise the requests with. None to not authorise.
+        :param connectionsPerHost: The maximum number of connections to have open to each host.
+                                   Requests past this wait for a connection to be free
+        :param scheduler: Optional scheduler to rate limit and retry the requests with
+        :param timeout: The socket timeout of each connection in seconds. None for no timeout
+        """
+        # The google client looks here for the credentials, to authorise batch requests
+        self.credentials = credentials
+        self.connectionsPerHost = connectionsPerHost
+        self.scheduler = scheduler
+        self.timeout = timeout
+        self._idle: Dict[str, List[Http]] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._refreshLock = threading.Lock()
+
+    def _slotsFor(self, host) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.connectionsPerHost)
+            return self._slots[host]
+
+    def _take(self, host) -> Http:
+        """
+        :return: An idle connection to the host, or a new one if there are none
+        """
+        with self._lock:
+            idle = self._idle.get(host)
+            if idle:
+                return idle.pop()
+        return Http(timeout=self.timeout)
+
+    def _give(self, host, http: Http):
+        """
+        Returns a connection to the pool, once it's request is finished
+        """
+        with self._lock:
+            self._idle.setdefault(host, []).append(http)
+
+    def _refresh(self, staleToken):
+        """
+        Refreshes the credentials, unless another thread already has.
+
+        :param staleToken: The token that was found to be invalid
+        """
+        with self._refreshLock:
+            if self.credentials.access_token == staleToken:
+                self.credentials.refresh(Http(timeout=self.timeout))
+
+    def _authorise(self, headers) -> str:
+        """
+        Adds the authorisation header, refreshing the credentials first if they have expired
+
+        :param headers: The headers to add to
+        :return: The token that was used
+        """
+        if self.credentials.access_token is None or self.credentials.access_token_expired:
+            self._refresh(self.credentials.access_token)
+        token = self.credentials.access_token
+        headers['Authorization'] = f"Bearer {token}"
+        return token
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs) -> Tuple[dict, bytes]:
+        """
+        Makes a request using one of the pool's connections.
+        Mirrors `httplib2.Http.request`. Each attempt is recorded in the run's `RequestMetrics`.
+
+        :param uri: The full url to request
+        :param method: The http method
+        :param body: The body to send, if any
+        :param headers: Any extra headers to send
+        :param kwargs: Any other arguments to `httplib2.Http.request`
+        :return: A tuple of (response, content)
+        """
+        with span("request", "request", method=method, url=uri) as details:
+            send = metrics.wrap(self._request, uri)
+            if self.scheduler is None:
+                response, content = send(uri, method, body, headers, **kwargs)
+            else:
+                response, content = self.scheduler.request(send, uri, method, body, headers, **kwargs)
+            details['status'] = response['status']
+            return response, content
+
+    def _request(self, uri, method="GET", body=None, headers=None, **kwargs) -> Tuple[dict, bytes]:
+        host = urlsplit(uri).netloc
+        headers = dict(headers or {})
+        with self._slotsFor(host):
+            http = self._take(host)
+            try:
+                if self.credentials is None:
+                    return http.request(uri, method, body, headers, **kwargs)
+                token = self._authorise(headers)
+                response, content = http.request(uri, method, body, headers, **kwargs)
+                if response.status == 401:
+                    # The token may have been revoked early, so we refresh and try once more
+                    self._refresh(token)
+                    self._authorise(headers)
+                    response, content = http.request(uri, method, body, headers, **kwargs)
+                return response, content
+            finally:
+                # A connection that failed part way is closed by httplib2, and reopened on it's next use
+                self._give(host, http)
+
+    def close(self):
+        """
+        Closes all the idle connections
+        """
+        with self._lock:
+            for connections in self._idle.values():
+                for http in connections:
+                    http.close()
+            self._idle = {}
@@ -1,29 +1,42 @@
-from typing import List, Tuple, Optional
+from itertools import islice
+from typing import Iterator, List, Tuple, Optional
 
 from DocInspector import DocStats
 from DocInspector.Collectors import *
+from DocInspector.DriveService import wrapService, BATCH_SIZE
+from DocInspector.ProcessPool import collectInProcesses
+from DocInspector.Tracing import span
 
 FOLDER_MIME = "application/vnd.google-apps.folder"
 FILE__MIME = "application/vnd.google-apps.document"
+SHORTCUT_MIME = "application/vnd.google-apps.shortcut"
 
 
-def collectFromFile(fileId, service, incrementSize, unsafeLevel):
+def collectFromFile(fileId, service, incrementSize, unsafeLevel, options=None):
+    # Share the drive metadata between all the collectors
+    service = wrapService(service)
+
     # Build docstats
-    docStats = DocStats(incrementSize)
+    docStats = DocStats(incrementSize, options.dateRange if options else None)
     docStats.general.id = fileId
 
-    # Get general stats
-    collectGeneralStats(docStats, service)
+    with span("collectFromFile", "document", fileId=fileId):
+        # Get general stats
+        with span("collectGeneralStats"):
+            collectGeneralStats(docStats, service)
 
-    # Get individual stats
-    collectIndividualStats(docStats, service)
+        # Get individual stats
+        with span("collectIndividualStats"):
+            collectIndividualStats(docStats, service)
 
-    #  Get timeline stats
-    collectTimelineStats(docStats, service)
+        #  Get timeline stats
+        with span("collectTimelineStats"):
+            collectTimelineStats(docStats, service)
 
-    if unsafeLevel > 0:
-        # Get unsafe Stats
-        collectUnsafeStats(docStats, service, unsafeLevel > 1)
+        if unsafeLevel > 0:
+            # Get unsafe Stats
+            with span("collectUnsafeStats"):
+                collectUnsafeStats(docStats, service, unsafeLevel > 1, options)
     return docStats
 
 
@@ -35,10 +48,56 @@ def getFilesInFolder(service, id) -> Optional[List]:
     :param id: The id of the folder
     :return: The ids of the child files
     """
-    children = service.children().list(folderId=id).execute()
-    children = [child['id'] for child in children['items']]
-    children = [child for child in children if getMimeType(service, child) == FILE__MIME]
-    return children
+    return list(walkFolder(service, id))
+
+
+def resolveShortcut(item) -> Tuple[str, str]:
+    """
+    Gets the id and mime type of the file an item points to.
+    This is the target for shortcuts, and the item itself for everything else.
+
+    :param item: The raw json of the item
+    :return: The id and mime type of the file
+    """
+    if item['mimeType'] == SHORTCUT_MIME:
+        details = item.get('shortcutDetails', {})
+        return details.get('targetId'), details.get('targetMimeType')
+    return item['id'], item['mimeType']
+
+
+def walkFolder(service, folderId, maxDepth=1) -> Iterator[str]:
+    """
+    Walks through a folder and it's sub-folders, yielding each document as soon as it is found.
+    Each listing is only read one page at a time, so the walk can be stopped or consumed as slowly as needed.
+    Documents that are reached more than once, eg. through a shortcut, are only yielded the first time.
+
+    :param service: The drive service to request with
+    :param folderId: The id of the folder to walk
+    :param maxDepth: How many levels of folders to walk. 1 for only the folder itself, 0 for no limit
+    :return: The ids of the documents found
+    """
+    mimeTypes = [FILE__MIME, FOLDER_MIME, SHORTCUT_MIME]
+    seen = {folderId}
+    # Depth first, so at most one listing is open for each level
+    listings = [(service.iterFiles(folderId, mimeTypes), 1)]
+    while listings:
+        listing, depth = listings[-1]
+        item = next(listing, None)
+        if item is None:
+            listings.pop()
+            continue
+
+        itemId, mimeType = resolveShortcut(item)
+        if itemId is None or itemId in seen:
+            continue
+        seen.add(itemId)
+        if mimeType == FILE__MIME:
+            # Only the documents themselves are stored, as the listing of a shortcut isn't the document's metadata
+            if item['id'] == itemId:
+                service.storeFile(item)
+            yield itemId
+        elif mimeType == FOLDER_MIME and (maxDepth <= 0 or depth < maxDepth):
+            listings.append((service.iterFiles(itemId, mimeTypes), depth + 1))
 
 
 def getMimeType(service, id) -> str:
@@ -49,36 +108,76 @@ def getMimeType(service, id) -> str:
     :param id: The ID of the item to check
     :return: True if it's a folder. False if it's a file. None if it's neither
     """
-    data = service.files().get(fileId=id).execute()
+    data = service.getFile(id)
     return data['mimeType'] or ""
 
 
-def collectFromFolder(folderId, service, incrementSize, unsafeLevel) -> Tuple[DocStats, List[DocStats]]:
+def collectFromFolder(folderId, service, incrementSize, unsafeLevel, options=None, processes=0,
+                      serviceFactory=None, depth=1) -> Tuple[DocStats, List[DocStats]]:
+    """
+    Collects the stats for every file in a folder, and merges them together.
+    Files are collected as soon as they are found, rather than after the whole folder has been listed.
+
+    :param folderId: The id of the folder to collect
+    :param service: The drive service to request with
+    :param incrementSize: The size of the timeline increments, in the format 'd:h:m'
+    :param unsafeLevel: 0 for no unsafe stats, 1 for the unsafe stats and 2 for the fine unsafe stats
+    :param options: The options that control how the unsafe api is requested
+    :param processes: The number of worker processes to collect the files in. 0 to collect them in this process
+    :param serviceFactory: A picklable callable that builds a new drive service for each worker process.
+                           Required if using worker processes
+    :param depth: How many levels of sub-folders to collect. 1 for only the folder itself, 0 for no limit
+    :return: The stats for the folder as a whole, and the stats for each file
+    """
     print("Processing folder")
-    fileIds = getFilesInFolder(service, folderId)
+    service = wrapService(service)
+    fileIds = walkFolder(service, folderId, depth)
     fileStats = []
 
     # Do stats for all files
-    globalStats = DocStats(incrementSize)
+    globalStats = DocStats(incrementSize, options.dateRange if options else None)
     globalStats.general.id = folderId
     collectGeneralStats(globalStats, service)
 
-    for fileId in fileIds:
-        print(f"Processing file: {fileId}")
-        fileStats.append(collectFromFile(fileId, service, incrementSize, unsafeLevel))
-        globalStats.mergeIn(fileStats[-1])
-    globalStats.general.creationDate = fileStats[0].general.creationDate
+    if processes > 0:
+        print(f"Processing files in {processes} processes")
+        for fileId, stats in collectInProcesses(fileIds, serviceFactory, incrementSize, unsafeLevel, options,
+                                                processes):
+            fileStats.append(stats)
+            # The file was listed here but collected by a worker, so only it's listing is dropped
+            service.forget(fileId)
+    else:
+        # The files are taken a batch at a time, so that their revisions can be requested together
+        while True:
+            batch = list(islice(fileIds, BATCH_SIZE))
+            if not batch:
+                break
+            with span("prefetchRevisions", files=len(batch)):
+                service.prefetchRevisions(batch)
+            for fileId in batch:
+                print(f"Processing file: {fileId}")
+                fileStats.append(collectFromFile(fileId, service, incrementSize, unsafeLevel, options))
+                # The file's responses are no longer needed, so memory stays flat however big the folder is
+                service.forget(fileId)
+    # The files are merged all at once, so the folder's timeline is only grown once
+    with span("mergeFiles", files=len(fileStats)):
+        globalStats.mergeAll(fileStats)
+    if fileStats:
+        globalStats.general.creationDate = fileStats[0].general.creationDate
 
     return globalStats, fileStats
 
 
-def tryCollectFromId(fileId, service, incrementSize, unsafeLevel):
+def tryCollectFromId(fileId, service, incrementSize, unsafeLevel, options=None, processes=0, serviceFactory=None,
+                     depth=1):
+    service = wrapService(service)
     itemType = getMimeType(service, fileId)
     if itemType == FOLDER_MIME:
-        return collectFromFolder(fileId, service, incrementSize, unsafeLevel)
+        return collectFromFolder(fileId, service, incrementSize, unsafeLevel, options, processes, serviceFactory,
+                                 depth)
     elif itemType == FILE__MIME:
         print("Processing file")
-        docStats = collectFromFile(fileId, service, incrementSize, unsafeLevel)
+        docStats = collectFromFile(fileId, service, incrementSize, unsafeLevel, options)
         return docStats, None
     else:
         print(f"Unknown file type. '{itemType}'")
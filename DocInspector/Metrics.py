@@ -0,0 +1,284 @@
+import threading
+import time
+from functools import wraps
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+# The upper bounds of the latency histogram buckets, in seconds. Anything slower goes in a final overflow bucket
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# The status recorded for an attempt that failed without a response, eg. a dropped connection
+ERROR_STATUS = 'error'
+
+
+def endpointName(url) -> str:
+    """
+    Works out which api call a url is for.
+    This is finer grained than `RequestScheduler.endpointOf`, which groups the calls by their quota.
+
+    :param url: The url being requested
+    :return: The name of the endpoint, eg. 'showrevision', 'tiles', 'files.get' or 'revisions.list'
+    """
+    path = urlsplit(url).path.rstrip('/')
+    if path.endswith('/showrevision'):
+        return 'showrevision'
+    if path.endswith('/revisions/tiles'):
+        return 'tiles'
+    if '/batch/' in path or path.endswith('/batch'):
+        return 'batch'
+    segments = path.split('/drive/v2/', 1)[-1].split('/')
+    if segments[0] != 'files':
+        return 'other'
+    if len(segments) == 1:
+        return 'files.list'
+    if len(segments) == 2:
+        return 'files.get'
+    return f"{segments[2]}.{'list' if len(segments) == 3 else 'get'}"
+
+
+class EndpointMetrics:
+    """
+    The counters of a single endpoint.
+    Every attempt is counted, so a request that was retried twice adds three attempts and two retries.
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.retries = 0
+        self.cacheHits = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.statuses: Dict[str, int] = {}
+        # One count for each of `LATENCY_BUCKETS`, and one more for the attempts slower than all of them
+        self.latencies: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @property
+    def requests(self) -> int:
+        """
+        :return: The number of requests made, not counting their retries
+        """
+        return self.attempts - self.retries
+
+    def record(self, status, size, seconds, retry=False):
+        """
+        :param status: The status code of the attempt, or `ERROR_STATUS` if there was no response
+        :param size: The size of the response content, in bytes
+        :param seconds: How long the attempt took
+        :param retry: If the attempt was a retry of an earlier one
+        """
+        self.attempts += 1
+        self.retries += retry
+        self.bytes += size
+        self.seconds += seconds
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        self.latencies[bucket] += 1
+
+    def percentile(self, fraction) -> float:
+        """
+        Estimates a percentile of the latency from the histogram
+
+        :param fraction: The percentile to estimate, eg. 0.5 for the median
+        :return: The upper bound of the bucket the percentile falls in, in seconds.
+                 Infinite if it is in the overflow bucket, and 0 if nothing was recorded
+        """
+        target = fraction * sum(self.latencies)
+        total = 0
+        for bucket, count in enumerate(self.latencies):
+            total += count
+            if count and total >= target:
+                return LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else float('inf')
+        return 0.0
+
+    def mergeIn(self, other: 'EndpointMetrics'):
+        """
+        Merges the counters of another endpoint into this one
+
+        :param other: The counters to merge in
+        """
+        self.attempts += other.attempts
+        self.retries += other.retries
+        self.cacheHits += other.cacheHits
+        self.bytes += other.bytes
+        self.seconds += other.seconds
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.latencies = [mine + theirs for mine, theirs in zip(self.latencies, other.latencies)]
+
+    def toDict(self) -> dict:
+        """
+        :return: The counters in a json compatible format
+        """
+        return {'requests': self.requests, 'attempts': self.attempts, 'retries': self.retries,
+                'cacheHits': self.cacheHits, 'bytes': self.bytes, 'seconds': self.seconds,
+                'statuses': dict(self.statuses),
+                'latencies': {('+inf' if bucket == len(LATENCY_BUCKETS) else str(LATENCY_BUCKETS[bucket])): count
+                              for bucket, count in enumerate(self.latencies)}}
+
+
+class RequestMetrics:
+    """
+    Counts the requests, response bytes, latencies, retries and status codes of each endpoint over a run.
+    Every requester records into the same instance through the http object it uses, see `HttpPool`,
+    and the requests the caches save are counted as cache hits.
+
+    It is thread-safe, and can be pickled to send the counts of a worker process back to the parent.
+    """
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint) -> EndpointMetrics:
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = EndpointMetrics()
+        return self.endpoints[endpoint]
+
+    def record(self, endpoint, status, size, seconds, retry=False):
+        """
+        Records a single attempt at a request
+
+        :param endpoint: The name of the endpoint, see `endpointName`
+        :param status: The status code of the attempt, or `ERROR_STATUS` if there was no response
+        :param size: The size of the response content, in bytes
+        :param seconds: How long the attempt took
+        :param retry: If the attempt was a retry of an earlier one
+        """
+        with self._lock:
+            self._endpoint(endpoint).record(status, size, seconds, retry)
+
+    def recordCacheHit(self, endpoint):
+        """
+        Records a request that was served from a cache, rather than being made
+
+        :param endpoint: The name of the endpoint, see `endpointName`
+        """
+        with self._lock:
+            self._endpoint(endpoint).cacheHits += 1
+
+    def wrap(self, send, url):
+        """
+        Wraps a function that makes a request, so that each call to it is recorded as an attempt.
+        Every call after the first is counted as a retry, so it should be wrapped once per request.
+
+        :param send: The function that makes the request, returning a tuple of (response, content)
+        :param url: The url being requested
+        :return: The wrapped function
+        """
+        endpoint = endpointName(url)
+        attempts = 0
+
+        @wraps(send)
+        def recorded(*args, **kwargs):
+            nonlocal attempts
+            attempts += 1
+            start = time.perf_counter()
+            try:
+                response, content = send(*args, **kwargs)
+            except Exception:
+                self.record(endpoint, ERROR_STATUS, 0, time.perf_counter() - start, attempts > 1)
+                raise
+            self.record(endpoint, response['status'], len(content), time.perf_counter() - start, attempts > 1)
+            return response, content
+
+        return recorded
+
+    def wrapAsync(self, send, url):
+        """
+        The async mirror of `wrap`
+
+        :param send: The coroutine function that makes the request, returning a tuple of (response, content)
+        :param url: The url being requested
+        :return: The wrapped coroutine function
+        """
+        endpoint = endpointName(url)
+        attempts = 0
+
+        @wraps(send)
+        async def recorded(*args, **kwargs):
+            nonlocal attempts
+            attempts += 1
+            start = time.perf_counter()
+            try:
+                response, content = await send(*args, **kwargs)
+            except Exception:
+                self.record(endpoint, ERROR_STATUS, 0, time.perf_counter() - start, attempts > 1)
+                raise
+            self.record(endpoint, response['status'], len(content), time.perf_counter() - start, attempts > 1)
+            return response, content
+
+        return recorded
+
+    def mergeIn(self, other: 'RequestMetrics'):
+        """
+        Merges the counts of another instance into this one, eg. those of a worker process
+
+        :param other: The metrics to merge in
+        """
+        with self._lock:
+            for endpoint, counters in other.endpoints.items():
+                self._endpoint(endpoint).mergeIn(counters)
+
+    def drain(self) -> 'RequestMetrics':
+        """
+        Takes everything recorded so far, leaving this instance empty
+
+        :return: A new instance holding the counts that were taken
+        """
+        drained = RequestMetrics()
+        with self._lock:
+            drained.endpoints, self.endpoints = self.endpoints, {}
+        return drained
+
+    def reset(self):
+        """
+        Clears everything recorded so far
+        """
+        with self._lock:
+            self.endpoints = {}
+
+    def toDict(self) -> Dict[str, dict]:
+        """
+        :return: The counters of each endpoint in a json compatible format
+        """
+        with self._lock:
+            return {endpoint: counters.toDict() for endpoint, counters in sorted(self.endpoints.items())}
+
+    def summary(self) -> str:
+        """
+        :return: A table of the counters of each endpoint, for printing at the end of a run
+        """
+        header = (f"{'endpoint':<16} {'requests':>8} {'retries':>7} {'cached':>7} {'bytes':>12} "
+                  f"{'p50':>7} {'p95':>7} {'p99':>7}  statuses")
+        lines = [header]
+        with self._lock:
+            for endpoint, counters in sorted(self.endpoints.items()):
+                statuses = ", ".join(f"{status}: {count}" for status, count in sorted(counters.statuses.items()))
+                lines.append(f"{endpoint:<16} {counters.requests:>8} {counters.retries:>7} {counters.cacheHits:>7} "
+                             f"{counters.bytes:>12} " +
+                             " ".join(f"{_formatSeconds(counters.percentile(fraction)):>7}"
+                                      for fraction in (0.5, 0.95, 0.99)) +
+                             f"  {statuses}")
+        return "\n".join(lines)
+
+
+def _formatSeconds(seconds) -> str:
+    if seconds == 0:
+        return "-"
+    if seconds == float('inf'):
+        return f">{LATENCY_BUCKETS[-1]}s"
+    return f"<{seconds * 1000:g}ms" if seconds < 1 else f"<{seconds:g}s"
+
+
+# The metrics of the whole run
+metrics = RequestMetrics()
@@ -0,0 +1,168 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, Tuple
+
+from oauth2client.client import OAuth2Credentials
+
+from DocInspector.DocStats import DocStats
+from DocInspector.DriveService import DriveService, buildDriveService
+from DocInspector.HttpPool import CONNECTIONS_PER_HOST, HttpPool
+from DocInspector.Metrics import RequestMetrics, metrics
+from DocInspector.Scheduler import RequestScheduler
+
+# The service of the current worker process. Made once per worker by `_initWorker`
+_workerService = None
+
+
+class DriveServiceFactory:
+    """
+    Builds a new drive service from a set of credentials.
+    This can be pickled, so that each worker process can build it's own service and connection pool.
+    """
+
+    def __init__(self, credentials, scheduler: RequestScheduler = None, connectionsPerHost=CONNECTIONS_PER_HOST,
+                 rootUrl=None):
+        """
+        :param credentials: The oauth2client credentials to authorise the services with. None to not authorise
+        :param scheduler: Optional scheduler to make the requests through. Each process gets it's own copy,
+                          so it should be scaled down by the number of processes
+        :param connectionsPerHost: The maximum number of connections each process has open to each host
+        :param rootUrl: The server to make the drive requests to. Defaults to google
+        """
+        self.credentialsJson = credentials.to_json() if credentials is not None else None
+        self.scheduler = scheduler
+        self.connectionsPerHost = connectionsPerHost
+        self.rootUrl = rootUrl
+
+    def __call__(self) -> DriveService:
+        credentials = OAuth2Credentials.from_json(self.credentialsJson) if self.credentialsJson else None
+        return buildDriveService(HttpPool(credentials, self.connectionsPerHost, self.scheduler), self.rootUrl)
+
+
+def _initWorker(serviceFactory):
+    """
+    Sets up a worker process with it's own service
+
+    :param serviceFactory: A picklable callable that builds the drive service
+    """
+    global _workerService
+    _workerService = serviceFactory()
+
+
+def _collectInWorker(fileId, incrementSize, unsafeLevel, options) -> Tuple[DocStats, RequestMetrics]:
+    """
+    Collects the stats of a single file inside a worker process.
+    The requests made for it are sent back too, so the parent can add them to the run's metrics
+    """
+    # Imported here as LoadStats imports this module
+    from DocInspector.LoadStats import collectFromFile
+    try:
+        return collectFromFile(fileId, _workerService, incrementSize, unsafeLevel, options), metrics.drain()
+    except Exception:
+        # The requests made for a failed file are dropped, so they are not counted against the next one
+        metrics.reset()
+        raise
+    finally:
+        # Each worker collects many files, so it only keeps the responses of the one it is collecting
+        _workerService.forget(fileId)
+
+
+def _makePool(serviceFactory, processes) -> ProcessPoolExecutor:
+    """
+    :return: A new pool of worker processes, each with it's own service
+    """
+    return ProcessPoolExecutor(max_workers=processes, initializer=_initWorker, initargs=(serviceFactory,))
+
+
+def _isLost(future) -> bool:
+    """
+    :return: True if the future was lost when it's pool broke, rather than finishing
+    """
+    return not future.done() or isinstance(future.exception(), BrokenProcessPool)
+
+
+def collectInProcesses(fileIds: Iterable[str], serviceFactory, incrementSize, unsafeLevel, options=None,
+                       processes=None, queueSize=None) -> Iterator[Tuple[str, DocStats]]:
+    """
+    Collects the stats of each file in a pool of worker processes.
+    Files are sent to the workers as soon as they are taken from `fileIds`, with a bounded number waiting at once,
+    so a lazily listed folder starts being collected straight away.
+
+    Files that fail are reported and skipped, so one bad file does not stop the others.
+    If a worker dies outright it takes the whole pool with it, so the files that were lost are sent to a new pool.
+    A file that is lost twice is then tried in a pool of it's own at the end,
+    so that only the file that kills it's worker is dropped.
+
+    :param fileIds: The ids of the files to collect. Can be lazy
+    :param serviceFactory: A picklable callable that builds a drive service. Called once in each worker
+    :param incrementSize: The size of the timeline increments, in the format 'd:h:m'
+    :param unsafeLevel: 0 for no unsafe stats, 1 for the unsafe stats and 2 for the fine unsafe stats
+    :param options: The options that control how the unsafe api is requested
+    :param processes: The number of worker processes. Defaults to the number of cores
+    :param queueSize: The maximum number of files sent to the pool at once. Defaults to twice the number of processes
+    :return: The id and stats of each file that succeeded
+    """
+    processes = processes or os.cpu_count()
+    queueSize = queueSize or processes * 2
+    source = iter(fileIds)
+    retries = deque()
+    lostOnce = set()
+    isolated = []
+    window = deque()
+
+    pool = _makePool(serviceFactory, processes)
+    try:
+        while True:
+            # Top up the pool, sending any lost files before new ones
+            while len(window) < queueSize:
+                fileId = retries.popleft() if retries else next(source, None)
+                if fileId is None:
+                    break
+                try:
+                    future = pool.submit(_collectInWorker, fileId, incrementSize, unsafeLevel, options)
+                except BrokenProcessPool:
+                    # The pool broke since the last check. It is replaced once the lost files are found below
+                    retries.appendleft(fileId)
+                    break
+                window.append((fileId, future))
+            if not window:
+                break
+
+            fileId, future = window.popleft()
+            try:
+                stats, workerMetrics = future.result()
+            except BrokenProcessPool:
+                # Everything that had not finished was lost with the pool
+                window.appendleft((fileId, future))
+                lost = [entry[0] for entry in window if _isLost(entry[1])]
+                window = deque(entry for entry in window if not _isLost(entry[1]))
+                pool.shutdown(wait=False)
+                pool = _makePool(serviceFactory, processes)
+                print(f"A worker process died. Retrying {len(lost)} files")
+                for lostId in lost:
+                    if lostId in lostOnce:
+                        isolated.append(lostId)
+                    else:
+                        lostOnce.add(lostId)
+                        retries.append(lostId)
+                continue
+            except Exception as e:
+                print(f"Failed to process file {fileId}: {e!r}")
+                continue
+            metrics.mergeIn(workerMetrics)
+            yield fileId, stats
+    finally:
+        pool.shutdown()
+
+    for fileId in isolated:
+        with _makePool(serviceFactory, 1) as pool:
+            try:
+                stats, workerMetrics = pool.submit(_collectInWorker, fileId, incrementSize, unsafeLevel,
+                                                   options).result()
+            except Exception as e:
+                print(f"Failed to process file {fileId}: {e!r}")
+                continue
+        metrics.mergeIn(workerMetrics)
+        yield fileId, stats
@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+import zipfile
+from typing import Dict, List, Tuple
+
+from httplib2 import Response
+
+from .HttpPool import HttpPool
+from .Metrics import metrics
+from .Tracing import span
+
+# The name of the index inside a fixture archive
+INDEX_NAME = "exchanges.json"
+
+
+class FixtureArchive:
+    """
+    A zip archive of the http exchanges made during a run.
+    Each response is stored under the method and url it was requested with, in the order they were made.
+    Repeated requests to the same url are served back in that same order, so batch requests replay correctly.
+
+    An archive is either being recorded or replayed, never both at once.
+    """
+
+    def __init__(self, path, mode='r'):
+        """
+        :param path: The path of the archive file
+        :param mode: 'r' to replay an existing archive, 'w' to record a new one
+        """
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._exchanges: Dict[Tuple[str, str], List[dict]] = {}
+        self._served: Dict[Tuple[str, str], int] = {}
+        self._zip = zipfile.ZipFile(path, mode, zipfile.ZIP_DEFLATED)
+        if mode == 'r':
+            for exchange in json.loads(self._zip.read(INDEX_NAME)):
+                self._exchanges.setdefault((exchange['method'], exchange['uri']), []).append(exchange)
+        self._count = 0
+
+    def record(self, method, uri, response, content: bytes):
+        """
+        Stores a single exchange
+
+        :param method: The http method of the request
+        :param uri: The full url of the request
+        :param response: The response headers, including the status
+        :param content: The raw content of the response
+        """
+        with self._lock:
+            name = f"content/{self._count:06d}"
+            self._count += 1
+            self._zip.writestr(name, content)
+            self._exchanges.setdefault((method, uri), []).append({
+                'method': method,
+                'uri': uri,
+                'response': {key: str(value) for key, value in dict(response).items()},
+                'content': name
+            })
+
+    def replay(self, method, uri) -> Tuple[dict, bytes]:
+        """
+        Gets the next recorded response to a request.
+        Once every recorded response to the url has been served the last one is repeated.
+
+        :param method: The http method of the request
+        :param uri: The full url of the request
+        :return: A tuple of (response, content)
+        :raise KeyError: If the request was never recorded
+        """
+        key = (method, uri)
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if not exchanges:
+                raise KeyError(f"No recorded response for {method} {uri}")
+            index = min(self._served.get(key, 0), len(exchanges) - 1)
+            self._served[key] = index + 1
+            exchange = exchanges[index]
+            return dict(exchange['response']), self._zip.read(exchange['content'])
+
+    def close(self):
+        """
+        Closes the archive, writing the index if it was being recorded
+        """
+        with self._lock:
+            if self._zip is None:
+                return
+            if self.mode == 'w':
+                exchanges = [exchange for entries in self._exchanges.values() for exchange in entries]
+                exchanges.sort(key=lambda exchange: exchange['content'])
+                self._zip.writestr(INDEX_NAME, json.dumps(exchanges, indent=1))
+            self._zip.close()
+            self._zip = None
+
+
+class RecordingPool(HttpPool):
+    """
+    A `HttpPool` that stores every exchange it makes in a `FixtureArchive`.
+    Only the final response of each request is stored, after any retries.
+    """
+
+    def __init__(self, archive: FixtureArchive, *args, **kwargs):
+        """
+        :param archive: The archive to record into
+        :param args: The arguments to `HttpPool`
+        :param kwargs: The keyword arguments to `HttpPool`
+        """
+        super().__init__(*args, **kwargs)
+        self.archive = archive
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs) -> Tuple[dict, bytes]:
+        response, content = super().request(uri, method, body, headers, **kwargs)
+        self.archive.record(method, uri, response, content)
+        return response, content
+
+
+class ReplayPool(HttpPool):
+    """
+    A `HttpPool` that serves the responses stored in a `FixtureArchive` instead of making any requests.
+    Used to collect a document offline, eg. to compare the performance of two versions on the same data.
+    """
+
+    def __init__(self, archive: FixtureArchive, latency=0.0):
+        """
+        :param archive: The archive to replay from
+        :param latency: How long each request takes, in seconds, to simulate the network
+        """
+        super().__init__()
+        self.archive = archive
+        self.latency = latency
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs) -> Tuple[Response, bytes]:
+        with span("request", "request", method=method, url=uri, replayed=True):
+            return metrics.wrap(self._replay, uri)(method, uri)
+
+    def _replay(self, method, uri) -> Tuple[Response, bytes]:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        response, content = self.archive.replay(method, uri)
+        # The google client expects the response to be a `httplib2.Response`
+        return Response(response), content
@@ -0,0 +1,276 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+# The statuses that mean the server is overloaded or rate limiting us, and that the request should be tried again
+RETRY_STATUSES = {'429', '500', '502', '503', '504'}
+# The errors that mean the connection failed part way, and that the request should be tried again
+RETRY_ERRORS = (ConnectionError, TimeoutError)
+# The (requests per second, burst size) allowed for each endpoint.
+# The drive api allows 1000 requests per 100 seconds for each user. The unsafe api has no published limit.
+DEFAULT_RATES = {
+    'drive': (10, 20),
+    'tiles': (5, 10),
+    'showrevision': (10, 20),
+}
+
+
+class RequestError(Exception):
+    """
+    Raised when a request returns a non-successful status code
+    """
+
+    def __init__(self, url, status, content=b""):
+        super().__init__(f"Request to {url} failed with status {status}")
+        self.url = url
+        self.status = status
+        self.content = content
+
+
+class TokenBucket:
+    """
+    Limits how often requests can be made.
+    Tokens are added at a steady rate up to the capacity, and each request takes one.
+    If there are none left the request is given a time to wait instead, so waiting requests are served in order.
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        :param rate: The number of tokens added each second
+        :param capacity: The maximum number of tokens that can be saved up, ie. the largest burst of requests
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """
+        Takes a token from the bucket.
+        The token may be borrowed from the future, in which case the caller must wait before using it.
+
+        :return: The number of seconds to wait before making the request
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds):
+        """
+        Stops any tokens being handed out for the given time, on top of those already borrowed.
+        Used when the server asks us to slow down, so every caller waits rather than just the one that was told.
+
+        :param seconds: The number of seconds to pause for
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class RequestScheduler:
+    """
+    Schedules the requests made during a run.
+    Every request waits for a token from the bucket of it's endpoint, so parallel collection stays within the quota.
+    Requests that are rate limited or hit a server error are retried with an exponential backoff,
+    honouring any `Retry-After` header. The retries are drawn from a budget shared by the whole run,
+    so a server that is down makes the run fail quickly rather than retrying every request.
+
+    The same scheduler is used by the blocking and the asyncio engines.
+    """
+
+    def __init__(self, rates: Dict[str, Tuple[float, float]] = None, maxAttempts=6, baseDelay=0.5, maxDelay=32,
+                 retryBudget=100):
+        """
+        :param rates: The (requests per second, burst size) for each endpoint. Defaults to `DEFAULT_RATES`.
+                      Endpoints that are not listed are not limited
+        :param maxAttempts: The maximum number of times to try a single request
+        :param baseDelay: The delay before the first retry in seconds. Doubles with each retry
+        :param maxDelay: The longest delay between retries in seconds, unless the server asks for longer
+        :param retryBudget: The total number of retries allowed across all requests
+        """
+        self.rates = dict(DEFAULT_RATES if rates is None else rates)
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.retryBudget = retryBudget
+        self.retries = 0
+        self._buckets = {endpoint: TokenBucket(*rate) for endpoint, rate in self.rates.items()}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def scaled(self, factor) -> 'RequestScheduler':
+        """
+        Makes a new scheduler with the rates and retry budget scaled by a factor.
+        Used to split the quota between worker processes, as each has it's own scheduler.
+
+        :param factor: The factor to scale by
+        :return: The new scheduler
+        """
+        rates = {endpoint: (rate * factor, max(capacity * factor, 1)) for endpoint, (rate, capacity) in
+                 self.rates.items()}
+        return RequestScheduler(rates, self.maxAttempts, self.baseDelay, self.maxDelay,
+                                max(int(self.retryBudget * factor), 1))
+
+    @staticmethod
+    def endpointOf(url) -> str:
+        """
+        :param url: The url being requested
+        :return: The name of the endpoint the url belongs to
+        """
+        parts = urlsplit(url)
+        if parts.path.endswith('/showrevision'):
+            return 'showrevision'
+        if parts.path.endswith('/revisions/tiles'):
+            return 'tiles'
+        return 'drive'
+
+    def _wait(self, url) -> float:
+        bucket = self._buckets.get(self.endpointOf(url))
+        return bucket.reserve() if bucket else 0
+
+    def _spendRetry(self) -> bool:
+        with self._lock:
+            if self.retries >= self.retryBudget:
+                return False
+            self.retries += 1
+            return True
+
+    def _retryDelay(self, url, attempt, response=None) -> Optional[float]:
+        """
+        Works out if a request should be retried, and how long to wait first.
+        A rate limited request pauses the whole endpoint, so that the other callers back off too.
+
+        :param url: The url that was requested
+        :param attempt: The number of attempts made so far
+        :param response: The response headers, or None if the request raised an error
+        :return: The number of seconds to wait before retrying, or None if it should not be retried
+        """
+        if response is not None and response['status'] not in RETRY_STATUSES:
+            return None
+        if attempt >= self.maxAttempts or not self._spendRetry():
+            return None
+
+        # Full jitter, so that callers that failed together don't all retry together
+        delay = random.uniform(0, min(self.maxDelay, self.baseDelay * 2 ** (attempt - 1)))
+        retryAfter = parseRetryAfter(response.get('retry-after')) if response is not None else None
+        if retryAfter is not None:
+            delay = retryAfter + random.uniform(0, self.baseDelay)
+        if response is not None and response['status'] == '429':
+            bucket = self._buckets.get(self.endpointOf(url))
+            if bucket:
+                bucket.pause(delay)
+                return 0
+        return delay
+
+    def request(self, send, url, *args, **kwargs):
+        """
+        Makes a blocking request, waiting for the rate limit and retrying it if needed.
+
+        :param send: The function that makes the request, eg. `Http.request`
+        :param url: The url to request
+        :param args: Any other arguments to pass to `send`
+        :param kwargs: Any other keyword arguments to pass to `send`
+        :return: The result of the last attempt
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            time.sleep(self._wait(url))
+            try:
+                result = send(url, *args, **kwargs)
+            except RETRY_ERRORS:
+                delay = self._retryDelay(url, attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retryDelay(url, attempt, result[0])
+                if delay is None:
+                    return result
+            time.sleep(delay)
+
+    async def requestAsync(self, send, url, *args, **kwargs):
+        """
+        The async mirror of `request`.
+
+        :param send: The coroutine function that makes the request, eg. `AsyncTransport.request`
+        :param url: The url to request
+        :param args: Any other arguments to pass to `send`
+        :param kwargs: Any other keyword arguments to pass to `send`
+        :return: The result of the last attempt
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            await asyncio.sleep(self._wait(url))
+            try:
+                result = await send(url, *args, **kwargs)
+            except RETRY_ERRORS + (asyncio.IncompleteReadError,):
+                delay = self._retryDelay(url, attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retryDelay(url, attempt, result[0])
+                if delay is None:
+                    return result
+            await asyncio.sleep(delay)
+
+
+def parseRetryAfter(value) -> Optional[float]:
+    """
+    Parses the value of a `Retry-After` header
+
+    :param value: The header value, either a number of seconds or a http date. Can be None
+    :return: The number of seconds to wait, or None if there was no valid value
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def checkResponse(url, response, content):
+    """
+    Raises an error if the response was not successful
+
+    :param url: The url that was requested
+    :param response: The response headers
+    :param content: The content returned
+    :raise RequestError: If the status was not a 2xx code
+    """
+    if not response['status'].startswith('2'):
+        raise RequestError(url, int(response['status']), content)
@@ -0,0 +1,119 @@
+import asyncio
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+
+def _currentThread() -> int:
+    """
+    :return: The id of the thread, or asyncio task, that is running. Spans are nested within it in the trace
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+class Tracer:
+    """
+    Records how long each phase of a run takes, as spans in the Chrome trace format.
+    Open the saved file in chrome://tracing or https://ui.perfetto.dev to see them.
+
+    Spans nest within the thread, or asyncio task, that opened them,
+    so each document and each request shows up as a child of the phase it was made in.
+    Recording is off unless `enable` is called, in which case a span costs almost nothing.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events: List[Dict] = []
+        self.profilePhase = None
+        self.profile = None
+        self._profiling = False
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def enable(self, profilePhase=None):
+        """
+        Starts recording spans
+
+        :param profilePhase: Optional name of a phase to capture with cProfile.
+                             Only one thread can be profiled at once, so concurrent spans of the phase are skipped
+        """
+        self.enabled = True
+        self.events = []
+        self.profilePhase = profilePhase
+        self.profile = cProfile.Profile() if profilePhase else None
+        self._origin = time.perf_counter()
+
+    def _startProfile(self, name) -> bool:
+        if name != self.profilePhase or self.profile is None:
+            return False
+        with self._lock:
+            if self._profiling:
+                return False
+            self._profiling = True
+        self.profile.enable()
+        return True
+
+    def _stopProfile(self):
+        self.profile.disable()
+        with self._lock:
+            self._profiling = False
+
+    @contextmanager
+    def span(self, name, category="phase", **args):
+        """
+        Times the code run inside it
+
+        :param name: The name of the phase
+        :param category: The category of the span, eg. 'phase', 'document' or 'request'
+        :param args: Any details to show with the span. More can be added to the yielded dict
+        :return: A dict of the details of the span
+        """
+        if not self.enabled:
+            yield args
+            return
+        profiled = self._startProfile(name)
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            if profiled:
+                self._stopProfile()
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': _currentThread(),
+                     'ts': (start - self._origin) * 1e6, 'dur': (end - start) * 1e6,
+                     'args': {key: str(value) for key, value in args.items()}}
+            with self._lock:
+                self.events.append(event)
+
+    def save(self, path):
+        """
+        Writes the spans recorded so far as a Chrome trace.
+        If a phase was profiled it's stats are written next to it, with a '.prof' extension
+
+        :param path: The file to write the trace to
+        """
+        with self._lock:
+            events = list(self.events)
+        with open(path, 'w', encoding='utf8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        if self.profile is not None:
+            self.profile.dump_stats(os.path.splitext(path)[0] + '.prof')
+
+
+# The tracer of the whole run
+tracer = Tracer()
+
+
+def span(name, category="phase", **args):
+    """
+    Times the code run inside it, if tracing is enabled. See `Tracer.span`
+    """
+    return tracer.span(name, category, **args)
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    A content-addressed cache of raw responses, stored on disk.
+    Each entry is stored in a file named after the hash of it's key.
+    The total size is capped, with the least recently used entries evicted first.
+    """
+
+    def __init__(self, directory, maxSize=512 * 1024 * 1024):
+        """
+        :param directory: The directory to store the cache in. Created if it does not exist
+        :param maxSize: The maximum total size of the cache, in bytes
+        """
+        self.directory = directory
+        self.maxSize = maxSize
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(entry) for entry in self._entries())
+
+    def __getstate__(self):
+        # Locks can't be pickled, so each process gets it's own
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _entries(self):
+        """
+        :return: The paths of all the entries in the cache
+        """
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.startswith('.'):
+                    yield os.path.join(root, name)
+
+    def _path(self, key):
+        """
+        :param key: The key of the entry
+        :return: The path the entry is stored at
+        """
+        digest = hashlib.sha256(repr(key).encode('utf8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key, ttl=None):
+        """
+        Gets an entry from the cache.
+        Marks the entry as recently used.
+
+        :param key: The key of the entry. Any value with a stable repr, usually a tuple
+        :param ttl: The maximum age of the entry in seconds. None if it never expires
+        :return: The stored content, or None if there was no valid entry
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored = f.read()
+        except OSError:
+            return None
+        storedAt, _, content = stored.partition(b"\n")
+        if ttl is not None and time.time() - float(storedAt) > ttl:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return content
+
+    def put(self, key, content: bytes):
+        """
+        Stores an entry in the cache.
+        Evicts the least recently used entries if the cache is now too big
+
+        :param key: The key of the entry
+        :param content: The raw content to store
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so that a reader never sees a half written entry
+        handle, tempPath = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(b"%f\n" % time.time())
+            f.write(content)
+        with self._lock:
+            oldSize = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tempPath, path)
+            self._size += os.path.getsize(path) - oldSize
+            if self._size > self.maxSize:
+                self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cache fits within it's maximum size.
+        Must be called whilst holding the lock
+        """
+        entries = []
+        for path in self._entries():
+            # Another process sharing the cache may have removed the entry since it was listed
+            try:
+                entries.append((os.stat(path), path))
+            except OSError:
+                continue
+        entries.sort(key=lambda entry: entry[0].st_mtime)
+        for stat, path in entries:
+            if self._size <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= stat.st_size
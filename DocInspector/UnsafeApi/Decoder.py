@@ -0,0 +1,83 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+from .Revisions import ChangeData
+from .Stream import iterChunks
+
+
+def decodeChanges(content: bytes) -> dict:
+    """
+    Decodes a raw showrevision response into it's per-editor counters.
+    Run inside the worker processes, so only the compact counters are sent back rather than the parsed json.
+
+    :param content: The raw body of the response
+    :return: The changes in the format of `ChangeData.toDict`
+    """
+    changes = ChangeData()
+    changes.initFromStream(iterChunks(content))
+    return changes.toDict()
+
+
+class DecoderPool:
+    """
+    Decodes revision responses in a pool of worker processes.
+    Decoding large responses is CPU bound and the GIL would serialise it,
+    so this lets the decoding of one response overlap with the requests for the next on every core.
+
+    When pickled, eg. to be sent to another worker process, the copy decodes in the process that uses it.
+    """
+
+    def __init__(self, processes=None):
+        """
+        :param processes: The number of worker processes. Defaults to the number of cores. 0 to decode in this process
+        """
+        self.processes = processes
+        self._pool = None
+
+    def __getstate__(self):
+        # Process pools can't be pickled, and a worker process should not start it's own
+        return {'processes': 0, '_pool': None}
+
+    def _getPool(self) -> ProcessPoolExecutor:
+        # The pool is made lazily so that no processes are started unless a revision is decoded
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        return self._pool
+
+    def decode(self, content: bytes) -> ChangeData:
+        """
+        Decodes a response, blocking until it is done.
+        Other threads carry on with their requests in the meantime.
+
+        :param content: The raw body of the response
+        :return: The changes made in the response
+        """
+        if self.processes == 0:
+            data = decodeChanges(content)
+        else:
+            data = self._getPool().submit(decodeChanges, content).result()
+        return self._load(data)
+
+    async def decodeAsync(self, content: bytes) -> ChangeData:
+        """
+        The async mirror of `decode`
+        """
+        if self.processes == 0:
+            data = decodeChanges(content)
+        else:
+            data = await asyncio.get_running_loop().run_in_executor(self._getPool(), decodeChanges, content)
+        return self._load(data)
+
+    @staticmethod
+    def _load(data) -> ChangeData:
+        changes = ChangeData()
+        changes.initFromDict(data)
+        return changes
+
+    def close(self):
+        """
+        Shuts down the worker processes
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -1,7 +1,12 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 
-from DocInspector.Helpers import calculateTimelineStart
-from .Helpers import UnsafeRequester, User
+import numpy as np
+
+from DocInspector.Helpers import DateRange, bucketTimes, calculateTimelineStart, occupiedBuckets
+from .Helpers import DOCS_URL, UnsafeRequester, User
+from .Index import RevisionIndex
+from .Planner import RangePlanner
 from .Revisions import RevisionMetadata, ChangeData
 
 
@@ -11,18 +16,32 @@ class Document:
     This is made up of multiple revisions.
     """
 
-    def __init__(self, http, docId, useFine=False):
+    def __init__(self, http, docId, useFine=False, jobs=1, cache=None, state=None, decoder=None, docsUrl=DOCS_URL,
+                 dateRange=None):
         """
         Creates a new document with the given id.
 
-        :param http: The http object to make calls with
+        :param http: The http object to make calls with. Must be thread-safe if `jobs` is more than 1
         :param docId: The ID of the document in question
+        :param jobs: The maximum number of revisions to request at once
+        :param cache: Optional `ResponseCache` to store the responses in
+        :param state: Optional `DocumentState` from a previous run. Only revisions made since are requested
+        :param decoder: Optional `DecoderPool` to decode the revisions in
+        :param docsUrl: The url the document urls are made relative to
+        :param dateRange: Optional `DateRange` to collect the changes in.
+                          Revisions that ended outside of it are skipped, so their changes are never requested
         """
-        self.requester = UnsafeRequester(http, docId, useFine)
+        self.requester = UnsafeRequester(http, docId, useFine, cache, decoder=decoder, baseUrl=docsUrl)
+        self.planner = RangePlanner(self.requester, jobs)
         self.docId = docId
+        self.jobs = jobs
+        self.state = state
+        self.dateRange = DateRange() if dateRange is None else dateRange
         self.revisions = None
         self.users = None
+        self.userMap = None
         self.totalChanges = None
+        self.index = None
 
     def _loadRevisions(self, data):
         """
@@ -49,24 +68,77 @@ class Document:
         :return: None
         """
         self.users = {}
+        self.userMap = data['userMap']
         for userNumber in data['userMap']:
             userData = User(userNumber, data['userMap'][userNumber])
             self.users[userData.getId()] = userData
 
+    def _listStart(self) -> int:
+        """
+        Internal Function
+        Gets the id of the first revision that needs to be requested.
+        If there is a saved state then only the revisions made since it was saved are needed.
+
+        :return: The id to start the list of revisions at
+        """
+        if self.state is None or not self.state.revisions:
+            return 1
+        return self.state.lastEndId + 1
+
+    def _loadList(self, rawData=None):
+        """
+        Internal Function
+        Loads the revisions and users from the list of revisions, merging in the saved state if there is one.
+
+        :param rawData: The list of revisions, starting at `_listStart`. Requested if not given
+        :return: None
+        """
+        start = self._listStart()
+        if rawData is None:
+            rawData = self.requester.requestList(start)
+        if start == 1:
+            self._loadRevisions(rawData)
+            self._loadUsers(rawData)
+            return
+
+        if rawData['tileInfo']:
+            self._loadRevisions(rawData)
+        else:
+            self.revisions = []
+        # The last revision of the previous run may have grown since, so we only take the new part of it
+        newRevisions = [revision for revision in self.revisions if revision.endId >= start]
+        for revision in newRevisions:
+            revision.startId = max(revision.startId, start)
+        self.revisions = self.state.loadRevisions(self.requester) + newRevisions
+        self._loadUsers({'userMap': {**self.state.userMap, **rawData['userMap']}})
+
+    def saveState(self):
+        """
+        Saves the revisions loaded so far into the state, so the next run can continue on from them.
+        Does nothing if there is no state.
+
+        :return: None
+        """
+        if self.state is None or self.revisions is None:
+            return
+        self.state.update(self.revisions, self.userMap)
+        self.state.save()
+
     def getRevisionList(self) -> List[RevisionMetadata]:
         """
         Returns a List of all 'major' revisions
         A major revision is one which is either:
             both expandable and unexpanded,
             and/or named.
+        Only the revisions that ended in the date range are included
 
         :return: A list of all major revisions
         """
         if self.revisions is None or self.users is None:
-            rawData = self.requester.requestList()
-            self._loadRevisions(rawData)
-            self._loadUsers(rawData)
-        return self.revisions
+            self._loadList()
+        if not self.dateRange.isLimited():
+            return self.revisions
+        return [revision for revision in self.revisions if self.dateRange.contains(revision.endTime)]
 
     def getIdRange(self) -> tuple:
         """
@@ -79,6 +151,45 @@ class Document:
         revisions = self.getRevisionList()
         return revisions[0].startId, revisions[-1].endId
 
+    def prefetchChanges(self, revisions=None):
+        """
+        Loads the changes for the given revisions using a pool of worker threads.
+        Each revision caches it's own changes, so later calls to `getChanges` will not make a request.
+        Does nothing if only a single job is allowed, as the changes will be loaded lazily instead.
+
+        :param revisions: The revisions to load the changes for. Defaults to all revisions
+        """
+        if revisions is None:
+            revisions = self.getRevisionList()
+        pending = [revision for revision in revisions if revision.change is None]
+        if self.jobs <= 1 or len(pending) <= 1:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            # Consume the results so that any errors are raised here
+            list(pool.map(RevisionMetadata.getChanges, pending))
+
+    def _changesInGroups(self, groups: List[List[RevisionMetadata]]) -> List[ChangeData]:
+        """
+        Internal Function
+        Gets the aggregate changes of each group of revisions.
+        Contiguous revisions are requested as a single range, unless there is a state to save.
+        The state stores the changes of each revision, so they must then be requested one at a time.
+
+        :param groups: The revisions in each group
+        :return: The changes made in each group, in the same order
+        """
+        if self.state is None:
+            return self.planner.fetchGroups(groups)
+
+        self.prefetchChanges([revision for group in groups for revision in group])
+        changes = []
+        for group in groups:
+            changes.append(ChangeData())
+            for revision in group:
+                changes[-1].mergeIn(revision.getChanges())
+        return changes
+
     def getTotalChanges(self) -> ChangeData:
         """
         Get an object representing the entirety of the changes made in this document.
@@ -87,10 +198,7 @@ class Document:
         :return: A ChangeData for all the changes made
         """
         if self.totalChanges is None:
-            revisionList = self.getRevisionList()
-            self.totalChanges = revisionList[0].getChanges().clone()
-            for revision in revisionList[1:]:
-                self.totalChanges.mergeIn(revision.getChanges())
+            self.totalChanges = self._changesInGroups([self.getRevisionList()])[0]
 
         return self.totalChanges
 
@@ -102,15 +210,26 @@ class Document:
         :raise KeyError: If the user could not be found
         """
         if self.users is None:
-            if self.revisions is None or self.users is None:
-                rawData = self.requester.requestList()
-                self._loadRevisions(rawData)
-                self._loadUsers(rawData)
+            self._loadList()
         if user in self.users:
             return self.users[user]
         else:
             raise KeyError(f"User {user} did not edit the document")
 
+    def getIndex(self) -> RevisionIndex:
+        """
+        Gets the index used to answer range queries, building it the first time.
+        Building it needs the changes of every revision, so each revision not already loaded is requested on it's own.
+        It is only built when asked for, or by `getForTimeRange`, so a single id range query doesn't request them all
+
+        :return: The index of the revisions of this document
+        """
+        if self.index is None:
+            revisions = self.getRevisionList()
+            self.prefetchChanges(revisions)
+            self.index = RevisionIndex(revisions, [revision.getChanges() for revision in revisions])
+        return self.index
+
     def getForIdRange(self, startId, endId) -> ChangeData:
         """
         Get all the changes made in a given id range.
@@ -120,35 +239,71 @@ class Document:
         This means that a revision may not be included if one of the two falls just outside the range.
         It also means that the endpoints may not be included if there is no revision that exactly matches them.
 
+        Once the index has been built, see `getIndex`, queries reuse it without making any requests.
+        Until then only the revisions in the range are requested, with contiguous revisions merged into ranges
+
         :param startId: The starting id
         :param endId: The ending id
         :return: An aggregate of all the changes in that id range
         """
+        if self.index is not None:
+            return self.index.forIdRange(startId, endId)
+        inRange = [revision for revision in self.getRevisionList()
+                   if revision.startId >= startId and revision.endId <= endId]
+        return self._changesInGroups([inRange])[0]
+
+    def getForTimeRange(self, startTime, endTime) -> ChangeData:
+        """
+        Get all the changes made in a given time range, eg. a week or the time up to a deadline.
+        This is an aggregate of all the changes made
+
+        All revisions that ended after startTime, up to and including endTime, will be included.
+        The index is built for the first query, see `getIndex`, and reused by every query after it
+
+        :param startTime: The start of the range, in milliseconds
+        :param endTime: The end of the range, in milliseconds
+        :return: An aggregate of all the changes in that time range
+        """
+        return self.getIndex().forTimeRange(startTime, endTime)
+
+    def getIncrementGroups(self, increment, start=None) -> Dict[int, List[RevisionMetadata]]:
+        """
+        Splits the revisions into set increments of time.
+        Increment i holds the revisions that ended from start + i * increment up to the start of the next increment.
+        The revisions are bucketed all at once, see `bucketTimes`,
+        so the empty increments between them are never visited
+
+        :param increment: The size of the increment in milliseconds
+        :param start: The start of the first increment, in milliseconds, eg. the start of the timeline.
+                      Defaults to the start of the increment the first revision ended in,
+                      or of the date range if it starts after the first revision
+        :return: The revisions in each increment that has any, by the number of the increment, in order
+        """
         revisions = self.getRevisionList()
-        changes = ChangeData()
-        for i in range(len(revisions)):
-            if revisions[i].startId >= startId and revisions[i].endId <= endId:
-                changes.mergeIn(revisions[i].getChanges())
-        return changes
+        if not revisions:
+            return {}
+        endTimes = np.array([revision.endTime for revision in revisions], dtype=np.int64)
+        order = np.argsort(endTimes, kind='stable')
+        endTimes = endTimes[order]
+        if start is None:
+            start = endTimes[0]
+            if self.dateRange.start is not None:
+                start = max(self.dateRange.start, min(revision.endTime for revision in self.revisions))
+            start = calculateTimelineStart(start, increment)
+        rows = bucketTimes(endTimes, start, increment, False)
+        increments, starts = occupiedBuckets(rows)
+        revisions = [revisions[i] for i in order.tolist()]
+        bounds = starts.tolist() + [len(revisions)]
+        return {row: revisions[first:last] for row, first, last in zip(increments.tolist(), bounds, bounds[1:])}
 
-    def getChangesInIncrement(self, increment) -> List[ChangeData]:
+    def getChangesInIncrement(self, increment, start=None) -> Dict[int, ChangeData]:
         """
         Aggregates all the changes into set increments
         Filters the increments with no changes in them
 
         :param increment: The size of the increment in milliseconds
+        :param start: The start of the first increment. See `getIncrementGroups`
         :return: A dictionary of change data linking the increment number to the changes made.
         """
-        revisions = sorted(self.getRevisionList(),
-                           key=lambda x: x.endTime)
-        changes = []
-        time = calculateTimelineStart(revisions[0].endTime + increment, increment)
-        i = 0
-        while i < len(revisions):
-            changes.append(ChangeData())
-            while i < len(revisions) and revisions[i].endTime <= time:
-                changes[-1].mergeIn(revisions[i].getChanges())
-                i += 1
-            time += increment
-        # Filter out empty increment
-        return changes
+        groups = self.getIncrementGroups(increment, start)
+        return dict(zip(groups, self._changesInGroups(list(groups.values()))))
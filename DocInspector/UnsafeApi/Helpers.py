@@ -1,5 +1,16 @@
 import json
 
+from ..Metrics import endpointName, metrics
+from ..Scheduler import checkResponse
+from ..Tracing import span
+from .Revisions import ChangeData
+from .Stream import iterChunks
+
+# How long a cached revision list stays valid, in seconds. The list grows as the document is edited.
+LIST_TTL = 5 * 60
+# The url the document urls are made relative to
+DOCS_URL = "https://docs.google.com/document/d/"
+
 
 class User:
     """
@@ -31,16 +42,48 @@ class UnsafeRequester:
     Makes requests to the unsafe API
     """
 
-    def __init__(self, http, docId, useFine=False):
+    def __init__(self, http, docId, useFine=False, cache=None, listTtl=LIST_TTL, decoder=None, baseUrl=DOCS_URL):
         """
 
-        :param http: The http object to make the direct calls with
+        :param http: The http object to make the direct calls with.
+                     This must be thread-safe, eg. a `HttpPool`, if revisions are requested in parallel
         :param docId: The ID of the document to call against.
+        :param cache: Optional `ResponseCache` to store the responses in
+        :param listTtl: How long a cached revision list stays valid, in seconds
+        :param decoder: Optional `DecoderPool` to decode the revisions in. Defaults to decoding them in this thread
+        :param baseUrl: The url the document urls are made relative to
         """
         self.http = http
         self.docId = docId
         self.useFine = useFine
-        self.baseUrl = f"https://docs.google.com/document/d/{self.docId}/"
+        self.cache = cache
+        self.listTtl = listTtl
+        self.decoder = decoder
+        self.baseUrl = f"{baseUrl}{self.docId}/"
+
+    def _requestCached(self, url, key, ttl=None):
+        """
+        Requests the given url, going through the cache if there is one.
+        Only successful responses are stored.
+        Any rate limiting and retrying is done by the http object, see `HttpPool`.
+
+        :param url: The url to request
+        :param key: The key to store the response under
+        :param ttl: How long the cached response stays valid for. None if it never expires
+        :return: The raw content of the response
+        :raise RequestError: If the request was not successful
+        """
+        if self.cache is not None:
+            content = self.cache.get(key, ttl)
+            if content is not None:
+                metrics.recordCacheHit(endpointName(url))
+                return content
+        (response, content) = self.http.request(url)
+        # Errors are raised here, rather than failing to parse the error page
+        checkResponse(url, response, content)
+        if self.cache is not None:
+            self.cache.put(key, content)
+        return content
 
     def requestRevision(self, revision):
         """
@@ -51,6 +94,13 @@ class UnsafeRequester:
         """
         return self.requestRevisionRange(revision.startId, revision.endId)
 
+    def _requestRangeContent(self, startId, endId) -> bytes:
+        # A range never changes once it exists, so it can be cached forever
+        return self._requestCached(self.baseUrl +
+                                   f"showrevision?id={self.docId}&"
+                                   f"end={endId}&start={startId}",
+                                   ('showrevision', self.docId, startId, endId))
+
     def requestRevisionRange(self, startId, endId):
         """
         Requests the detailed revision data for a given revision range.
@@ -59,22 +109,40 @@ class UnsafeRequester:
         :param endId: The end id of the range
         :return: The raw json for that range, as a single revision object.
         """
-        (_, content) = self.http.request(
-            self.baseUrl +
-            f"showrevision?id={self.docId}&"
-            f"end={endId}&start={startId}")
-        return json.loads(content[5:])
+        content = self._requestRangeContent(startId, endId)
+        with span("decode", "decode", size=len(content)):
+            return json.loads(content[5:])
 
-    def requestList(self):
+    def requestRangeChanges(self, startId, endId) -> ChangeData:
+        """
+        Requests the changes made in a given revision range.
+        The response is parsed as a stream straight into the changes, without building the raw json.
+
+        :param startId: The start id of the range
+        :param endId: The end id of the range
+        :return: The changes made in the range
+        """
+        content = self._requestRangeContent(startId, endId)
+        with span("decode", "decode", size=len(content)):
+            if self.decoder is not None:
+                return self.decoder.decode(content)
+            changes = ChangeData()
+            changes.initFromStream(iterChunks(content))
+            return changes
+
+    def requestList(self, start=1):
         """
         Request a list of all revisions on this document
 
+        :param start: The id of the first revision to list. Defaults to the start of the document
         :return: The raw json of the list of revisions
         """
-        (_, content) = self.http.request(self.baseUrl +
-                                         f"revisions/tiles?id={self.docId}&"
-                                         f"start=1&"
-                                         f"showDetailedRevisions={'true' if self.useFine else 'false'}"
-                                         f"&filterNamed=false")
-
-        return json.loads(content[5:])
+        content = self._requestCached(self.baseUrl +
+                                      f"revisions/tiles?id={self.docId}&"
+                                      f"start={start}&"
+                                      f"showDetailedRevisions={'true' if self.useFine else 'false'}"
+                                      f"&filterNamed=false",
+                                      ('tiles', self.docId, start, self.useFine), self.listTtl)
+
+        with span("decode", "decode", size=len(content)):
+            return json.loads(content[5:])
@@ -0,0 +1,135 @@
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .Revisions import RevisionMetadata, ChangeData
+
+# The counts kept for each editor. The number of revisions they edited in tells an editor who made no
+# changes in a range apart from one who was not in it, as an aggregate of the range would still list them
+COUNTS = ('additions', 'removals', 'changes', 'revisions')
+
+
+class RevisionIndex:
+    """
+    Answers queries for the changes made in a range of revision ids, or a range of time,
+    without re-aggregating the changes of each revision on every query.
+
+    It is built once from the changes of every revision. For each editor, the revisions they edited in are kept
+    sorted by id and by end time, along with the running total of their counts in both orders.
+    The changes in a range are then the difference of two running totals of each editor, found with a binary search,
+    so a query takes O(editors * log n) rather than O(n).
+    Only the revisions each editor edited in are stored, so the index takes O(n) memory,
+    as most revisions have a single editor.
+    """
+
+    def __init__(self, revisions: List[RevisionMetadata], changes: List[ChangeData]):
+        """
+        :param revisions: The revisions to index, sorted by start id. See `Document.getRevisionList`
+        :param changes: The changes made in each revision, in the same order
+        """
+        self.editors: List[str] = list(dict.fromkeys(editor for change in changes for editor in change.getUsers()))
+        self.editorIndex: Dict[str, int] = {editor: i for i, editor in enumerate(self.editors)}
+        self.startIds = np.array([revision.startId for revision in revisions], dtype=np.int64)
+        self.endIds = np.array([revision.endId for revision in revisions], dtype=np.int64)
+
+        # The counts of each editor in each revision they edited in, as (revision, editor, counts) entries
+        rows, columns, counts = [], [], []
+        for row, change in enumerate(changes):
+            for editor, (additions, removals, edits) in change.toDict().items():
+                rows.append(row)
+                columns.append(self.editorIndex[editor])
+                counts.append((additions, removals, edits, 1))
+        rows = np.array(rows, dtype=np.int64)
+        columns = np.array(columns, dtype=np.int64)
+        counts = np.array(counts, dtype=np.int64).reshape(-1, len(COUNTS))
+
+        # Revisions can overlap, in which case the end ids are out of order and a range is not a contiguous block
+        self.contiguous = bool(np.all(np.diff(self.startIds) >= 0) and np.all(np.diff(self.endIds) >= 0))
+        self.idPositions, self.idTotals = self._perEditor(rows, columns, counts)
+
+        timeOrder = np.argsort([revision.endTime for revision in revisions], kind='stable')
+        self.endTimes: List[int] = [revisions[i].endTime for i in timeOrder]
+        timeRanks = np.empty(len(revisions), dtype=np.int64)
+        timeRanks[timeOrder] = np.arange(len(revisions))
+        self.timePositions, self.timeTotals = self._perEditor(timeRanks[rows], columns, counts)
+
+    def _perEditor(self, positions: np.ndarray, columns: np.ndarray,
+                   counts: np.ndarray) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """
+        Splits the entries up by editor
+
+        :param positions: The position of the revision of each entry, in the order being indexed
+        :param columns: The editor of each entry
+        :param counts: The counts of each entry
+        :return: (The sorted positions of the revisions each editor edited in,
+                  The running totals of each editor's counts over those revisions. See `_runningTotals`)
+        """
+        order = np.lexsort((positions, columns))
+        positions, columns, counts = positions[order], columns[order], counts[order]
+        bounds = np.searchsorted(columns, np.arange(len(self.editors) + 1)).tolist()
+        return ([positions[first:last] for first, last in zip(bounds, bounds[1:])],
+                [self._runningTotals(counts[first:last]) for first, last in zip(bounds, bounds[1:])])
+
+    @staticmethod
+    def _runningTotals(counts: np.ndarray) -> np.ndarray:
+        """
+        :return: The total counts of the revisions before each one, with an extra row for the total of them all
+        """
+        totals = np.zeros((counts.shape[0] + 1,) + counts.shape[1:], dtype=np.int64)
+        np.cumsum(counts, axis=0, out=totals[1:])
+        return totals
+
+    def _totalsBetween(self, positions: List[np.ndarray], totals: List[np.ndarray], first, last) -> np.ndarray:
+        """
+        :return: The counts of each editor in the revisions at positions first up to, but not including, last,
+                 as an editors by `COUNTS` array
+        """
+        counts = np.zeros((len(self.editors), len(COUNTS)), dtype=np.int64)
+        for column, (editorPositions, editorTotals) in enumerate(zip(positions, totals)):
+            start, end = np.searchsorted(editorPositions, (first, last), side='left')
+            counts[column] = editorTotals[end] - editorTotals[start]
+        return counts
+
+    def _toChanges(self, counts: np.ndarray) -> ChangeData:
+        """
+        :param counts: The counts of each editor, as an editors by `COUNTS` array
+        :return: The counts as a ChangeData, with only the editors that edited in at least one of the revisions
+        """
+        changes = ChangeData()
+        changes.initFromDict({self.editors[column]: counts[column, :3].tolist()
+                              for column in np.flatnonzero(counts[:, 3])})
+        return changes
+
+    def forIdRange(self, startId, endId) -> ChangeData:
+        """
+        Gets the aggregate changes of the revisions with a start >= to startId and an end <= endId.
+        The same revisions as `Document.getForIdRange` includes
+
+        :param startId: The starting id
+        :param endId: The ending id
+        :return: An aggregate of all the changes in that id range
+        """
+        if self.contiguous:
+            first = int(np.searchsorted(self.startIds, startId, side='left'))
+            last = max(int(np.searchsorted(self.endIds, endId, side='right')), first)
+            return self._toChanges(self._totalsBetween(self.idPositions, self.idTotals, first, last))
+        # The revisions overlap, so each one in the range is summed directly
+        rows = np.flatnonzero((self.startIds >= startId) & (self.endIds <= endId))
+        counts = np.zeros((len(self.editors), len(COUNTS)), dtype=np.int64)
+        for column, (editorPositions, editorTotals) in enumerate(zip(self.idPositions, self.idTotals)):
+            counts[column] = np.diff(editorTotals, axis=0)[np.isin(editorPositions, rows)].sum(axis=0)
+        return self._toChanges(counts)
+
+    def forTimeRange(self, startTime, endTime) -> ChangeData:
+        """
+        Gets the aggregate changes of the revisions that ended after startTime, up to and including endTime.
+        Eg. the changes in each week can be found by querying the range of each week
+
+        :param startTime: The start of the range, in milliseconds
+        :param endTime: The end of the range, in milliseconds
+        :return: An aggregate of all the changes in that time range
+        """
+        first = bisect_right(self.endTimes, startTime)
+        last = max(bisect_right(self.endTimes, endTime), first)
+        return self._toChanges(self._totalsBetween(self.timePositions, self.timeTotals, first, last))
@@ -0,0 +1,47 @@
+from ..Helpers import DateRange
+from .Helpers import DOCS_URL
+from .State import DocumentState
+
+
+class UnsafeOptions:
+    """
+    The options that control how the unsafe api is requested.
+    These are passed down from the command line to each document.
+    """
+
+    def __init__(self, jobs=1, cache=None, stateDir=None, decoder=None, docsUrl=DOCS_URL, dateRange=None):
+        """
+        :param jobs: The number of revisions to request in parallel
+        :param cache: Optional `ResponseCache` to store the responses in
+        :param stateDir: Optional directory to save the state of each document in.
+                         Later runs then only request the revisions made since.
+        :param decoder: Optional `DecoderPool` to decode the revisions in
+        :param docsUrl: The url the document urls are made relative to, eg. to point at a local stand-in server
+        :param dateRange: Optional `DateRange` to collect the stats in.
+                          The revisions outside of it are skipped, in the official api as well as the unsafe api
+        """
+        self.jobs = jobs
+        self.cache = cache
+        self.stateDir = stateDir
+        self.decoder = decoder
+        self.docsUrl = docsUrl
+        self.dateRange = DateRange() if dateRange is None else dateRange
+
+    def makeState(self, docId, useFine):
+        """
+        Loads the saved state for a document
+
+        :param docId: The ID of the document
+        :param useFine: If the fine revisions are being used
+        :return: The `DocumentState` for the document, or None if states are not being saved
+        """
+        if self.stateDir is None:
+            return None
+        return DocumentState(self.stateDir, docId, useFine)
+
+    def close(self):
+        """
+        Releases any resources held by the options, eg. the decoder's worker processes
+        """
+        if self.decoder is not None:
+            self.decoder.close()
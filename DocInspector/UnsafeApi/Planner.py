@@ -0,0 +1,110 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from ..Scheduler import RequestError
+from .Helpers import UnsafeRequester
+from .Revisions import RevisionMetadata, ChangeData
+
+# The largest number of revision ids to request in a single range, until a range is found to be too large
+MAX_RANGE_IDS = 100000
+# The statuses that suggest a range was too large for the server to build, so it should be split up
+SPLIT_STATUSES = {413, 500, 502, 503, 504}
+
+
+class RangePlanner:
+    """
+    Plans and makes the range requests needed to answer a query.
+    The unsafe api can return the aggregate changes of any span of revision ids,
+    so contiguous revisions are requested together rather than one at a time.
+    This takes a query from one request per revision to one request per group, eg. per timeline increment.
+
+    If a range fails in a way that suggests it was too large it is split in half and each half is requested instead.
+    The size that worked is then used as the limit for the rest of the ranges.
+    """
+
+    def __init__(self, requester: UnsafeRequester, jobs=1, maxIds=MAX_RANGE_IDS):
+        """
+        :param requester: The requester to make the calls with
+        :param jobs: The maximum number of ranges to request at once
+        :param maxIds: The largest number of revision ids to request in a single range
+        """
+        self.requester = requester
+        self.jobs = jobs
+        self.maxIds = maxIds
+        # The changes of each range requested so far, so that a range shared by two queries is only requested once
+        self.fetched: Dict[Tuple[int, int], ChangeData] = {}
+        self._lock = threading.Lock()
+
+    def planRanges(self, revisions: List[RevisionMetadata]) -> List[Tuple[int, int]]:
+        """
+        Groups the revisions whose changes have not been loaded into the fewest contiguous ranges.
+        Revisions that overlap are kept in separate ranges, so that no change is counted differently.
+
+        :param revisions: The revisions to plan for, in any order
+        :return: The (start id, end id) of each range to request
+        """
+        ranges = []
+        for revision in sorted((revision for revision in revisions if revision.change is None),
+                               key=lambda x: x.startId):
+            if ranges and revision.startId == ranges[-1][1] + 1 and revision.endId - ranges[-1][0] < self.maxIds:
+                ranges[-1] = (ranges[-1][0], revision.endId)
+            else:
+                ranges.append((revision.startId, revision.endId))
+        return ranges
+
+    def fetchRange(self, startId, endId) -> ChangeData:
+        """
+        Requests the changes in a range, splitting it up if it is too large.
+
+        :param startId: The start id of the range
+        :param endId: The end id of the range
+        :return: The changes made in the range
+        :raise RequestError: If a single id could not be requested
+        """
+        if endId - startId >= self.maxIds:
+            return self._fetchSplit(startId, endId)
+        try:
+            return self.requester.requestRangeChanges(startId, endId)
+        except RequestError as e:
+            if e.status not in SPLIT_STATUSES or startId == endId:
+                raise
+        # Later ranges are kept below the size that failed
+        with self._lock:
+            self.maxIds = max(min(self.maxIds, (endId - startId + 1) // 2), 1)
+        return self._fetchSplit(startId, endId)
+
+    def _fetchSplit(self, startId, endId) -> ChangeData:
+        middle = (startId + endId) // 2
+        changes = self.fetchRange(startId, middle)
+        changes.mergeIn(self.fetchRange(middle + 1, endId))
+        return changes
+
+    def fetchGroups(self, groups: List[List[RevisionMetadata]]) -> List[ChangeData]:
+        """
+        Gets the aggregate changes of each group of revisions.
+        The ranges of every group are requested together, so that they can be requested in parallel.
+        Revisions whose changes are already loaded are used as they are.
+
+        :param groups: The revisions in each group
+        :return: The changes made in each group, in the same order
+        """
+        plans = [self.planRanges(group) for group in groups]
+        ranges = [planned for planned in dict.fromkeys(planned for plan in plans for planned in plan)
+                  if planned not in self.fetched]
+        if self.jobs <= 1 or len(ranges) <= 1:
+            fetched = [self.fetchRange(*planned) for planned in ranges]
+        else:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                fetched = list(pool.map(lambda planned: self.fetchRange(*planned), ranges))
+        self.fetched.update(zip(ranges, fetched))
+
+        changes = []
+        for group, plan in zip(groups, plans):
+            changes.append(ChangeData())
+            for revision in group:
+                if revision.change is not None:
+                    changes[-1].mergeIn(revision.change)
+            for planned in plan:
+                changes[-1].mergeIn(self.fetched[planned])
+        return changes
@@ -1,6 +1,8 @@
 from datetime import datetime
 from typing import List, Dict
 
+from .Stream import parseRevisionStream
+
 
 class ChangeData:
     """
@@ -100,25 +102,51 @@ class ChangeData:
 
         :param data: The data to load in
         """
-        changes = []
+        users = {}
         # Pull the list of changes from the snapshot
         for chunk in data['chunkedSnapshot']:
             for entry in chunk:
-                if entry['ty'] == 'as' and entry['st'] == "revision_diff":
-                    changes.append(entry)
+                self._foldEntry(users, entry)
+        self._loadUsers(users, data['userInfo'])
+
+    def initFromStream(self, chunks):
+        """
+        Inits the class from the raw response, parsing it as it is read.
+        Each change is added to the counters as soon as it is parsed,
+        so the memory used depends on the number of editors rather than the size of the response.
 
-        # Load the changes into both the running total and the user totals
+        :param chunks: The raw body of the response, in chunks. See `Stream.iterChunks`
+        """
         users = {}
-        for entry in changes:
+        rest = parseRevisionStream(chunks, lambda entry: self._foldEntry(users, entry))
+        self._loadUsers(users, rest['userInfo'])
+
+    def _foldEntry(self, users, entry):
+        """
+        Internal Function
+        Adds a single entry of the snapshot to the changes of the user that made it, if it is a change
+
+        :param users: The changes of each user, by their unsafe id
+        :param entry: The raw entry
+        """
+        if entry['ty'] == 'as' and entry['st'] == "revision_diff":
             user = entry['sm']['revdiff_aid'] if "revdiff_aid" in entry['sm'] else ""
             if user not in users:
                 users[user] = self.EditorChanges()
             users[user].addChange(entry)
 
+    def _loadUsers(self, users, userInfo):
+        """
+        Internal Function
+        Loads the changes of each user into both the running total and the user totals
+
+        :param users: The changes of each user, by their unsafe id
+        :param userInfo: The raw user data of the response
+        """
         # Update the user Id to the standard
         for user in users:
-            if user in data['userInfo']:  # We have userdata, so we copy the user into the store
-                newId = data['userInfo'][user]['color']
+            if user in userInfo:  # We have userdata, so we copy the user into the store
+                newId = userInfo[user]['color']
                 self.editors[newId] = users[user]
                 self.editors[newId].setUserId(newId)
             else:  # We don't have data, so we merge into the unknown case
@@ -131,6 +159,30 @@ class ChangeData:
         for editor in self.editors:
             self.total.mergeIn(self.editors[editor])
 
+    def toDict(self) -> dict:
+        """
+        Converts the changes into a compact json compatible format.
+        Only the per-editor counters are kept, the total is recalculated when loading.
+
+        :return: A dict linking each editor to their [additions, removals, changes]
+        """
+        return {editor: [changes.additions, changes.removals, changes.changes]
+                for editor, changes in self.editors.items()}
+
+    def initFromDict(self, data):
+        """
+        Inits the class from the format produced by `toDict`
+
+        :param data: The data to load in
+        """
+        for editor, (additions, removals, changes) in data.items():
+            self.editors[editor] = self.EditorChanges()
+            self.editors[editor].additions = additions
+            self.editors[editor].removals = removals
+            self.editors[editor].changes = changes
+            self.editors[editor].setUserId(editor)
+            self.total.mergeIn(self.editors[editor])
+
     def mergeIn(self, other: 'ChangeData'):
         """
         Merges the changes in another revision into this revision.
@@ -240,6 +292,24 @@ class RevisionMetadata:
         self.revisionKey = data['revisionMac']
         self.hasSubRevisions = data['expandable']
 
+    def toDict(self) -> dict:
+        """
+        Converts the metadata back into the raw JSON format it was loaded from
+
+        :return: The metadata in the same format as the list of revisions
+        """
+        data = {
+            'start': self.startId,
+            'end': self.endId,
+            'endMillis': self.endTime,
+            'users': self.users,
+            'revisionMac': self.revisionKey,
+            'expandable': self.hasSubRevisions
+        }
+        if self.name != "unnamed":
+            data['name'] = self.name
+        return data
+
     def __repr__(self):
         """
         :return: This revision as a string format
@@ -254,7 +324,6 @@ class RevisionMetadata:
         :return: The changes made in this revision
         """
         if not self.change:
-            rawData = self.requester.requestRevision(self)
-            self.change = ChangeData(rawData)
+            self.change = self.requester.requestRangeChanges(self.startId, self.endId)
 
         return self.change
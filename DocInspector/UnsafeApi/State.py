@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+from typing import List
+
+from .Revisions import RevisionMetadata, ChangeData
+
+
+class DocumentState:
+    """
+    The state of a document saved at the end of a previous run.
+    This holds the metadata and the per-editor changes of every revision seen so far,
+    so that later runs only need to request the revisions made since.
+
+    Changes are stored per revision rather than per increment, so that a different increment size can be used
+    on each run without needing to re-request the whole document.
+    """
+
+    def __init__(self, directory, docId, useFine=False):
+        """
+        Loads the state for the given document, if there is one.
+
+        :param directory: The directory the state files are stored in
+        :param docId: The ID of the document
+        :param useFine: If the state is for the fine revisions. Fine and coarse revisions are stored separately
+        """
+        self.path = os.path.join(directory, f"{docId}{'-fine' if useFine else ''}.json")
+        self.docId = docId
+        self.lastEndId = 0
+        self.userMap = {}
+        self.revisions = []
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf8') as f:
+                data = json.load(f)
+            self.lastEndId = data['lastEndId']
+            self.userMap = data['userMap']
+            self.revisions = data['revisions']
+
+    def loadRevisions(self, requester) -> List[RevisionMetadata]:
+        """
+        Creates the revisions stored in the state, with their changes already loaded.
+
+        :param requester: The requester to give to the revisions
+        :return: The stored revisions
+        """
+        revisions = []
+        for entry in self.revisions:
+            revision = RevisionMetadata(entry['tile'], requester)
+            revision.change = ChangeData()
+            revision.change.initFromDict(entry['changes'])
+            revisions.append(revision)
+        return revisions
+
+    def update(self, revisions: List[RevisionMetadata], userMap):
+        """
+        Replaces the stored state with the given revisions.
+        Only revisions whose changes have been loaded are stored.
+        Stops at the first revision without changes, so that no gaps are left behind.
+
+        :param revisions: The revisions of the document, sorted by start id
+        :param userMap: The raw user data of the document
+        """
+        self.revisions = []
+        self.lastEndId = 0
+        for revision in revisions:
+            if revision.change is None:
+                break
+            self.revisions.append({'tile': revision.toDict(), 'changes': revision.change.toDict()})
+            self.lastEndId = max(self.lastEndId, revision.endId)
+        self.userMap = dict(userMap)
+
+    def save(self):
+        """
+        Writes the state to disk.
+        The state is written to a temporary file first, so an interrupted run never leaves a corrupt state behind.
+        """
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        handle, tempPath = tempfile.mkstemp(dir=directory, prefix='.')
+        with os.fdopen(handle, 'w', encoding='utf8') as f:
+            json.dump({'docId': self.docId,
+                       'lastEndId': self.lastEndId,
+                       'userMap': self.userMap,
+                       'revisions': self.revisions}, f)
+        os.replace(tempPath, self.path)
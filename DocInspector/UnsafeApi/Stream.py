@@ -0,0 +1,149 @@
+import codecs
+import json
+from typing import Callable, Iterable, Iterator
+
+# The number of bytes handed to the parser at a time when splitting up a response
+CHUNK_SIZE = 64 * 1024
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """
+    Reads json values one at a time from a stream of byte chunks.
+    Only the part of the stream that has not been parsed yet is held in memory.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf8')()
+        self.buffer = ""
+        self.pos = 0
+        self.finished = False
+
+    def more(self) -> bool:
+        """
+        Reads the next chunk onto the end of the buffer, dropping the part that has already been parsed
+
+        :return: False if the stream has ended
+        """
+        if self.finished:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.finished = True
+            text = self.decoder.decode(b"", final=True)
+        else:
+            text = self.decoder.decode(chunk)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Skips any whitespace
+
+        :return: The next character, or an empty string at the end of the stream
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.more():
+                return ""
+
+    def expect(self, char):
+        """
+        Consumes the next character, which must be the one given
+
+        :raise ValueError: If the next character is something else
+        """
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found}' in revision stream")
+        self.pos += 1
+
+    def value(self):
+        """
+        Parses the next complete json value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value runs past the end of the buffer
+                if not self.more():
+                    raise
+                continue
+            # A number at the end of the buffer may carry on into the next chunk
+            if end == len(self.buffer) and self.more():
+                continue
+            self.pos = end
+            return value
+
+    def items(self) -> Iterator[None]:
+        """
+        Steps through an array. Each element must be consumed by the caller before the next step.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return
+
+
+def iterChunks(content, size=CHUNK_SIZE) -> Iterator[memoryview]:
+    """
+    Splits a response body into chunks without copying it
+
+    :param content: The raw body
+    :param size: The size of each chunk in bytes
+    :return: Views over each chunk of the body
+    """
+    view = memoryview(content)
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
+
+
+def parseRevisionStream(chunks: Iterable[bytes], onEntry: Callable[[dict], None]) -> dict:
+    """
+    Parses a showrevision response as it is read.
+    Each entry of the `chunkedSnapshot` is passed to `onEntry` as soon as it is parsed and is then discarded,
+    so the snapshot is never held in memory as a whole.
+    The `)]}'` guard at the start of the response is skipped.
+
+    :param chunks: The raw body of the response, in chunks
+    :param onEntry: Called with each entry of the snapshot
+    :return: The rest of the response, eg. the `userInfo`, without the snapshot
+    :raise ValueError: If the response is not valid
+    """
+    reader = _Reader(chunks)
+    while reader.peek() not in ('{', ''):
+        reader.pos += 1
+
+    rest = {}
+    reader.expect('{')
+    if reader.peek() == '}':
+        return rest
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == 'chunkedSnapshot':
+            for _ in reader.items():
+                for _ in reader.items():
+                    onEntry(reader.value())
+        else:
+            rest[key] = reader.value()
+        if reader.peek() == ',':
+            reader.pos += 1
+            continue
+        reader.expect('}')
+        return rest
@@ -1 +1,5 @@
 from .Document import Document  # Document is the only class the developer needs to interact with directly.
+from .Cache import ResponseCache
+from .State import DocumentState
+from .Options import UnsafeOptions
+from .Decoder import DecoderPool
@@ -56,7 +56,9 @@ def outputTimeline(stats: DocStats) -> List[str]:
 
     # Create the timeline rows
     time = stats.timeline.timelineStart
-    for increment in stats.timeline.increments:
+    additions = stats.timeline.getEditorTable('additions', editorIds)
+    removals = stats.timeline.getEditorTable('removals', editorIds)
+    for incrementAdditions, incrementRemovals in zip(additions, removals):
         # Add the increment date
         additionLine = datetime.fromtimestamp(time / 1000) \
                            .replace(tzinfo=timezone.utc) \
@@ -64,14 +66,10 @@ def outputTimeline(stats: DocStats) -> List[str]:
                            .strftime('%d/%m/%Y - %I:%M:%S %p') \
                        + ","
         removalLine = str(additionLine)  # We want a copy not the same
-        # Add each editor's additions
-        for editor in editorIds:
-            if editor in increment.editors:
-                additionLine += str(increment.editors[editor].additions or "") + ","
-                removalLine += str(increment.editors[editor].removals or "") + ","
-            else:
-                additionLine += ","
-                removalLine += ","
+        # Add each editor's additions. These are None if the editor did nothing
+        for addition, removal in zip(incrementAdditions, incrementRemovals):
+            additionLine += str(addition or "") + ","
+            removalLine += str(removal or "") + ","
         output.append(additionLine + "," + removalLine)
         time += stats.timeline.incrementSize
 
@@ -82,7 +82,6 @@ def create_timeline(stats: DocStats, lines):
     """
 
     t_s = stats.timeline
-    num_increments = t_s.getNumIncrements()
 
     start_time = t_s.timelineStart
 
@@ -90,15 +89,11 @@ def create_timeline(stats: DocStats, lines):
     edit_index = lines.index("<!-- TIMELINE CONTENTS -->")
     lines.pop(edit_index)
 
-    # fill timeline
-    for i in range(num_increments):
+    # fill timeline, skipping the increments with no changes
+    for i in t_s.getActiveIncrements():
         new_index = edit_index
         inc = t_s.getIncrement(i)
 
-        # skip iteration if no changes
-        if len(inc.editors) == 0:
-            continue
-
         dt = start_time + (i * t_s.incrementSize)
 
         sum_adds = inc.total.additions
@@ -118,19 +113,21 @@ def create_timeline(stats: DocStats, lines):
         # fill timeline point with addition/removal info
         for editor in inc.getEditors():
             edits = inc.getEditor(editor)
-            adds_percent = ceil((edits.additions / sum_adds) * 100) if sum_adds else 0
-            rems_percent = ceil((edits.removals / sum_rems) * 100) if sum_rems else 0
+            # Each count is read out of the timeline's columns, so they are only read once
+            adds, rems = edits.additions, edits.removals
+            adds_percent = ceil((adds / sum_adds) * 100) if sum_adds else 0
+            rems_percent = ceil((rems / sum_rems) * 100) if sum_rems else 0
             lines, new_index = write_lines([
                 '\t\t\t\t\t\t<tr>',
-                '\t\t\t\t\t\t\t<td width=80%%>%s</td>' % inc.getEditor(editor).name,
-                '\t\t\t\t\t\t\t<td align="right">%d</td>' % (edits.additions or 0),
+                '\t\t\t\t\t\t\t<td width=80%%>%s</td>' % edits.name,
+                '\t\t\t\t\t\t\t<td align="right">%d</td>' % (adds or 0),
                 '\t\t\t\t\t\t\t<td width=10% align="right">',
                 '\t\t\t\t\t\t\t\t<span class="add_span" style="width:%d%%;">&nbsp</span>' % adds_percent,
                 '\t\t\t\t\t\t\t</td>',
                 '\t\t\t\t\t\t\t<td width=10% align="left">',
                 '\t\t\t\t\t\t\t\t<span class="rem_span" style="width:%d%%;">&nbsp</span>' % rems_percent,
                 '\t\t\t\t\t\t\t</td>',
-                '\t\t\t\t\t\t\t<td align="right">%d</td>' % (edits.removals or 0),
+                '\t\t\t\t\t\t\t<td align="right">%d</td>' % (rems or 0),
                 '\t\t\t\t\t\t</tr>',
             ], lines, new_index)
 
@@ -150,8 +150,12 @@ def loadFromIncrements(stats: DocStats):
     # Collect the data from increments
     time = stats.timeline.timelineStart
     priorBlank = False
-    for increment in stats.timeline.increments:
-        if len(increment.editors):
+    active = set(stats.timeline.getActiveIncrements())
+    presence = stats.timeline.getEditorPresence(editorIds)
+    additions = stats.timeline.getEditorTable('additions', editorIds)
+    removals = stats.timeline.getEditorTable('removals', editorIds)
+    for i, (present, incrementAdditions, incrementRemovals) in enumerate(zip(presence, additions, removals)):
+        if i in active:
             priorBlank = False
             # Append the date
             dates.append(datetime.fromtimestamp(time / 1000)
@@ -159,13 +163,12 @@ def loadFromIncrements(stats: DocStats):
                          .astimezone(tz=None)
                          .strftime('%d/%m/%Y\n%I:%M:%S %p'))
 
-            for editor in editorIds:
-                if editor in increment.editors:
+            for editor, isPresent, addition, removal in zip(editorIds, present, incrementAdditions,
+                                                            incrementRemovals):
+                if isPresent:
                     # Append the data or N/A if it's None
-                    editorAdditions[editor].append(
-                        ("+" + str(increment.editors[editor].additions) or "N/A"))
-                    editorRemovals[editor].append(
-                        ("-" + str(increment.editors[editor].removals) or "N/A"))
+                    editorAdditions[editor].append(("+" + str(addition) or "N/A"))
+                    editorRemovals[editor].append(("-" + str(removal) or "N/A"))
                 else:
                     # Editor did nothing, so make them blank
                     editorAdditions[editor].append("")
@@ -225,7 +228,8 @@ def buildTimelineTable(dates, editorIds, editorAdditions, editorRemovals, editor
         header += "│ {0: ^{1}} ".format(editorNames[editor], editorWidths[editor])
     output.append(header + "│")
 
-    if dates[0]:
+    # A date range with no revisions in it leaves the timeline empty
+    if dates and dates[0]:
         output.append(buildRowBorder("╞", "╪", "╡", "═", dateWidth, editorWidths, editorIds))
     else:
         output.append(buildRowBorder("/", "/", "/", "═", dateWidth, editorWidths, editorIds))
@@ -1,3 +1,4 @@
 from .DocStats import DocStats
 from .LoadStats import collectFromFile, collectFromFolder, tryCollectFromId
+from .Metrics import RequestMetrics, metrics
 from .Writers import *
@@ -1,14 +1,23 @@
+import asyncio
+import json
 import os
 from argparse import ArgumentParser
 from os import path
 from typing import Dict, Callable
 
-from googleapiclient.discovery import build
-from httplib2 import Http
 from oauth2client import file, client, tools
 from oauth2client.contrib import dictionary_storage
 
-from DocInspector import tryCollectFromId, DocStats, outputPlain, outputHTML, outputCsv
+from DocInspector import tryCollectFromId, DocStats, outputPlain, outputHTML, outputCsv, AsyncApi
+from DocInspector.ProcessPool import DriveServiceFactory
+from DocInspector.DriveService import buildDriveService
+from DocInspector.Helpers import parseDateRange, parseIncrements
+from DocInspector.HttpPool import CONNECTIONS_PER_HOST, HttpPool
+from DocInspector.Metrics import metrics
+from DocInspector.Recording import FixtureArchive, RecordingPool, ReplayPool
+from DocInspector.Scheduler import DEFAULT_RATES, RequestScheduler
+from DocInspector.Tracing import span, tracer
+from DocInspector.UnsafeApi import DecoderPool, ResponseCache, UnsafeOptions
 
 FOLDER_MIME = "application/vnd.google-apps.folder"
 FILE__MIME = "application/vnd.google-apps.document"
@@ -32,15 +41,18 @@ def parseArguments():
     parser.add_argument('fileId', metavar='docId', type=str,
                         help='A valid google document ID from which revision data will be retrieved')
 
-    parser.add_argument('-d, --dates', dest='dates', action='store', required=False,
+    parser.add_argument('-d, --dates', dest='dates', type=parseDateRange, default=None, required=False,
                         help='The start and end date range from which statistics will be extracted in the format '
-                             '"dd-mm-yyyy/dd-mm-yyyy". Value will default to lifespan of the document if left blank '
-                             'or value entered is outside of document lifespan')
+                             '"dd-mm-yyyy/dd-mm-yyyy". Both dates are included, and either can be left blank. Value '
+                             'will default to lifespan of the document if left blank. Revisions outside of the range '
+                             'are skipped before their changes are requested, and the timeline is clipped to it')
 
-    parser.add_argument('-t, --time', dest='timeIncrement', type=str, default='1:0:0',
+    parser.add_argument('-t, --time', dest='timeIncrements', type=parseIncrements, default='1:0:0',
                         required=False,
                         help="Time increment in which changes will be displayed in the format 'd:h:m'. Only "
-                             "increments with recognised changes will be displayed")
+                             "increments with recognised changes will be displayed. Several increments can be given "
+                             "separated by commas, eg. '0:1:0,1:0:0,7:0:0', to output the stats once for each. The "
+                             "stats are only collected at the finest one, so each must be a multiple of it")
 
     parser.add_argument('-u, --unsafe', dest='isUnsafe', action='store_true', default=False,
                         required=False,
@@ -52,6 +64,78 @@ def parseArguments():
                         help='Use a finer level of detail with the unsafe API. This may take a while as large amounts '
                              'of data are being retrieved')
 
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1, required=False,
+                        help='The number of revisions to request in parallel when using the unsafe API. Defaults to 1, '
+                             'which requests them one at a time')
+
+    parser.add_argument('-a', '--asyncio', dest='asyncLimit', type=int, default=0, required=False,
+                        help='Collect the stats using the asyncio engine, with up to the given number of requests in '
+                             'flight at once, eg. 100')
+
+    parser.add_argument('--response-cache', dest='responseCache', type=str, default=None, required=False,
+                        help='Caches the unsafe API responses on disk in the given directory, so that re-running on '
+                             'the same document needs almost no requests')
+
+    parser.add_argument('--cache-size', dest='cacheSize', type=int, default=512, required=False,
+                        help='The maximum size of the response cache in MB. The least recently used responses are '
+                             'removed first. Defaults to 512')
+
+    parser.add_argument('--state-dir', dest='stateDir', type=str, default=None, required=False,
+                        help='Saves the revisions of each document in the given directory when using the unsafe API. '
+                             'Later runs then only request the revisions made since the last run')
+
+    parser.add_argument('--processes', dest='processes', type=int, default=0, required=False,
+                        help='Collect the files of a folder in the given number of worker processes, eg. the number '
+                             'of cores')
+
+    parser.add_argument('--decoders', dest='decoders', type=int, default=0, required=False,
+                        help='Decode the unsafe API revisions in the given number of worker processes, so decoding '
+                             'overlaps with the requests. Use with -j or -a')
+
+    parser.add_argument('--depth', dest='depth', type=int, default=1, required=False,
+                        help='How many levels of sub-folders to collect the files from. Defaults to 1, which only '
+                             'collects the files directly inside the folder. Use 0 for no limit')
+
+    parser.add_argument('--rate', dest='rate', type=float, default=None, required=False,
+                        help='The maximum number of requests per second to make to each endpoint. Defaults to the '
+                             'drive api quota, and a cautious limit for the unsafe API')
+
+    parser.add_argument('--retry-budget', dest='retryBudget', type=int, default=100, required=False,
+                        help='The total number of times failed or rate limited requests can be retried during the '
+                             'run. Defaults to 100')
+
+    parser.add_argument('--connections', dest='connections', type=int, default=CONNECTIONS_PER_HOST, required=False,
+                        help='The maximum number of connections to keep open to each host. Defaults to '
+                             f'{CONNECTIONS_PER_HOST}')
+
+    parser.add_argument('--record', dest='record', type=str, default=None, required=False,
+                        help='Records every request made during the run into the given fixture archive, so the run '
+                             'can be replayed offline with --replay. Folders are collected in a single process')
+
+    parser.add_argument('--replay', dest='replay', type=str, default=None, required=False,
+                        help='Serves every request from the given fixture archive instead of contacting Google. The '
+                             'run must use the same flags as when it was recorded')
+
+    parser.add_argument('--latency', dest='latency', type=float, default=0, required=False,
+                        help='The time each replayed request takes, in seconds, to simulate the network. Defaults to 0')
+
+    parser.add_argument('--server', dest='server', type=str, default=None, required=False,
+                        help='Makes every request to the server at the given url instead of google, eg. the mock '
+                             'server in DocInspector.Benchmarks.MockServer. No authentication is done')
+
+    parser.add_argument('--metrics', dest='metrics', type=str, default=None, required=False,
+                        help='Saves the request metrics of each endpoint to the given file as json. '
+                             'A summary of them is always printed at the end of the run')
+
+    parser.add_argument('--profile', dest='profile', type=str, default=None, required=False,
+                        help='Times each phase of the run, each document and each request, and writes them to the '
+                             'given file as a Chrome trace, eg. trace.json. Open it in chrome://tracing or '
+                             'ui.perfetto.dev. Worker processes are not traced')
+
+    parser.add_argument('--profile-phase', dest='profilePhase', type=str, default=None, required=False,
+                        help='Captures the given phase with cProfile as well, eg. collectUnsafeStats or outputHTML. '
+                             'The stats are written next to the trace with a .prof extension. Use with --profile')
+
     parser.add_argument('-c, --cache', dest='cache', action='store_true', default=False,
                         required=False,
                         help='Caches login details to prevent re-authentication. Use this to store credentials so '
@@ -68,14 +152,16 @@ def parseArguments():
     return parser.parse_args()
 
 
-def authenticate(scope, args):
+def authenticate(scope, args, scheduler: RequestScheduler, archive: FixtureArchive = None):
     """
     Performs the authentication flow.
     Handles the credential management
 
     :param scope: The scope to authenticate with
     :param args: The arguments passed in to the program.
-    :return: (The drive api service, The http requests object)
+    :param scheduler: The scheduler for the service to make it's requests through
+    :param archive: Optional archive to record the service's requests into
+    :return: (The drive api service, The credentials used to authorise it)
     """
     if args.cache:
         store = file.Storage(folder + '/token.json')
@@ -86,11 +172,26 @@ def authenticate(scope, args):
     if not creds or creds.invalid:
         flow = client.flow_from_clientsecrets(folder + '/credentials.json', scope)
         creds = tools.run_flow(flow, store, args)
-    service = build('drive', 'v2', http=creds.authorize(Http()))
+    service = buildDriveService(makePool(creds, args, scheduler, archive))
 
     if not args.cache and os.path.exists(folder + '/token.json'):
         os.remove(folder + '/token.json')
-    return service
+    return service, creds
+
+
+def makePool(credentials, args, scheduler: RequestScheduler, archive: FixtureArchive = None) -> HttpPool:
+    """
+    Makes the connection pool that the drive service and unsafe api make their requests through
+
+    :param credentials: The credentials to authorise the requests with. None to not authorise
+    :param args: The arguments passed in to the program
+    :param scheduler: The scheduler to make the requests through
+    :param archive: Optional archive to record the requests into
+    :return: The pool for the run
+    """
+    if archive is not None:
+        return RecordingPool(archive, credentials, args.connections, scheduler)
+    return HttpPool(credentials, args.connections, scheduler)
 
 
 def writeToFile(data, file_path=None):
@@ -113,22 +214,166 @@ def writeToFile(data, file_path=None):
         print(data)
 
 
+def resolutionPath(file_path, incrementSize):
+    """
+    Gets the file to write the stats at one of several resolutions to, by adding the increment to the file name
+
+    :param file_path: The file path passed in to the program, or None to write to stdout
+    :param incrementSize: The size of the increments, in the format 'd:h:m'
+    :return: The file path for the resolution, eg. stats-1-0-0.html
+    """
+    if not file_path:
+        return file_path
+    root, extension = path.splitext(file_path)
+    return f"{root}-{incrementSize.replace(':', '-')}{extension}"
+
+
+def makeScheduler(args):
+    """
+    Makes the scheduler that every request is made through out of the arguments
+
+    :param args: The arguments passed in to the program
+    :return: The `RequestScheduler` for the run
+    """
+    rates = None
+    if args.rate is not None:
+        rates = {endpoint: (args.rate, max(args.rate * 2, 1)) for endpoint in DEFAULT_RATES}
+    return RequestScheduler(rates, retryBudget=args.retryBudget)
+
+
+def makeUnsafeOptions(args):
+    """
+    Makes the options for the unsafe api out of the arguments
+
+    :param args: The arguments passed in to the program
+    :return: The `UnsafeOptions` to collect with
+    """
+    cache = None
+    if args.responseCache is not None:
+        cache = ResponseCache(args.responseCache, args.cacheSize * 1024 * 1024)
+    decoder = DecoderPool(args.decoders) if args.decoders > 0 else None
+    options = UnsafeOptions(max(args.jobs, 1), cache, args.stateDir, decoder, dateRange=args.dates)
+    if args.server is not None:
+        options.docsUrl = f"{args.server}/document/d/"
+    return options
+
+
+async def collectAsync(args, credentials, unsafeLevel, scheduler: RequestScheduler, options: UnsafeOptions,
+                       archive: FixtureArchive = None):
+    """
+    Collects the stats using the asyncio engine.
+
+    :param args: The arguments passed in to the program
+    :param credentials: The credentials to authorise the requests with
+    :param unsafeLevel: 0 for no unsafe stats, 1 for the unsafe stats and 2 for the fine unsafe stats
+    :param scheduler: The scheduler to make the requests through
+    :param options: The options that control how the unsafe api is requested
+    :param archive: Optional archive to record the requests into, or to replay them from if `args.replay` is set
+    :return: The same as `tryCollectFromId`
+    """
+    if args.replay is not None:
+        transport = AsyncApi.ReplayTransport(archive, args.latency)
+    else:
+        transport = AsyncApi.HttpTransport(credentials, args.asyncLimit, scheduler)
+        if archive is not None:
+            transport = AsyncApi.RecordingTransport(transport, archive)
+    drive = None
+    if args.server is not None:
+        drive = AsyncApi.AsyncDriveService(transport, f"{args.server}/drive/v2/")
+    try:
+        return await AsyncApi.tryCollectFromId(args.fileId, transport, args.timeIncrements[0], unsafeLevel, drive,
+                                               options.docsUrl, options, args.depth)
+    finally:
+        await transport.close()
+
+
+def openArchive(args):
+    """
+    Opens the fixture archive to record into or replay from
+
+    :param args: The arguments passed in to the program
+    :return: The `FixtureArchive` for the run, or None if the run is neither recorded nor replayed
+    """
+    if args.replay is not None:
+        return FixtureArchive(args.replay, 'r')
+    if args.record is not None:
+        return FixtureArchive(args.record, 'w')
+    return None
+
+
 def main():
-    print("Authenticating")
     args = parseArguments()
-    service = authenticate('https://www.googleapis.com/auth/drive'
-                           if args.isUnsafe else
-                           'https://www.googleapis.com/auth/drive.metadata.readonly',
-                           args)
+    if args.profile is not None:
+        tracer.enable(args.profilePhase)
+    try:
+        run(args)
+    finally:
+        if args.profile is not None:
+            tracer.save(args.profile)
+            print("Wrote the trace to " + args.profile)
+
+
+def run(args):
+    """
+    Collects and outputs the stats
+
+    :param args: The arguments passed in to the program
+    """
+    scheduler = makeScheduler(args)
+    archive = openArchive(args)
+    if args.replay is not None:
+        print("Replaying from " + args.replay)
+        service, credentials = buildDriveService(ReplayPool(archive, args.latency), args.server), None
+    elif args.server is not None:
+        print("Using the server at " + args.server)
+        service, credentials = buildDriveService(makePool(None, args, scheduler, archive), args.server), None
+    else:
+        print("Authenticating")
+        with span("authenticate"):
+            service, credentials = authenticate('https://www.googleapis.com/auth/drive'
+                                                if args.isUnsafe else
+                                                'https://www.googleapis.com/auth/drive.metadata.readonly',
+                                                args, scheduler, archive)
     print("Collecting stats")
     unsafeLevel = (2 if args.useFine else 1) if args.isUnsafe else 0
-    globalStats, fileStats = tryCollectFromId(args.fileId, service, args.timeIncrement, unsafeLevel)
+    options = makeUnsafeOptions(args)
+    try:
+        with span("collect", fileId=args.fileId):
+            if args.asyncLimit > 0:
+                globalStats, fileStats = asyncio.run(collectAsync(args, credentials, unsafeLevel, scheduler, options,
+                                                                  archive))
+            elif archive is not None:
+                # The worker processes would each need their own archive, so the files are collected here instead
+                globalStats, fileStats = tryCollectFromId(args.fileId, service, args.timeIncrements[0], unsafeLevel,
+                                                         options, depth=args.depth)
+            else:
+                # Each worker process has it's own scheduler, so they share the quota between them
+                serviceFactory = DriveServiceFactory(credentials, scheduler.scaled(1 / max(args.processes, 1)),
+                                                     args.connections, args.server)
+                globalStats, fileStats = tryCollectFromId(args.fileId, service, args.timeIncrements[0], unsafeLevel,
+                                                         options, args.processes, serviceFactory, args.depth)
+    finally:
+        options.close()
+        if archive is not None:
+            archive.close()
+        print("Requests made")
+        print(metrics.summary())
+        if args.metrics is not None:
+            with open(args.metrics, 'w', encoding='utf8') as f:
+                json.dump(metrics.toDict(), f, indent=2)
     # Output stats
     print("Outputting data")
-    writeToFile(outputLookup[args.output](globalStats), args.path)
-    if fileStats:
-        for fileStat in fileStats:
-            writeToFile(outputLookup[args.output](fileStat), args.path)
+    output = outputLookup[args.output]
+    for stats in [globalStats] + (fileStats or []):
+        # The coarser resolutions are rolled up from the stats collected at the finest, without any more requests
+        with span("rollUp", increments=len(args.timeIncrements)):
+            resolutions = stats.rollUpAll(args.timeIncrements)
+        for incrementSize, resolution in zip(args.timeIncrements, resolutions):
+            with span(output.__name__, fileId=stats.general.id, increment=incrementSize):
+                data = output(resolution)
+            with span("writeToFile"):
+                writeToFile(data, args.path if len(args.timeIncrements) == 1
+                            else resolutionPath(args.path, incrementSize))
 
 
 if __name__ == '__main__':
@@ -11,8 +11,9 @@ setup(
     long_description=open('README.md').read(),
     install_requires=[
         "oauth2client >= 4.1",
-        "google-api-python-client >=1.7",
-        'httplib2'
+        "google-api-python-client >=1.8",
+        'httplib2',
+        'numpy'
     ],
     packages=find_packages(),
     entry_points={